@@ -0,0 +1,279 @@
+import argparse, json, os, platform, statistics, subprocess, sys, tempfile, time
+from datetime import datetime, timezone
+from telebot.credentials import STORAGE_BACKEND
+from telebot.engine.supabase.database import transaction, close_pool
+from telebot.engine.supabase.ledger import current_balances
+from telebot.engine.storage.data_manager import (
+    delete_group_data, record_expense, undo_expenses, get_base_currency, get_balances, get_member_balance,
+    get_expense_page, get_group_spending, get_member_spending, get_member_category_spending,
+    write_expenses_csv, change_currency,
+)
+from telebot.engine.expense.show import EXPENSES_PAGE_SIZE
+from telebot.executor import shutdown_executor
+
+#Database paths behind the expense handlers, timed against seeded groups of growing size.
+#Needs a migrated Postgres database (a local one; the seeded groups are removed afterwards unless --keep);
+#the seeding is Postgres SQL, so with any other STORAGE_BACKEND the suite is skipped.
+#
+#Timings only compare on the same machine and database, so no baseline ships with the repository:
+#record one with --save-baseline on the reference machine and commit benchmarks/baselines/expense_engine.json.
+#The baseline notes the machine and Postgres version it was recorded on.
+#Run from the repository root:
+#   python -m benchmarks.bench_expense_engine                        # compare against the saved baseline
+#   python -m benchmarks.bench_expense_engine --save-baseline        # record a new baseline, e.g. at a release
+#   python -m benchmarks.bench_expense_engine --scales 10,1000 --fail-on-regression
+#
+#Each case is named after the handler path it stands for. Cases that change data undo the change
+#untimed afterwards, so every repeat sees the same group.
+
+# Expenses per group -> members in it
+SCALES = {10: 10, 1_000: 100, 100_000: 1_000}
+BENCH_GROUP_BASE = -990_000_000_000  # Seeded groups are BENCH_GROUP_BASE - expenses, far from real chat ids
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "expense_engine.json")
+CATEGORIES = 10
+
+SEED_SQL = """
+SELECT setseed(%(seed)s);
+
+INSERT INTO groups (group_id, username) VALUES (%(group_id)s, 'bench');
+INSERT INTO currency (group_id, base_currency, rate) VALUES (%(group_id)s, 'SGD', 1);
+INSERT INTO participants (group_id, username)
+SELECT %(group_id)s, 'member' || i FROM generate_series(0, %(members)s - 1) i;
+INSERT INTO categories (group_id, category_name)
+SELECT %(group_id)s, 'category' || i FROM generate_series(0, %(categories)s - 1) i;
+
+-- Ids drawn up front so beneficiaries and ledger entries can refer to them
+CREATE TEMP TABLE bench_expenses ON COMMIT DROP AS
+SELECT nextval(pg_get_serial_sequence('expenses', 'id')) AS id, i,
+       2 + floor(random() * 4)::int AS beneficiaries,
+       (100 + floor(random() * 9900)) / 100.0 AS split,
+       floor(random() * %(members)s)::int AS payer
+FROM generate_series(1, %(expenses)s) i;
+
+INSERT INTO expenses (id, group_id, purpose, payer, amount, currency, rate, category_name, created_at)
+SELECT id, %(group_id)s, 'Expense ' || i, 'member' || payer, split * beneficiaries, 'SGD', 1,
+       CASE WHEN i %% 4 = 0 THEN NULL ELSE 'category' || (i %% %(categories)s) END,
+       NOW() - (%(expenses)s - i) * INTERVAL '1 minute'
+FROM bench_expenses;
+
+-- The payer is always among the beneficiaries, as with "all" splits
+INSERT INTO expense_beneficiaries (expense_id, group_id, username, split_amount)
+SELECT b.id, %(group_id)s, 'member' || ((b.payer + j) %% %(members)s), b.split
+FROM bench_expenses b, generate_series(0, b.beneficiaries - 1) j;
+
+-- The same net deltas record_expense appends
+INSERT INTO balance_ledger (group_id, username, delta, event_type, event_id, currency, rate)
+SELECT %(group_id)s, username, SUM(delta), 'expense', expense_id, 'SGD', 1
+FROM (
+    SELECT b.id AS expense_id, 'member' || b.payer AS username, -b.split * b.beneficiaries AS delta
+    FROM bench_expenses b
+    UNION ALL
+    SELECT b.id, 'member' || ((b.payer + j) %% %(members)s), b.split
+    FROM bench_expenses b, generate_series(0, b.beneficiaries - 1) j
+) deltas
+GROUP BY expense_id, username
+HAVING SUM(delta) <> 0
+ORDER BY expense_id;
+"""
+
+
+class Group:
+    """A seeded group and the values the cases need from it."""
+
+    def __init__(self, expenses, members):
+        self.id = BENCH_GROUP_BASE - expenses
+        self.expenses = expenses
+        self.members = [f"member{i}" for i in range(members)]
+        self.middle_page = None  # (created_at, id) halfway through the history
+
+    def seed(self, seed):
+        delete_group_data.sync(self.id)
+        with transaction() as cursor:
+            cursor.execute(SEED_SQL, {
+                "seed": seed, "group_id": self.id, "members": len(self.members),
+                "expenses": self.expenses, "categories": CATEGORIES,
+            })
+            # Fold the seeded ledger into a snapshot, as a long-lived group would have
+            current_balances(cursor, self.id)
+
+            cursor.execute("""
+            SELECT created_at, id FROM expenses WHERE group_id = %s
+            ORDER BY created_at DESC, id DESC OFFSET %s LIMIT 1;
+            """, (self.id, self.expenses // 2))
+            self.middle_page = cursor.fetchone()
+
+    def drop(self):
+        delete_group_data.sync(self.id)
+
+
+def new_expense(group):
+    """record_expense arguments for a four-way equal split, like a typical /add_expense."""
+    beneficiaries = group.members[:4]
+    return (group.id, "Bench dinner", group.members[0], 80.0, beneficiaries, [20.0] * len(beneficiaries))
+
+def export(group):
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode="w+b") as file:
+        write_expenses_csv.sync(group.id, file)
+
+#name -> (timed call, untimed setup, untimed teardown)
+CASES = {
+    "process_expense": (
+        lambda g: record_expense.sync(*new_expense(g)),
+        None,
+        lambda g: undo_expenses.sync(g.id),
+    ),
+    "undo": (
+        lambda g: undo_expenses.sync(g.id),
+        lambda g: record_expense.sync(*new_expense(g)),
+        None,
+    ),
+    "spending_process.all": (lambda g: get_group_spending.sync(g.id), None, None),
+    "spending_process.member": (lambda g: get_member_spending.sync(g.id, g.members[1]), None, None),
+    "spending_process.member_category": (
+        lambda g: get_member_category_spending.sync(g.id, g.members[1], "category1"), None, None,
+    ),
+    "show_balance": (lambda g: (get_base_currency.sync(g.id), get_balances.sync(g.id)), None, None),
+    "show_balance.member": (lambda g: (get_base_currency.sync(g.id), get_member_balance.sync(g.id, g.members[1])), None, None),
+    "show_expenses": (lambda g: get_expense_page.sync(g.id, EXPENSES_PAGE_SIZE), None, None),
+    "show_expenses.middle_page": (lambda g: get_expense_page.sync(g.id, EXPENSES_PAGE_SIZE, g.middle_page), None, None),
+    "export_expenses": (export, None, None),
+    # The rates lookup is served from the shared cache, so only the database side is timed
+    "find_currency.rebase": (
+        lambda g: change_currency.sync(g.id, "USD", 0.74),
+        None,
+        lambda g: change_currency.sync(g.id, "SGD", 1),
+    ),
+}
+
+
+def run_case(group, case, repeat):
+    """Timings in milliseconds of `repeat` runs, after one untimed warm-up run."""
+    call, setup, teardown = case
+    timings = []
+    for attempt in range(repeat + 1):
+        if setup:
+            setup(group)
+        start = time.perf_counter()
+        call(group)
+        elapsed = (time.perf_counter() - start) * 1000
+        if teardown:
+            teardown(group)
+        if attempt:
+            timings.append(elapsed)
+    return timings
+
+def summarise(timings):
+    ordered = sorted(timings)
+    return {
+        "median_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[max(0, round(0.95 * len(ordered)) - 1)], 3),
+        "runs": len(ordered),
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def machine():
+    """Where the numbers come from, stored with a baseline since timings only compare on the same setup."""
+    with transaction() as cursor:
+        cursor.execute("SHOW server_version;")
+        postgres = cursor.fetchone()[0]
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "postgres": postgres,
+    }
+
+def compare(results, baseline, threshold):
+    """Print each case against the baseline's median; returns the (scale, case) pairs that regressed."""
+    regressions = []
+    print(f"\n{'expenses':>9} {'case':<34} {'baseline ms':>12} {'now ms':>9} {'ratio':>7}")
+    for scale, cases in results.items():
+        for name, summary in cases.items():
+            before = baseline.get("results", {}).get(scale, {}).get(name)
+            if before is None:
+                continue
+            ratio = summary["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+            flag = "  REGRESSION" if ratio > threshold else ""
+            if flag:
+                regressions.append((scale, name))
+            print(f"{scale:>9} {name:<34} {before['median_ms']:>12.2f} {summary['median_ms']:>9.2f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the expense engine's database paths at scale.")
+    parser.add_argument("--scales", default=",".join(str(scale) for scale in SCALES), help="Comma-separated expenses per group")
+    parser.add_argument("--members", type=int, help="Members per group, instead of the scale's default")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=float, default=0.42, help="Postgres setseed() value for the synthetic data")
+    parser.add_argument("--cases", help="Comma-separated case names; all by default")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Write these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Median slowdown counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--keep", action="store_true", help="Leave the seeded groups in the database")
+    args = parser.parse_args()
+    if STORAGE_BACKEND != "postgres":
+        print(f"Skipped: STORAGE_BACKEND is {STORAGE_BACKEND!r}; the benchmark seeds groups with Postgres SQL.")
+        return
+
+    cases = {name: CASES[name] for name in args.cases.split(",")} if args.cases else CASES
+    results = {}
+    try:
+        setup = machine()
+        for scale in (int(value) for value in args.scales.split(",")):
+            members = args.members or SCALES.get(scale, min(1_000, max(10, scale // 100)))
+            group = Group(scale, members)
+
+            start = time.perf_counter()
+            group.seed(args.seed)
+            print(f"\n{scale} expenses, {members} members (seeded in {time.perf_counter() - start:.1f}s)")
+            print(f"{'case':<34} {'median ms':>10} {'p95 ms':>9}")
+
+            results[str(scale)] = {}
+            for name, case in cases.items():
+                summary = summarise(run_case(group, case, args.repeat))
+                results[str(scale)][name] = summary
+                print(f"{name:<34} {summary['median_ms']:>10.2f} {summary['p95_ms']:>9.2f}")
+
+            if not args.keep:
+                group.drop()
+    finally:
+        shutdown_executor()
+        close_pool()
+
+    regressions = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        print(f"\nBaseline from {baseline.get('recorded_at')} (revision {baseline.get('revision')})")
+        if baseline.get("machine") != setup:
+            print(f"Recorded on {baseline.get('machine')}, now on {setup}; ratios are only indicative.")
+        regressions = compare(results, baseline, args.threshold)
+    elif not args.save_baseline:
+        print(f"\nNo baseline at {args.baseline}; record one with --save-baseline.")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as file:
+            json.dump({
+                "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "revision": git_revision(),
+                "repeat": args.repeat,
+                "seed": args.seed,
+                "machine": setup,
+                "results": results,
+            }, file, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import argparse, random, time
+from decimal import Decimal
+from telebot.engine.expense.settlement_engine import plan_settlement, greedy_transfers, exact_transfers, to_cents
+
+#Settlement engine benchmark across group sizes.
+#Run from the repository root:   python -m benchmarks.bench_settlement [--repeat N] [--seed S]
+
+SIZES = [5, 10, 12, 50, 100, 1000, 5000, 10000]
+
+
+def random_balances(size, rng):
+    """Balanced {username: Decimal} for a group of the given size, like a trip's worth of expenses."""
+    cents = [rng.randint(-50000, 50000) for _ in range(size - 1)]
+    cents.append(-sum(cents))
+    return {f"member{i}": Decimal(value) / 100 for i, value in enumerate(cents)}
+
+def time_call(func, repeat):
+    """Best wall time of repeat calls in milliseconds, and the last result."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the settlement engine.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'members':>8} {'plan ms':>9} {'transfers':>10} {'greedy ms':>10} {'greedy':>7} {'exact ms':>9} {'exact':>6}")
+
+    for size in SIZES:
+        balances = random_balances(size, rng)
+        cents = to_cents(balances)
+
+        plan_ms, (transfers, _) = time_call(lambda: plan_settlement(balances), args.repeat)
+        greedy_ms, greedy = time_call(lambda: greedy_transfers(cents), args.repeat)
+
+        exact_ms, exact = "-", "-"
+        if size <= 16:
+            # Unbounded budget so the exact optimiser's own cost is visible past the default cutoff
+            ms, result = time_call(lambda: exact_transfers(cents, time_budget=60), 1)
+            exact_ms, exact = f"{ms:.2f}", len(result)
+
+        print(f"{size:>8} {plan_ms:>9.2f} {len(transfers):>10} {greedy_ms:>10.2f} {len(greedy):>7} {exact_ms:>9} {exact:>6}")
+
+
+if __name__ == "__main__":
+    main()
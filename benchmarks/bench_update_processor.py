@@ -0,0 +1,112 @@
+import argparse, asyncio, time
+from datetime import datetime, timezone
+from telegram import Update
+from telebot.processor import PerChatUpdateProcessor, chat_key
+from telebot.dispatcher import UpdateDispatcher
+
+#Throughput of the per-chat update processor as the number of active chats grows, and how long
+#quiet chats wait while one chat sends a burst of updates, both called directly and through the
+#UpdateDispatcher that queue mode (the default) puts in front of it.
+#Each update's handler awaits --latency seconds, standing in for database and Bot API calls.
+#Run from the repository root:   python -m benchmarks.bench_update_processor [--concurrency 16]
+
+CHATS = [1, 2, 4, 8, 16, 32, 64]
+COLD_CHATS = [1, 4, 16, 64]
+HOT_CHAT = -1
+
+
+class SlotFirstUpdateProcessor(PerChatUpdateProcessor):
+    """PTB's ordering: a concurrency slot first, then the chat's lock, so waiting updates hold slots."""
+
+    async def process_update(self, update, coroutine):
+        async with self._slots:
+            lock = self._locks.setdefault(chat_key(update), [asyncio.Lock(), 0])[0]
+            async with lock:
+                await coroutine
+
+
+def make_update(update_id, chat_id):
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(datetime.now(timezone.utc).timestamp()),
+            "chat": {"id": chat_id, "type": "group"},
+            "text": "/show_balance",
+        },
+    }, None)
+
+async def run(processor, updates, latency, dispatcher=False):
+    """Process every update concurrently through `processor`, submitted to an UpdateDispatcher if `dispatcher`.
+
+    Returns (seconds, order violations, {chat id: seconds until its last update finished}).
+    """
+    seen = {}
+    finished = {}
+
+    async def handle(update):
+        await asyncio.sleep(latency)
+        seen.setdefault(update.effective_chat.id, []).append(update.update_id)
+        finished[update.effective_chat.id] = time.perf_counter() - start
+
+    await processor.initialize()
+    start = time.perf_counter()
+    if dispatcher:
+        queue = UpdateDispatcher(lambda update: processor.process_update(update, handle(update)), queue_size=len(updates))
+        queue.start()
+        for update in updates:
+            queue.submit(update)
+        await queue.stop(timeout=None)
+    else:
+        await asyncio.gather(*(processor.process_update(update, handle(update)) for update in updates))
+    elapsed = time.perf_counter() - start
+    await processor.shutdown()
+
+    violations = sum(ids != sorted(ids) for ids in seen.values())
+    return elapsed, violations, finished
+
+async def main(updates_per_run, concurrency, latency):
+    print(f"{updates_per_run} updates, {latency * 1000:.0f}ms per update, concurrency {concurrency}")
+    print(f"{'chats':>6} {'sequential/s':>13} {'per-chat/s':>11} {'speedup':>8} {'out of order':>13}")
+
+    for chats in CHATS:
+        updates = [make_update(i, -1000 - i % chats) for i in range(updates_per_run)]
+
+        # One at a time, as the application processed updates before
+        sequential, _, _ = await run(PerChatUpdateProcessor(1), updates, latency)
+        concurrent, violations, _ = await run(PerChatUpdateProcessor(concurrency), updates, latency)
+
+        print(
+            f"{chats:>6} {updates_per_run / sequential:>13.0f} {updates_per_run / concurrent:>11.0f} "
+            f"{sequential / concurrent:>7.1f}x {violations:>13}"
+        )
+
+    # One chat sends a burst of updates just before N other chats send one each
+    print()
+    print(f"hot chat with {updates_per_run} updates, then one update from each cold chat")
+    print(f"{'cold chats':>10} {'slot first ms':>14} {'chat first ms':>14} {'dispatcher ms':>14}")
+
+    for cold in COLD_CHATS:
+        updates = [make_update(i, HOT_CHAT) for i in range(updates_per_run)]
+        updates += [make_update(updates_per_run + i, -1000 - i) for i in range(cold)]
+
+        waits = []
+        for processor, dispatcher in (
+            (SlotFirstUpdateProcessor(concurrency), False),
+            (PerChatUpdateProcessor(concurrency), False),
+            (PerChatUpdateProcessor(concurrency), True),
+        ):
+            _, _, finished = await run(processor, updates, latency, dispatcher)
+            waits.append(max(seconds for chat_id, seconds in finished.items() if chat_id != HOT_CHAT))
+
+        print(f"{cold:>10} {waits[0] * 1000:>14.0f} {waits[1] * 1000:>14.0f} {waits[2] * 1000:>14.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-chat concurrent update processing.")
+    parser.add_argument("--updates", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.updates, args.concurrency, args.latency))
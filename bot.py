@@ -1,297 +1,46 @@
 from quart import Quart, request
 from telegram import Bot, Update
-from telegram.ext import Application, CommandHandler, CallbackContext, ConversationHandler, filters, MessageHandler, CallbackQueryHandler
-from telebot.credentials import BOT_TOKEN
-from telebot.engine.supabase.database import setup_database
-from telebot.engine.supabase.data_manager import export_expenses
-import os
+from telebot.credentials import BOT_TOKEN, BOT_API_BASE_URL, UPDATE_MODE
+from telebot.engine.storage.data_manager import check_schema, close_storage, storage_stats
+from telebot.engine.storage.cache import roster_cache
+from telebot.executor import shutdown_executor
+from telebot.dispatcher import UpdateDispatcher, QueueFullError
+from telebot.rates import rate_service
+from telebot.cleanup import message_cleanup
+from telebot.metrics import loop_lag_monitor, event_loop_lag, event_loop_lag_max, render
+from telebot.handlers import build_application, register_handlers
+from telebot.processor import process_update
+import os, sys
 import requests
 import asyncio
 import httpx, logging
 
-from telebot.engine.setup.base import(
-    bot_start,
-    help
-)
-
-from telebot.engine.setup.admin import (
-    add_admin,
-    remove_admin,
-    show_admins,
-    delete_all_start,
-    delete_all_password,
-    delete_all_confirm,
-    delete_all_cancel,
-    DELETE_ALL_GIVE_PASSWORD,
-    DELETE_ALL_CONFIRMATION
-)
-
-from telebot.engine.expense.settle import(
-    settle_all_start, 
-    settle_all_confirm, 
-    settle_all_cancel, 
-    SETTLE_CONFIRMATION,
-)
-
-from telebot.engine.setup.members import(
-    add_member,
-    specify_member,
-    add_member_cancel,
-    MEMBER_CONFIRMATION,
-    remove_member_start,
-    remove_member_specify,
-    remove_member_cancel,
-    REMOVE_MEMBER_CONFIRMATION, 
-    show_members,
-    remove_all_cancel,
-    remove_all_start,
-    remove_all_confirm,
-    REMOVE_CONFIRMATION
-)
-
-from telebot.engine.expense.show import(
-    show_expenses, 
-    show_balance,
-    show_spending,
-    spending_category,
-    spending_individual,
-    show_spending_cancel,
-    CATEGORY,
-    INDIVIDUAL,
-    show_categories
-)
-
-from telebot.engine.expense.add_expense import(
-    add_expense,
-    add_purpose,
-    add_payer,
-    add_amount,
-    add_beneficiaries,
-    add_split,
-    add_expense_cancel,
-    PURPOSE,
-    PAYER,
-    AMOUNT,
-    BENEFICIARIES,
-    SPLIT,
-    undo
-)
-
-from telebot.engine.expense.currency import(
-    set_currency,
-    find_currency,
-    set_currency_cancel,
-    CURRENCY_CONFIRMATION,
-    valid_currencies,
-    show_currency,
-    #convert_currency
-)
-
-from telebot.engine.expense.categorise import(
-    create_category,
-    name_category,
-    create_category_cancel,
-    CATEGORY_CONFIRMATION,
-    update_category,
-    expense_category,
-    expense_name,
-    update_category_cancel,
-    EXPENSE,
-    CATEGORY,
-)
-
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Set up database for each unique group ID at the start of activation
-setup_database()
+# On Postgres, schema changes are applied once per deploy with `python -m telebot.engine.supabase.migrate upgrade`
+# and workers only confirm the database is at the expected version; the SQLite backend creates its schema here.
+# A worker on an older schema would fail request by request, so refuse to start instead (the reason is logged)
+if not check_schema():
+    sys.exit(1)
 application = None
+dispatcher = None
 
 # Initialize Quart app
 app = Quart(__name__)
 
 # Initialize Telegram Bot Application
 async def init_application():
-    global application
-    application = Application.builder().token(BOT_TOKEN).build()
-    await application.initialize()  # This prepares the application asynchronously
-    logger.info("Telegram Bot Application initialized successfully.")
-
-    # Register commands
-    application.add_handler(CommandHandler("start", bot_start))
-    application.add_handler(CommandHandler("help", help))
-    application.add_handler(CallbackQueryHandler(help, pattern="^help$"))
-
-    application.add_handler(CommandHandler("show_members", show_members))
-
-    application.add_handler(CommandHandler("undo", undo))
-
-    application.add_handler(CommandHandler("show_balance", show_balance))
-    application.add_handler(CommandHandler("show_expenses", show_expenses))
-    application.add_handler(CommandHandler("show_categories", show_categories))
-
-    application.add_handler(CommandHandler("add_admin", add_admin))
-    application.add_handler(CommandHandler("remove_admin", remove_admin))
-    application.add_handler(CommandHandler("show_admins", show_admins))
-
-    application.add_handler(CommandHandler("show_currency", show_currency))
-    #application.add_handler(CommandHandler("set_currency", set_currency))
-    application.add_handler(CommandHandler("valid_currencies", valid_currencies))
-    #application.add_handler(CommandHandler("convert_currency", convert_currency))
-
-    application.add_handler(CommandHandler("export_expenses", export_expenses))
-
-    
-
-    #/settle_all command
-    settle_all_conv_handler = ConversationHandler(
-        entry_points=[CommandHandler("settle_all", settle_all_start)],
-        states={
-            SETTLE_CONFIRMATION: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, settle_all_confirm),  # Only plain text (not commands)
-            ],
-        },
-        fallbacks=[CommandHandler("cancel", settle_all_cancel)],
-    ) 
-
-    application.add_handler(settle_all_conv_handler)
-
-    #/add_member command
-    add_member_conv_handler = ConversationHandler(
-        entry_points=[
-            CommandHandler("add_member", add_member),
-            CallbackQueryHandler(add_member, pattern="^add_member$"),  # Triggered by inline button
-        ],
-        states={
-            MEMBER_CONFIRMATION: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, specify_member),  # Only plain text (not commands)
-            ],
-        },
-        fallbacks=[CommandHandler("cancel", add_member_cancel)],
-    ) 
-
-    application.add_handler(add_member_conv_handler)
-
-    #/remove_member command
-    remove_member_conv_handler = ConversationHandler(
-        entry_points=[
-            CommandHandler("remove_member", remove_member_start)],
-        states={
-            REMOVE_MEMBER_CONFIRMATION: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, remove_member_specify),  # Only plain text (not commands)
-            ],
-        },
-        fallbacks=[CommandHandler("cancel", remove_member_cancel)],
-    ) 
-
-    application.add_handler(remove_member_conv_handler)
-
-    #remove_all_members command
-    remove_all_conv_handler = ConversationHandler(
-        entry_points=[CommandHandler("remove_all_members", remove_all_start)],
-        states={
-            REMOVE_CONFIRMATION: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, remove_all_confirm),  # Only plain text (not commands)
-            ],
-        },
-        fallbacks=[CommandHandler("cancel", remove_all_cancel)],
-    )
-
-    application.add_handler(remove_all_conv_handler)
-
-    #/delete_all_data command
-    delete_all_conv_handler = ConversationHandler(
-        entry_points=[CommandHandler("delete_all", delete_all_start)],
-        states={
-            DELETE_ALL_GIVE_PASSWORD: [MessageHandler(filters.TEXT & ~filters.COMMAND, delete_all_password)],
-
-            DELETE_ALL_CONFIRMATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, delete_all_confirm)],  # Only plain text (not commands)
-        },
-        fallbacks=[CommandHandler("cancel", delete_all_cancel)],
-    ) 
-
-    application.add_handler(delete_all_conv_handler)
-
-    #add_expense command
-    expense_conv_handler = ConversationHandler(
-    entry_points=[
-        CommandHandler('add_expense', add_expense),
-        CallbackQueryHandler(add_expense, pattern="^add_expense$"),
-        ],
-    states={
-        PURPOSE: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_purpose)],
-        PAYER: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_payer)],
-        AMOUNT: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_amount)],
-        BENEFICIARIES: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_beneficiaries)],
-        SPLIT: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_split)],
-    },
-    fallbacks=[CommandHandler('cancel', add_expense_cancel)],  # Optional: Implement cancel command
-    ) 
-
-    application.add_handler(expense_conv_handler)
-
-    #/set_currency command
-    set_currency_handler = ConversationHandler(
-        entry_points=[
-            CommandHandler("set_currency", set_currency),
-            CallbackQueryHandler(set_currency, pattern="^set_currency$"),  # Triggered by inline button
-        ],
-        states={
-            CURRENCY_CONFIRMATION: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, find_currency),  # Only plain text (not commands)
-            ],
-        },
-        fallbacks=[CommandHandler("cancel", set_currency_cancel)],
-    ) 
-
-    application.add_handler(set_currency_handler)
-
-    #/create_category command
-    create_category_conv_handler = ConversationHandler(
-        entry_points=[
-            CommandHandler("create_category", create_category),
-        ],
-        states={
-            CATEGORY_CONFIRMATION: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, name_category),  # Only plain text (not commands)
-            ],
-        },
-        fallbacks=[CommandHandler("cancel", create_category_cancel)],
-    ) 
-
-    application.add_handler(create_category_conv_handler)
-
-    #update_category command
-    update_category_conv_handler = ConversationHandler(
-    entry_points=[
-        CommandHandler('update_category', update_category),
-        ],
-    states={
-        CATEGORY: [MessageHandler(filters.TEXT & ~filters.COMMAND, expense_category)],
-        EXPENSE: [MessageHandler(filters.TEXT & ~filters.COMMAND, expense_name)],
-    },
-    fallbacks=[CommandHandler('cancel', update_category_cancel)],  # Optional: Implement cancel command
-    ) 
-
-    application.add_handler(update_category_conv_handler)
-
+    global application, dispatcher
+    application = build_application()
+    register_handlers(application)
+    await application.initialize()  # This prepares the application asynchronously and loads persisted conversations
+    await application.start()       # Runs the periodic persistence updates; updates still arrive through /webhook
+    if UPDATE_MODE == "queue":
+        dispatcher = UpdateDispatcher(lambda update: process_update(application, update))
     logger.info("Telegram Bot Application initialized successfully.")
 
-    #show_spending command
-    show_spending_conv_handler = ConversationHandler(
-    entry_points=[
-        CommandHandler('show_spending', show_spending),
-        ],
-    states={
-        CATEGORY: [MessageHandler(filters.TEXT & ~filters.COMMAND, spending_category)],
-        INDIVIDUAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, spending_individual)],
-    },
-    fallbacks=[CommandHandler('cancel', show_spending_cancel)],  # Optional: Implement cancel command
-    ) 
-
-    application.add_handler(show_spending_conv_handler)
-
 # Ensure the webhook is set correctly
 async def set_webhook():
     WEBHOOK_URL = os.environ.get("WEBHOOK_URL")
@@ -300,7 +49,7 @@ async def set_webhook():
 
     async with httpx.AsyncClient() as client:
         response = await client.post(
-            f'https://api.telegram.org/bot{BOT_TOKEN}/setWebhook',
+            f'{BOT_API_BASE_URL}{BOT_TOKEN}/setWebhook',
             json={"url": WEBHOOK_URL},
         )
         if response.status_code == 200:
@@ -316,15 +65,68 @@ async def webhook():
         logger.error("Application is not initialized. Unable to process the update.")
         return "Service Unavailable", 503
 
+    data = await request.get_json(silent=True)
+    if not isinstance(data, dict) or "update_id" not in data:
+        return "Bad Request", 400
+
     try:
+        update = Update.de_json(data, application.bot)
+
+        # Queue mode: acknowledge as soon as the update is accepted; it is processed in the background
+        if dispatcher is not None:
+            dispatcher.submit(update)
+            return "OK", 200
+
         # Process the incoming update from Telegram
-        update = Update.de_json(await request.get_json(), application.bot)
-        await application.process_update(update)
+        await process_update(application, update)
         return "OK", 200
+    except QueueFullError as e:
+        # Telegram redelivers on non-2xx, so a full queue pushes back on it
+        logger.warning(f"Rejecting update: {e}")
+        return "Service Unavailable", 503
     except Exception as e:
         logger.error(f"Error processing update: {e}")
         return "Internal Server Error", 500
 
+# Liveness check exposing event loop lag and database pool usage
+@app.route('/health', methods=['GET'])
+async def health():
+    return {
+        "status": "ok" if application is not None else "starting",
+        "event_loop_lag_seconds": event_loop_lag.get(),
+        "event_loop_lag_max_seconds": event_loop_lag_max.get(),
+        "db_pool": storage_stats(),
+        "update_queue_depth": dispatcher.depth() if dispatcher is not None else 0,
+        "roster_cache": {"hits": roster_cache.hits, "misses": roster_cache.misses},
+    }, 200
+
+# Prometheus scrape target: handler, database and Bot API latency, queue depths, pool usage
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    return render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@app.before_serving
+async def startup():
+    loop_lag_monitor.start()
+    if dispatcher is not None:
+        dispatcher.start()
+
+# Drain queued updates, then release pooled database connections, worker threads and the rates HTTP client when the server stops
+@app.after_serving
+async def shutdown():
+    # Finish queued updates first, while the pool and executor they need are still up
+    if dispatcher is not None:
+        await dispatcher.stop()
+    await loop_lag_monitor.stop()
+    await rate_service.aclose()
+    await message_cleanup.stop()
+    if application is not None:
+        # Hands the last changes to persistence and flushes them
+        await application.stop()
+        await application.shutdown()
+    shutdown_executor()
+    close_storage()
+
 # Asynchronous entry point for setting webhook and running the app
 async def main():
     await init_application()
@@ -0,0 +1,138 @@
+from telegram import Update
+from telegram.error import TelegramError, RetryAfter
+from telebot.credentials import POLL_LIMIT, POLL_TIMEOUT, UPDATE_MODE, UPDATE_QUEUE_SIZE
+from telebot.engine.storage.data_manager import check_schema, close_storage
+from telebot.executor import shutdown_executor
+from telebot.dispatcher import UpdateDispatcher, QueueFullError
+from telebot.rates import rate_service
+from telebot.cleanup import message_cleanup
+from telebot.metrics import loop_lag_monitor
+from telebot.handlers import build_application, register_handlers
+from telebot.processor import process_update
+import argparse, asyncio, logging, signal, sys
+
+#Long-polling alternative to the webhook server in bot.py, running the same handlers.
+#Useful without a public URL, against tools/fake_bot_api.py, or to fail over from a degraded webhook:
+#
+#   python poll.py [--limit 100] [--timeout 30]
+#
+#The webhook is deleted on start (Telegram refuses getUpdates while one is set); run bot.py again to restore it.
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF = 30  # Seconds between retries while the Bot API is unreachable
+
+
+async def poll(application, process, state, limit=POLL_LIMIT, timeout=POLL_TIMEOUT):
+    """Fetch updates in batches of up to `limit` and hand each to `process`, forever.
+
+    state["offset"] tracks the first update not yet handed over, so it survives cancellation.
+    """
+    backoff = 1
+
+    while True:
+        try:
+            updates = await application.bot.get_updates(
+                offset=state["offset"],
+                limit=limit,
+                timeout=timeout,
+                read_timeout=timeout + 10,  # The server holds the request open for up to `timeout`
+                allowed_updates=Update.ALL_TYPES,
+            )
+            backoff = 1
+
+        except RetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            continue
+
+        except TelegramError as e:
+            logger.warning(f"getUpdates failed ({e}); retrying in {backoff}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+            continue
+
+        # Advancing the offset confirms the update: the next call only returns updates after it
+        for update in updates:
+            await process(update)
+            state["offset"] = update.update_id + 1
+
+async def main(limit, timeout):
+    # Refuse to start on an outdated schema, as bot.py does; check_schema() logs why
+    if not check_schema():
+        sys.exit(1)
+
+    application = build_application()
+    register_handlers(application)
+    await application.initialize()
+    await application.start()  # Periodic persistence updates; updates come from poll() below
+
+    # Queue mode: updates of different chats are processed concurrently, each chat in order
+    dispatcher = None
+    if UPDATE_MODE == "queue":
+        dispatcher = UpdateDispatcher(lambda update: process_update(application, update))
+        dispatcher.start()
+
+    tasks = set()
+
+    async def process(update):
+        if dispatcher is None:
+            # Inline mode: the update processor bounds concurrency and keeps each chat in order.
+            # Updates waiting for their chat still hold a task, so stop fetching past UPDATE_QUEUE_SIZE of them
+            while len(tasks) >= UPDATE_QUEUE_SIZE:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            task = asyncio.create_task(process_update(application, update))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            return
+
+        # Wait for room instead of dropping; the offset only advances past updates already queued
+        while True:
+            try:
+                dispatcher.submit(update)
+                return
+            except QueueFullError:
+                await asyncio.sleep(0.05)
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+
+    await application.bot.delete_webhook(drop_pending_updates=False)
+    logger.info(f"Polling for updates (limit={limit}, timeout={timeout}s).")
+    loop_lag_monitor.start()
+
+    state = {"offset": None}
+    poller = asyncio.create_task(poll(application, process, state, limit, timeout))
+    await stopping.wait()
+    poller.cancel()
+    await asyncio.gather(poller, return_exceptions=True)
+
+    # Confirm everything handed over, so a restart does not receive it again
+    if state["offset"] is not None:
+        try:
+            await application.bot.get_updates(offset=state["offset"], limit=1, timeout=0)
+        except TelegramError as e:
+            logger.warning(f"Could not confirm the last updates: {e}")
+
+    # Same shutdown order as the webhook server
+    if dispatcher is not None:
+        await dispatcher.stop()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await loop_lag_monitor.stop()
+    await rate_service.aclose()
+    await message_cleanup.stop()
+    await application.stop()
+    await application.shutdown()
+    shutdown_executor()
+    close_storage()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the bot with long polling instead of a webhook.")
+    parser.add_argument("--limit", type=int, default=POLL_LIMIT, help="Updates per getUpdates call (1-100)")
+    parser.add_argument("--timeout", type=int, default=POLL_TIMEOUT, help="Seconds each getUpdates call may wait")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.limit, args.timeout))
@@ -0,0 +1,93 @@
+import asyncio, logging
+from telegram.error import TelegramError
+from telebot.credentials import CLEANUP_FLUSH_INTERVAL
+from telebot.metrics import Counter, Gauge
+from telebot.scheduler import LOW_PRIORITY
+
+#Deletes the prompts and answers of conversation steps in the background.
+#Handlers queue messages with delete_later() and carry on; a flusher removes them in bulk with
+#deleteMessages (up to 100 per chat per call) every CLEANUP_FLUSH_INTERVAL seconds.
+#A message that cannot be deleted (already gone, too old, no rights) is counted and skipped.
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH = 100  # Bot API limit for deleteMessages
+
+messages_deleted = Counter("cleanup_messages_deleted_total", "Messages removed by the cleanup queue")
+messages_failed = Counter("cleanup_messages_failed_total", "Messages the cleanup queue could not remove")
+cleanup_pending = Gauge("cleanup_messages_pending", "Messages queued for deletion")
+
+
+class MessageCleanup:
+    def __init__(self, interval=CLEANUP_FLUSH_INTERVAL):
+        self.interval = interval
+        self.bot = None
+        self._pending = {}  # chat_id -> message ids, in the order they were queued
+        self._task = None
+
+    def pending(self):
+        return sum(len(message_ids) for message_ids in self._pending.values())
+
+    def delete_later(self, bot, *messages):
+        """Queue messages for deletion. None entries are ignored, so optional prompts can be passed as they are."""
+        self.bot = bot
+        for message in messages:
+            if message is not None:
+                self._pending.setdefault(message.chat_id, []).append(message.message_id)
+        cleanup_pending.set(self.pending())
+
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            self._task.add_done_callback(self._stopped)
+
+    def _stopped(self, task):
+        # Should the flusher end anyway (e.g. cancelled by a scheduler shutdown), the next delete_later starts a new one
+        if self._task is task:
+            self._task = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Message cleanup stopped: {task.exception()}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Message cleanup flush failed: {e}")
+
+    async def flush(self):
+        """Delete everything queued so far, one deleteMessages call per chat and 100 messages."""
+        batches, self._pending = self._pending, {}
+        cleanup_pending.set(0)
+
+        for chat_id, message_ids in batches.items():
+            for start in range(0, len(message_ids), MAX_BATCH):
+                chunk = message_ids[start:start + MAX_BATCH]
+                try:
+                    # Behind any conversation reply waiting for a rate limit token
+                    await self.bot.delete_messages(chat_id=chat_id, message_ids=chunk, rate_limit_args={"priority": LOW_PRIORITY})
+                    messages_deleted.inc(len(chunk))
+                except TelegramError as e:
+                    # Telegram fails the whole call if none could be deleted; nothing is retried
+                    messages_failed.inc(len(chunk))
+                    logger.info(f"Could not delete {len(chunk)} message(s) in chat {chat_id}: {e}")
+                except Exception as e:
+                    # Anything else (e.g. a network error) must not cost the other chats their flush
+                    messages_failed.inc(len(chunk))
+                    logger.warning(f"Failed to delete {len(chunk)} message(s) in chat {chat_id}: {e}")
+
+    async def stop(self):
+        """Stop the flusher after a last flush, while the bot can still make requests."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pending:
+            await self.flush()
+
+
+message_cleanup = MessageCleanup()
+
+def delete_later(context, *messages):
+    """Queue messages of a conversation step for background deletion."""
+    message_cleanup.delete_later(context.bot, *messages)
@@ -14,4 +14,73 @@ SUPABASE_DB_NAME = os.environ.get("SUPABASE_DB_NAME")
 SUPABASE_DB_USER = os.environ.get("SUPABASE_DB_USER")
 SUPABASE_DB_PASSWORD = os.environ.get("SUPABASE_DB_PASSWORD")
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SUPABASE_API_KEY = os.environ.get("SUPABASE_API_KEY")
\ No newline at end of file
+SUPABASE_API_KEY = os.environ.get("SUPABASE_API_KEY")
+
+# Storage backend: "postgres" (Supabase, below) or "sqlite" (one local file, for development and single-node deployments)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "postgres").lower()
+
+# SQLite: database file, seconds a writer waits for the write lock, page cache (KiB) and memory-mapped I/O (bytes) per connection
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "expensplit.db")
+SQLITE_BUSY_TIMEOUT = float(os.environ.get("SQLITE_BUSY_TIMEOUT", 5))
+SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", 64 * 1024))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+
+# Database connection pool
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 5))                             # Seconds to wait for a free connection
+DB_POOL_HEALTHCHECK_INTERVAL = float(os.environ.get("DB_POOL_HEALTHCHECK_INTERVAL", 30))  # Ping connections idle for longer than this
+
+# Worker threads for blocking database and HTTP calls (defaults to one per pooled connection)
+BLOCKING_WORKERS = int(os.environ.get("BLOCKING_WORKERS", DB_POOL_MAX))
+LOOP_LAG_INTERVAL = float(os.environ.get("LOOP_LAG_INTERVAL", 1))          # Seconds between event-loop lag samples
+LOOP_LAG_WARN_THRESHOLD = float(os.environ.get("LOOP_LAG_WARN_THRESHOLD", 0.1))
+
+# Per-group participants/admins cache
+ROSTER_CACHE_MAX_GROUPS = int(os.environ.get("ROSTER_CACHE_MAX_GROUPS", 1024))
+ROSTER_CACHE_TTL = float(os.environ.get("ROSTER_CACHE_TTL", 300))  # Seconds; bounds staleness across workers
+
+# Balance ledger: snapshot a group once this many entries have accumulated since its last snapshot
+LEDGER_SNAPSHOT_INTERVAL = int(os.environ.get("LEDGER_SNAPSHOT_INTERVAL", 500))
+
+# CSV export: rows fetched per round trip, and bytes kept in memory before spilling to an anonymous temp file
+EXPORT_FETCH_SIZE = int(os.environ.get("EXPORT_FETCH_SIZE", 2000))
+EXPORT_SPOOL_MAX_SIZE = int(os.environ.get("EXPORT_SPOOL_MAX_SIZE", 1024 * 1024))
+
+# Exchange rates, shared by every group: upstream endpoint, how long a fetch stays fresh, and how long to back off after a failed refresh
+EXCHANGE_RATE_API_URL = os.environ.get("EXCHANGE_RATE_API_URL", "https://v6.exchangerate-api.com/v6/df74fed3c85165b35fe0b792/latest/SGD")
+EXCHANGE_RATE_TTL = float(os.environ.get("EXCHANGE_RATE_TTL", 3600))
+EXCHANGE_RATE_TIMEOUT = float(os.environ.get("EXCHANGE_RATE_TIMEOUT", 10))
+EXCHANGE_RATE_RETRY_INTERVAL = float(os.environ.get("EXCHANGE_RATE_RETRY_INTERVAL", 60))
+
+# Webhook ingestion: "queue" acknowledges updates at once and processes them in the background, "inline" processes them before replying
+UPDATE_MODE = os.environ.get("UPDATE_MODE", "queue")
+UPDATE_CONCURRENCY = int(os.environ.get("UPDATE_CONCURRENCY", 16))                  # Updates processed at once across chats; one at a time per chat
+UPDATE_QUEUE_SIZE = int(os.environ.get("UPDATE_QUEUE_SIZE", 1000))      # Updates accepted but unfinished; beyond that the webhook answers 503
+UPDATE_DRAIN_TIMEOUT = float(os.environ.get("UPDATE_DRAIN_TIMEOUT", 10))  # Seconds to finish queued updates on shutdown
+
+# Bot API endpoint; point at tools/fake_bot_api.py (e.g. http://127.0.0.1:8082/bot) to run without Telegram
+BOT_API_BASE_URL = os.environ.get("BOT_API_BASE_URL", "https://api.telegram.org/bot")
+
+# Long polling (poll.py): updates per getUpdates call and seconds the server may hold each call open
+POLL_LIMIT = int(os.environ.get("POLL_LIMIT", 100))
+POLL_TIMEOUT = int(os.environ.get("POLL_TIMEOUT", 30))
+
+# Conversation/user_data/chat_data persistence: how often PTB hands over changes, and how long writes are batched before a flush
+PERSISTENCE_UPDATE_INTERVAL = float(os.environ.get("PERSISTENCE_UPDATE_INTERVAL", 5))
+PERSISTENCE_FLUSH_DELAY = float(os.environ.get("PERSISTENCE_FLUSH_DELAY", 1))
+
+# Seconds between bulk deletions of conversation prompts and answers
+CLEANUP_FLUSH_INTERVAL = float(os.environ.get("CLEANUP_FLUSH_INTERVAL", 0.5))
+
+# Outbound Bot API requests: overall requests per second, new messages per second in a private chat and per minute in a group,
+# and how often a request answered 429 is retried after its retry_after
+OUTBOUND_GLOBAL_RATE = float(os.environ.get("OUTBOUND_GLOBAL_RATE", 30))
+OUTBOUND_CHAT_RATE = float(os.environ.get("OUTBOUND_CHAT_RATE", 1))
+OUTBOUND_GROUP_RATE = float(os.environ.get("OUTBOUND_GROUP_RATE", 20))
+OUTBOUND_MAX_RETRIES = int(os.environ.get("OUTBOUND_MAX_RETRIES", 3))
+
+# Statements at least this many seconds long are logged with their fingerprint
+SLOW_QUERY_THRESHOLD = float(os.environ.get("SLOW_QUERY_THRESHOLD", 0.25))
+# Fail updates whose handlers run more statements than their @query_budget; meant for tests and load tests
+QUERY_BUDGET_ENFORCE = os.environ.get("QUERY_BUDGET_ENFORCE", "").lower() in ("1", "true", "yes")
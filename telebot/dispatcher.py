@@ -0,0 +1,72 @@
+import asyncio, logging
+from telebot.credentials import UPDATE_QUEUE_SIZE, UPDATE_DRAIN_TIMEOUT
+from telebot.metrics import Counter, Gauge
+
+#Queue between the webhook and the handlers, so Telegram gets its 200 as soon as an update is accepted.
+#Every accepted update becomes its own task, started in arrival order; the update processor then
+#runs each chat's updates one at a time in that order (PerChatUpdateProcessor) and bounds how many
+#run at once (UPDATE_CONCURRENCY). A chat waiting on a slow export or its rate limit therefore only
+#holds up itself. At most queue_size updates are accepted but unfinished; beyond that submit() refuses.
+
+logger = logging.getLogger(__name__)
+
+update_queue_depth = Gauge("update_queue_depth", "Updates accepted but not yet processed")
+updates_rejected = Counter("updates_rejected_total", "Updates refused because the update queue was full")
+updates_failed = Counter("updates_failed_total", "Updates whose processing raised")
+
+
+class QueueFullError(Exception):
+    """Raised by submit() when the queue has no room; the webhook answers 503 so Telegram retries."""
+
+
+class UpdateDispatcher:
+    def __init__(self, process, queue_size=UPDATE_QUEUE_SIZE):
+        self.process = process  # Coroutine function handling one update, e.g. processor.process_update
+        self.queue_size = queue_size
+        self._tasks = set()     # One per accepted update, until it finishes
+        self._accepting = False
+
+    def depth(self):
+        return len(self._tasks)
+
+    def start(self):
+        self._accepting = True
+
+    def submit(self, update):
+        """Accept an update without waiting for it. Raises QueueFullError when queue_size updates are unfinished."""
+        if not self._accepting:
+            raise QueueFullError("Dispatcher is not accepting updates.")
+        if len(self._tasks) >= self.queue_size:
+            updates_rejected.inc()
+            raise QueueFullError(f"Update queue is full ({self.queue_size} updates).")
+
+        # Tasks start in creation order, so each reaches its chat's lock in arrival order
+        task = asyncio.get_running_loop().create_task(self._run(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+        update_queue_depth.set(self.depth())
+
+    def _done(self, task):
+        self._tasks.discard(task)
+        update_queue_depth.set(self.depth())
+
+    async def _run(self, update):
+        try:
+            await self.process(update)
+        except Exception as e:
+            updates_failed.inc()
+            logger.error(f"Error processing update {update.update_id}: {e}")
+
+    async def stop(self, timeout=UPDATE_DRAIN_TIMEOUT):
+        """Stop accepting updates, let accepted ones finish for up to `timeout` seconds, then cancel the rest."""
+        self._accepting = False
+        if not self._tasks:
+            return
+
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        if pending:
+            logger.warning(f"Dropping {len(pending)} queued update(s) after waiting {timeout}s to drain.")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        update_queue_depth.set(0)
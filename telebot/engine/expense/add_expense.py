@@ -1,6 +1,8 @@
 from telegram import Update
 from telegram.ext import CommandHandler, CallbackContext, ConversationHandler, CallbackQueryHandler, Updater
-from telebot.engine.supabase.data_manager import connect_to_base, is_member
+from telebot.engine.storage.data_manager import is_member, get_participants, record_expense, undo_expenses
+from telebot.engine.storage.querylog import query_budget
+from telebot.cleanup import delete_later
 import asyncio, threading
 #insert_expense, balance, participants, admins, settlement_logs
 
@@ -21,8 +23,7 @@ async def add_purpose(update: Update, context: CallbackContext):
     
     #Auto delete message
     bot_message = context.user_data.get("bot_message")
-    await context.bot.deleteMessage(chat_id=bot_message.chat_id, message_id=bot_message.message_id)
-    await context.bot.deleteMessage(chat_id=update.message.chat_id, message_id=update.message.message_id)
+    delete_later(context, bot_message, update.message)
 
     context.user_data["bot_message"] = await update.effective_chat.send_message("Who paid?")
     
@@ -34,10 +35,9 @@ async def add_payer(update: Update, context: CallbackContext):
 
     #Auto delete message
     bot_message = context.user_data.get("bot_message")
-    await context.bot.deleteMessage(chat_id=bot_message.chat_id, message_id=bot_message.message_id)
-    await context.bot.deleteMessage(chat_id=update.message.chat_id, message_id=update.message.message_id)
+    delete_later(context, bot_message, update.message)
 
-    if not is_member(group_id, payer):
+    if not await is_member(group_id, payer):
         context.user_data["bot_message"] = await update.effective_chat.send_message(f"{payer} is not a member in the group.\nPlease try again or use /cancel to end command before adding them in with /add_member")
         return PAYER
     
@@ -50,8 +50,7 @@ async def add_amount(update:Update, context: CallbackContext):
 
     #Auto delete message
     bot_message = context.user_data.get("bot_message")
-    await context.bot.deleteMessage(chat_id=bot_message.chat_id, message_id=bot_message.message_id)
-    await context.bot.deleteMessage(chat_id=update.message.chat_id, message_id=update.message.message_id)
+    delete_later(context, bot_message, update.message)
 
     try:
         amount = float(amount)
@@ -73,27 +72,19 @@ async def add_beneficiaries(update: Update, context: CallbackContext):
 
     #Auto delete message
     bot_message = context.user_data.get("bot_message")
-    await context.bot.deleteMessage(chat_id=bot_message.chat_id, message_id=bot_message.message_id)
-    await context.bot.deleteMessage(chat_id=update.message.chat_id, message_id=update.message.message_id)
+    delete_later(context, bot_message, update.message)
 
-    connection = connect_to_base()
-    cursor = connection.cursor()
+    participants = await get_participants(group_id)
 
     if beneficiaries_text.lower() == "all":
         # Get all participants in the group
-        cursor.execute("""
-        SELECT username FROM participants WHERE group_id = %s;
-        """, (group_id,))
-        beneficiaries = [row[0] for row in cursor.fetchall()]
+        beneficiaries = participants
         context.user_data["all_beneficiary_message"] = await update.effective_chat.send_message("Amount will be split amongst all beneficiaries, including the payer.")
 
     else:
         # Validate beneficiaries
         beneficiaries = [b.strip() for b in beneficiaries_text.split(",")]
-        cursor.execute("""
-        SELECT username FROM participants WHERE group_id = %s;
-        """, (group_id,))
-        valid_users = {row[0] for row in cursor.fetchall()}
+        valid_users = set(participants)
         invalid_beneficiaries = [b for b in beneficiaries if b not in valid_users]
 
         if invalid_beneficiaries:
@@ -117,17 +108,8 @@ async def add_beneficiaries(update: Update, context: CallbackContext):
 async def add_split(update: Update, context: CallbackContext):
     #Auto delete message
     bot_message = context.user_data.get("bot_message")
-    all_beneficiary_message = context.user_data.get("all_beneficiary_message")
-
-    if all_beneficiary_message:
-        try:
-            await context.bot.deleteMessage(chat_id=all_beneficiary_message.chat_id, message_id=all_beneficiary_message.message_id)
-        except:
-            pass
-
-    if bot_message:
-        await context.bot.deleteMessage(chat_id=bot_message.chat_id, message_id=bot_message.message_id)
-    await context.bot.deleteMessage(chat_id=update.message.chat_id, message_id=update.message.message_id)
+    all_beneficiary_message = context.user_data.pop("all_beneficiary_message", None)
+    delete_later(context, all_beneficiary_message, bot_message, update.message)
 
     split_text = update.message.text.strip()
 
@@ -155,6 +137,7 @@ async def add_split(update: Update, context: CallbackContext):
         context.user_data["bot_message"] = await update.effective_chat.send_message("Invalid amount inputted. Please enter valid numbers to be split.")
         return SPLIT
 
+@query_budget(6)  # record_expense: expense, beneficiaries, ledger lock, ledger entries; lock and snapshot when one is due
 async def process_expense(update: Update, context: CallbackContext):
     """Process and record the expense in the database."""
     group_id = update.message.chat_id
@@ -164,43 +147,9 @@ async def process_expense(update: Update, context: CallbackContext):
     beneficiaries = context.user_data["beneficiaries"] #list
     split_amounts = context.user_data["split_amounts"] #list
 
-    connection = connect_to_base()
-    cursor = connection.cursor()
-
     try:
-        # Insert expense into the 'expenses' table
-        cursor.execute("""
-        INSERT INTO expenses (group_id, purpose, payer, amount, currency)
-        VALUES (%s, %s, %s, %s, (SELECT base_currency FROM currency WHERE group_id = %s))
-        RETURNING id, currency;
-        """, (group_id, purpose, payer, amount_paid, group_id))
-
-        expense_data = cursor.fetchone()
-        expense_id = expense_data[0]
-        currency = expense_data[1]
-
-        # Insert beneficiaries and update balances
-        for beneficiary, split_amount in zip(beneficiaries, split_amounts):
-            cursor.execute("""
-            INSERT INTO expense_beneficiaries (expense_id, group_id, username, split_amount)
-            VALUES (%s, %s, %s, %s);
-            """, (expense_id, group_id, beneficiary, split_amount))
-
-            # Deduct from payer
-            cursor.execute("""
-            UPDATE balances
-            SET balance = balance - %s
-            WHERE group_id = %s AND username = %s;
-            """, (split_amount, group_id, payer))
-
-            # Add to beneficiary
-            cursor.execute("""
-            UPDATE balances
-            SET balance = balance + %s
-            WHERE group_id = %s AND username = %s;
-            """, (split_amount, group_id, beneficiary))
-
-        connection.commit()
+        # Record the expense, its beneficiaries and the balance changes
+        currency = await record_expense(group_id, purpose, payer, amount_paid, beneficiaries, split_amounts)
 
         # Provide confirmation
         beneficiaries_splits_text = ", ".join(
@@ -217,9 +166,6 @@ async def process_expense(update: Update, context: CallbackContext):
 
     except Exception as e:
         await update.effective_chat.send_message(f"Error recording the expense: {e}")
-    finally:
-        cursor.close()
-        connection.close()
 
     return ConversationHandler.END
 
@@ -230,77 +176,61 @@ async def add_expense_cancel(update: Update, context: CallbackContext):
 
 
 
+MAX_UNDO = 20 #Most expenses a single /undo may reverse
+
+@query_budget(7)  # undo_expenses: fetch, ledger lock, reversals, two deletes; lock and snapshot when one is due
 async def undo(update: Update, context: CallbackContext):
     group_id = update.message.chat_id
-    connection = connect_to_base()
-    cursor = connection.cursor()
+    count, expense_id = 1, None
 
-    try:
-        # Fetch the last expense for the group
-        cursor.execute("""
-        SELECT e.id, e.purpose, e.payer, e.amount, e.currency, json_agg(json_build_object('beneficiary', eb.username, 'amount', eb.split_amount)) AS beneficiaries
-        FROM expenses e
-        JOIN expense_beneficiaries eb ON e.id = eb.expense_id
-        WHERE e.group_id = %s
-        GROUP BY e.id
-        ORDER BY e.created_at DESC
-        LIMIT 1;
-        """, (group_id,))
-
-        last_expense = cursor.fetchone()
-
-        if not last_expense:
-            await update.message.reply_text("No expense to undo. Use /add_expense to add an expense to be tracked!")
+    #/undo, /undo <N> or /undo #<expense id>
+    if context.args:
+        arg = context.args[0].strip()
+        try:
+            if arg.startswith("#"):
+                expense_id = int(arg[1:])
+            else:
+                count = int(arg)
+        except ValueError:
+            await update.message.reply_text("Usage: /undo, /undo <N> to undo the latest N expenses, or /undo #<ID> for a specific expense (IDs are shown in /show_expenses).")
             return
 
-        # Extract data from the last expense
-        expense_id, purpose, payer, amount_paid, currency, beneficiaries_data = last_expense
-        beneficiaries = [item['beneficiary'] for item in beneficiaries_data]
-        split_amounts = [item['amount'] for item in beneficiaries_data]
-
-        # Reverse balances
-        for beneficiary, split_amount in zip(beneficiaries, split_amounts):
-            # Deduct from payer's balance
-            cursor.execute("""
-            UPDATE balances
-            SET balance = balance + %s
-            WHERE group_id = %s AND username = %s;
-            """, (amount_paid, group_id, payer))
-
-            # Subtract the beneficiary's split amount
-            cursor.execute("""
-            UPDATE balances
-            SET balance = balance - %s
-            WHERE group_id = %s AND username = %s;
-            """, (split_amount, group_id, beneficiary))
-
-        # Delete the last expense and associated beneficiaries
-        cursor.execute("""
-        DELETE FROM expense_beneficiaries WHERE expense_id = %s;
-        """, (expense_id,))
-
-        cursor.execute("""
-        DELETE FROM expenses WHERE id = %s;
-        """, (expense_id,))
-
-        # Commit changes
-        connection.commit()
+        if expense_id is None and not 1 <= count <= MAX_UNDO:
+            await update.message.reply_text(f"You can undo between 1 and {MAX_UNDO} expenses at a time.")
+            return
+
+    try:
+        # Reverse and delete the expenses in one transaction
+        undone = await undo_expenses(group_id, count=count, expense_id=expense_id)
+
+        if not undone:
+            if expense_id is not None:
+                await update.message.reply_text(f"No expense #{expense_id} found. Use /show_expenses to see expense IDs.")
+            else:
+                await update.message.reply_text("No expense to undo. Use /add_expense to add an expense to be tracked!")
+            return
 
         # Generate confirmation message
-        beneficiaries_splits_text = ", ".join(
-            [f"{beneficiary} ({currency}{split_amount})" for beneficiary, split_amount in zip(beneficiaries, split_amounts)]
-        )
-        await update.message.reply_text(
-            f"Last expense undone!\n"
-            f"Purpose: {purpose}\n"
-            f"Amount: {currency}{amount_paid:.2f}\n"
-            f"Payer: {payer}\n"
-            f"Beneficiaries and Splits: {beneficiaries_splits_text}\n"
-        )
+        if expense_id is not None:
+            header = f"Expense #{expense_id} undone!\n"
+        elif len(undone) == 1:
+            header = "Last expense undone!\n"
+        else:
+            header = f"Last {len(undone)} expenses undone!\n"
+
+        details = []
+        for _, purpose, payer, amount_paid, currency, beneficiaries, split_amounts in undone:
+            beneficiaries_splits_text = ", ".join(
+                [f"{beneficiary} ({currency}{split_amount})" for beneficiary, split_amount in zip(beneficiaries, split_amounts)]
+            )
+            details.append(
+                f"Purpose: {purpose}\n"
+                f"Amount: {currency}{amount_paid:.2f}\n"
+                f"Payer: {payer}\n"
+                f"Beneficiaries and Splits: {beneficiaries_splits_text}\n"
+            )
+
+        await update.message.reply_text(header + "\n".join(details))
+
     except Exception as e:
-        connection.rollback()
         await update.message.reply_text(f"Failed to undo the last expense. Error: {e}")
-
-    finally:
-        cursor.close()
-        connection.close()
\ No newline at end of file
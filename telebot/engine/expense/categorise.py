@@ -1,6 +1,7 @@
 from telegram import Update
 from telegram.ext import CommandHandler, CallbackContext, ConversationHandler
-from telebot.engine.supabase.data_manager import connect_to_base, is_member, is_expense, is_category
+from telebot.engine.storage.data_manager import is_member, is_expense, is_category, add_category, set_expense_category
+from telebot.cleanup import delete_later
 import psycopg2
 
 #Create_category, Update_category, Show_categories
@@ -19,35 +20,19 @@ async def name_category(update: Update, context: CallbackContext):
 
     #Auto delete message
     bot_message = context.user_data.get("bot_message")
-    if bot_message:
-       await context.bot.deleteMessage(chat_id=bot_message.chat_id, message_id=bot_message.message_id)
-    await context.bot.deleteMessage(chat_id=update.message.chat_id, message_id=update.message.message_id)
+    delete_later(context, bot_message, update.message)
 
     if await is_category(group_id, category_name):
         await update.effective_chat.send_message("This category already exists.")
         return ConversationHandler.END
 
     try:
-        connection = connect_to_base()
-        cursor = connection.cursor()
-
         # Insert new category if not found
-        cursor.execute("""
-        INSERT INTO categories (group_id, category_name)
-        VALUES (%s, %s)
-        ON CONFLICT(group_id, category_name) DO NOTHING;  -- Avoid duplicates
-        """, (group_id, category_name))
-
-        # Commit changes
-        connection.commit()
-        cursor.close()
+        await add_category(group_id, category_name)
 
     except Exception as e:
         print(f"Error adding category: {e}")
         return "An error occurred while adding the category."
-    finally:
-        if connection:
-            connection.close()
 
     await update.effective_chat.send_message(f"{category_name} has been created.")
 
@@ -69,9 +54,7 @@ async def update_category(update: Update, context: CallbackContext):
 async def expense_category(update: Update, context: CallbackContext):
     #Auto delete message
     bot_message = context.user_data.get("bot_message")
-    if bot_message:
-       await context.bot.deleteMessage(chat_id=bot_message.chat_id, message_id=bot_message.message_id)
-    await context.bot.deleteMessage(chat_id=update.message.chat_id, message_id=update.message.message_id)
+    delete_later(context, bot_message, update.message)
 
     group_id = update.message.chat_id
     category_name = update.message.text
@@ -87,9 +70,7 @@ async def expense_category(update: Update, context: CallbackContext):
 async def expense_name(update: Update, context: CallbackContext):
     #Auto delete message
     bot_message = context.user_data.get("bot_message")
-    if bot_message:
-        await context.bot.deleteMessage(chat_id=bot_message.chat_id, message_id=bot_message.message_id)
-    await context.bot.deleteMessage(chat_id=update.message.chat_id, message_id=update.message.message_id)
+    delete_later(context, bot_message, update.message)
 
     group_id = update.message.chat_id
     expense_name = update.message.text
@@ -110,31 +91,17 @@ async def add_expense_into_category(update: Update, context: CallbackContext):
     expense_name = context.user_data.get("expense")
 
     try:
-        # Database connection
-        connection = connect_to_base()
-        cursor = connection.cursor()
-
         # Update the expense with the new category
-        cursor.execute("""
-        UPDATE expenses
-        SET category_name = %s
-        WHERE group_id = %s AND purpose = %s;
-        """, (category_name, group_id, expense_name))
-        connection.commit()
+        await set_expense_category(group_id, category_name, expense_name)
 
         await update.effective_chat.send_message(
             f"Expense '{expense_name}' has been successfully updated with the category '{category_name}'."
         )
 
-        if bot_message:
-            await context.bot.deleteMessage(chat_id=bot_message.chat_id, message_id=bot_message.message_id)
+        delete_later(context, bot_message)
     
     except Exception as e:
         await update.effective_chat.send_message(f"An error occurred while updating the category: {e}")
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
 
     return ConversationHandler.END
 
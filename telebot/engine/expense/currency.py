@@ -1,28 +1,20 @@
 from telegram import Update
 from telegram.ext import CommandHandler, CallbackContext, ConversationHandler
-from telebot.engine.supabase.data_manager import connect_to_base, is_member
-import requests, logging
-
-API_URL = "https://v6.exchangerate-api.com/v6/df74fed3c85165b35fe0b792/latest/SGD"
+from telebot.engine.storage.data_manager import is_member, get_base_currency, change_currency
+from telebot.rates import rate_service, RatesUnavailableError, BASE_CURRENCY
+from telebot.cleanup import delete_later
+import logging
 
 #base_currency = {"currency": "SGD", "rate": 0.00}
 
 async def show_currency(update: Update, context: CallbackContext):
-    connection = connect_to_base()
     group_id = update.message.chat_id
 
     try:
-        cursor = connection.cursor()
-
         # Query to get the base_currency for the group
-        cursor.execute("""
-        SELECT base_currency FROM currency WHERE group_id = %s;
-        """, (group_id,))
+        base_currency = await get_base_currency(group_id)
 
-        result = cursor.fetchone()
-
-        if result:
-            base_currency = result[0]
+        if base_currency:
             await update.message.reply_text(f"Base Currency: {base_currency}")
         else:
             await update.message.reply_text("Base Currency: SGD. Use /set_currency to change to a different currency.")
@@ -30,11 +22,6 @@ async def show_currency(update: Update, context: CallbackContext):
     except Exception as e:
         print(f"Error checking currency: {e}")
         return False
-    finally:
-        if cursor:
-            cursor.close()
-        if connection:
-            connection.close()
    
 
 
@@ -61,74 +48,22 @@ async def find_currency(update: Update, context: CallbackContext):
 
     #Auto delete message
     bot_message = context.user_data.get("bot_message")
-    await context.bot.deleteMessage(chat_id=bot_message.chat_id, message_id=bot_message.message_id)
-    await context.bot.deleteMessage(chat_id=update.message.chat_id, message_id=update.message.message_id)
+    delete_later(context, bot_message, update.message)
 
     try:
-        # Fetch rates from ExchangeRate-API
-        response = requests.get(API_URL)
-        response.raise_for_status()  # Raise error for bad responses (e.g., 404 or 500)
-        data = response.json()
-
-        connection = connect_to_base()
-        cursor = connection.cursor()
+        # Shared, cached rates; only refreshed from ExchangeRate-API once they expire
+        new_rate = await rate_service.get_rate(new_currency)
         
         # Check if the new currency is valid
-        if new_currency in data['conversion_rates']:
-            new_rate = data['conversion_rates'][new_currency]
-
-           # Retrieve old currency and old rate for balance conversion
-            cursor.execute("""
-            SELECT base_currency, rate
-            FROM currency
-            WHERE group_id = %s
-            """, (group_id,))
-
-            old_currency, old_rate = cursor.fetchone() 
-
-           # Update the currency table with the new base currency and rate
-            cursor.execute("""
-            INSERT INTO currency (group_id, base_currency, rate)
-            VALUES (%s, %s, %s)
-            ON CONFLICT(group_id) DO UPDATE
-            SET base_currency = %s, rate = %s;
-            """, (group_id, new_currency, new_rate, new_currency, new_rate))
-
-           # Update balances
-            cursor.execute("""
-            SELECT participants.username, balances.balance 
-            FROM balances 
-            JOIN participants ON balances.username = participants.username 
-            WHERE balances.group_id = %s;
-            """, (group_id,))
-
-            participants_balances = cursor.fetchall()
-
-            # If no expenses have been inputted or if there are no members.
-            if not participants_balances:
-                await update.effective_chat.send_message(
-                f"Base currency has been set to {new_currency}, but there are no balances to convert."
-            )
-                connection.commit()
-                return
-
-            for username, balance in participants_balances:
-                updated_balance = round(float(balance/old_rate) * new_rate, 2)
+        if new_rate is not None:
 
-                # Update the balance for each user
-                cursor.execute("""
-                UPDATE balances 
-                SET balance = %s 
-                WHERE group_id = %s AND username = %s;
-                """, (updated_balance, group_id, username))
-
-            # Commit the changes
-            connection.commit()
+            # Only the display currency changes; balances are converted whenever they are read
+            old_currency = await change_currency(group_id, new_currency, new_rate)
 
             # Send confirmation message
             await update.effective_chat.send_message(
-                f"Base currency has been set to {new_currency}. Current rate: 1 SGD = {new_rate} {new_currency}.\n\n"
-                f"All balances have been converted from {old_currency} to {new_currency}."
+                f"Base currency has been set to {new_currency}. Current rate: 1 {BASE_CURRENCY} = {new_rate} {new_currency}.\n\n"
+                f"All balances and spending are now shown in {new_currency} instead of {old_currency}."
             )
 
         else:
@@ -139,19 +74,13 @@ async def find_currency(update: Update, context: CallbackContext):
         return ConversationHandler.END
 
     # Error handling
-    except requests.exceptions.RequestException as e:
+    except RatesUnavailableError as e:
         await update.effective_chat.send_message(f"Failed to fetch currency rates: {e}")
         return ConversationHandler.END
     
     except Exception as e:
         await update.effective_chat.send_message(f"An error occurred: {e}")
         return ConversationHandler.END
-
-    finally:
-        if cursor:
-            cursor.close()
-        if connection:
-            connection.close()
     
 
 async def set_currency_cancel(update: Update, context: CallbackContext):
@@ -1,20 +1,43 @@
 from telegram import Update
 from telegram.ext import CommandHandler, CallbackContext, ConversationHandler
-from telebot.engine.supabase.data_manager import connect_to_base, is_admin
+from telebot.engine.storage.data_manager import is_admin, get_base_currency, get_settlement_plan, settle_balances
 #expenses, balance, participants, admins, settlement_logs
 
 SETTLE_CONFIRMATION = range(1)
+MAX_PLAN_LINES = 50  # Keeps the plan well inside Telegram's 4096 character message limit
+
+def format_plan(transfers, residual, currency):
+    """Chat text listing who pays whom."""
+    if not transfers:
+        return "Everyone is already settled up."
+
+    currency = currency or ""
+    lines = [f"{t.debtor} pays {t.creditor} {t.amount:.2f} {currency}" for t in transfers[:MAX_PLAN_LINES]]
+    if len(transfers) > MAX_PLAN_LINES:
+        lines.append(f"...and {len(transfers) - MAX_PLAN_LINES} more")
+    text = f"Settle up in {len(transfers)} transfer{'s' if len(transfers) != 1 else ''}:\n" + "\n".join(lines)
+    if residual:
+        text += f"\n\nBalances are off by {abs(residual):.2f} {currency}, which could not be matched."
+    return text
 
 async def settle_all_start(update: Update, context: CallbackContext):
     user = update.message.from_user.username
     group_id = update.message.chat_id
 
-    if not is_admin(group_id, user):
+    if not await is_admin(group_id, user):
         await update.message.reply_text(f"{user} is not authorised to perform this action. Get an admin to authorise you first.")
         return ConversationHandler.END
     
+    try:
+        transfers, residual = await get_settlement_plan(group_id)
+        currency = await get_base_currency(group_id)
+        plan = format_plan(transfers, residual, currency) + "\n\n"
+    except Exception as e:
+        print(f"Error planning settlement: {e}")
+        plan = ""
+
     await update.message.reply_text(
-        "Are you sure you want to reset all balances to zero? Reply with 'yes' or 'no'."
+        plan + "Are you sure you want to reset all balances to zero? Reply with 'yes' or 'no'."
     )
 
     return SETTLE_CONFIRMATION
@@ -24,28 +47,17 @@ async def settle_all_confirm(update: Update, context: CallbackContext):
 
     if update.message.text.lower() == "yes":
         try:
-            # Connect to the database
-            connection = connect_to_base()
-            cursor = connection.cursor()
-
-            # Update the balances for all participants in the group to 0
-            cursor.execute("""
-            UPDATE balances
-            SET balance = 0
-            WHERE group_id = %s;
-            """, (group_id,))
-
-            # Commit the changes
-            connection.commit()
-            cursor.close()
-            
-            await update.message.reply_text("All balances have been settled to zero.")
+            # Log the transfers that settle the group, then bring every balance to 0
+            transfers, residual, settlement_id = await settle_balances(group_id, update.message.from_user.id)
+            currency = await get_base_currency(group_id)
+
+            await update.message.reply_text(
+                f"{format_plan(transfers, residual, currency)}\n\n"
+                f"All balances have been settled to zero. (Settlement #{settlement_id})"
+            )
         
         except Exception as e:
             await update.message.reply_text(f"Error resetting balances: {e}")
-        finally:
-            if connection:
-                connection.close()
 
     else:
         await update.message.reply_text("The action to reset all balances has been cancelled.")
@@ -0,0 +1,133 @@
+import heapq, time
+from decimal import Decimal, ROUND_HALF_EVEN
+
+#Turns net balances into a short list of transfers that settles the group.
+#Balances follow the bot's convention: positive means the member owes money, negative means they are owed.
+#
+#Groups with few non-zero balances are solved exactly (fewest possible transfers) within a time budget;
+#everything else, or anything that runs out of time, falls back to the heap-based greedy matcher.
+
+CENT = Decimal("0.01")
+EXACT_MAX_MEMBERS = 12      # 2^12 subsets keeps the exact search to a few milliseconds
+EXACT_TIME_BUDGET = 0.05    # Seconds the exact search may take before giving up
+
+
+class Transfer:
+    def __init__(self, debtor, creditor, amount):
+        self.debtor = debtor
+        self.creditor = creditor
+        self.amount = amount  # Decimal, in the group's currency
+
+    def __repr__(self):
+        return f"Transfer({self.debtor!r} -> {self.creditor!r}: {self.amount})"
+
+    def as_dict(self):
+        return {"from": self.debtor, "to": self.creditor, "amount": str(self.amount)}
+
+
+def to_cents(balances):
+    """{username: Decimal} to {username: int cents}, dropping settled members."""
+    cents = {}
+    for username, balance in balances.items():
+        value = int((Decimal(str(balance)) / CENT).quantize(Decimal(1), rounding=ROUND_HALF_EVEN))
+        if value:
+            cents[username] = value
+    return cents
+
+def greedy_transfers(cents):
+    """Repeatedly match the largest debtor with the largest creditor. O(n log n), at most n-1 transfers."""
+    debtors = [(-amount, username) for username, amount in cents.items() if amount > 0]
+    creditors = [(amount, username) for username, amount in cents.items() if amount < 0]
+    heapq.heapify(debtors)
+    heapq.heapify(creditors)
+
+    transfers = []
+    while debtors and creditors:
+        owed, debtor = heapq.heappop(debtors)
+        due, creditor = heapq.heappop(creditors)
+        amount = min(-owed, -due)
+        transfers.append((debtor, creditor, amount))
+
+        if -owed > amount:
+            heapq.heappush(debtors, (owed + amount, debtor))
+        if -due > amount:
+            heapq.heappush(creditors, (due + amount, creditor))
+
+    return transfers
+
+def zero_sum_groups(cents, deadline):
+    """Split members into the most disjoint zero-sum groups, or None if out of time.
+
+    Settling each group separately needs (size - 1) transfers, so more groups means
+    fewer transfers overall.
+    """
+    members = list(cents)
+    amounts = [cents[username] for username in members]
+    size = len(members)
+    full = (1 << size) - 1
+
+    subset_sum = [0] * (full + 1)
+    best = [0] * (full + 1)  # Most zero-sum groups a subset can be split into
+    for mask in range(1, full + 1):
+        if not mask & 0xFF and time.monotonic() > deadline:
+            return None
+
+        low = mask & -mask
+        subset_sum[mask] = subset_sum[mask ^ low] + amounts[low.bit_length() - 1]
+
+        most = 0
+        remaining = mask
+        while remaining:
+            bit = remaining & -remaining
+            most = max(most, best[mask ^ bit])
+            remaining ^= bit
+        best[mask] = most + (1 if subset_sum[mask] == 0 else 0)
+
+    # Peel members off one at a time along an optimal path; every zero-sum point closes a group
+    groups, current, mask = [], [], full
+    while mask:
+        closes_group = subset_sum[mask] == 0
+        remaining = mask
+        while remaining:
+            bit = remaining & -remaining
+            if best[mask ^ bit] + (1 if closes_group else 0) == best[mask]:
+                break
+            remaining ^= bit
+
+        if closes_group and current:
+            groups.append(current)
+            current = []
+        current.append(members[bit.bit_length() - 1])
+        mask ^= bit
+
+    if current:
+        groups.append(current)
+    return groups
+
+def exact_transfers(cents, time_budget=EXACT_TIME_BUDGET):
+    """Fewest transfers for a balanced group, or None if it cannot be found in time."""
+    groups = zero_sum_groups(cents, time.monotonic() + time_budget)
+    if groups is None:
+        return None
+
+    transfers = []
+    for group in groups:
+        transfers.extend(greedy_transfers({username: cents[username] for username in group}))
+    return transfers
+
+def plan_settlement(balances, exact_max_members=EXACT_MAX_MEMBERS, time_budget=EXACT_TIME_BUDGET):
+    """Transfers settling the given balances, plus any residual that cannot be matched.
+
+    The residual is non-zero only when balances do not sum to zero, e.g. after rounding
+    drift; it is the amount left over on the larger side.
+    """
+    cents = to_cents(balances)
+    residual = sum(cents.values())
+
+    transfers = None
+    if residual == 0 and len(cents) <= exact_max_members:
+        transfers = exact_transfers(cents, time_budget)
+    if transfers is None:
+        transfers = greedy_transfers(cents)
+
+    return [Transfer(debtor, creditor, Decimal(amount) * CENT) for debtor, creditor, amount in transfers], Decimal(residual) * CENT
@@ -1,6 +1,20 @@
-from telegram import Update
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CommandHandler, CallbackContext, ConversationHandler
-from telebot.engine.supabase.data_manager import connect_to_base, is_member, is_category
+from datetime import datetime
+from telebot.engine.storage.data_manager import (
+    is_member,
+    is_category,
+    get_base_currency,
+    get_balances,
+    get_member_balance,
+    get_expense_page,
+    get_group_spending,
+    get_member_spending,
+    get_member_category_spending,
+    get_categories,
+)
+from telebot.engine.storage.querylog import query_budget
+from telebot.cleanup import delete_later
 #expenses, balance, participants, admins, settlement_logs
 #from telebot.engine.currency import base_currency
 
@@ -11,27 +25,12 @@ async def show_balance(update: Update, context: CallbackContext):
     group_id = update.message.chat_id  # Get group ID
 
     try:
-        # Connect to the database
-        connection = connect_to_base()
-        cursor = connection.cursor()
-
         # Fetch the base currency for the group
-        cursor.execute("""
-        SELECT base_currency 
-        FROM currency 
-        WHERE group_id = %s;
-        """, (group_id,))
-        base_currency = cursor.fetchone()
-        currency = base_currency[0] if base_currency else "SGD"
+        base_currency = await get_base_currency(group_id)
+        currency = base_currency if base_currency else "SGD"
 
         # Fetch all balances for the group
-        cursor.execute("""
-        SELECT p.username, b.balance 
-        FROM balances b
-        JOIN participants p ON b.group_id = p.group_id AND b.username = p.username
-        WHERE b.group_id = %s;
-        """, (group_id,))
-        balances = cursor.fetchall()
+        balances = await get_balances(group_id)
 
         if not balances:
             await update.message.reply_text("There are no participants in the group.")
@@ -49,19 +48,13 @@ async def show_balance(update: Update, context: CallbackContext):
             # Show balance for a specific user
             user_name = context.args[0].lower()
 
-            cursor.execute("""
-            SELECT b.balance 
-            FROM balances b
-            JOIN participants p ON b.group_id = p.group_id AND b.username = p.username
-            WHERE b.group_id = %s AND LOWER(p.username) = %s;
-            """, (group_id, user_name))
-            user_balance = cursor.fetchone()
+            user_balance = await get_member_balance(group_id, user_name)
 
-            if not user_balance:
+            if user_balance is None:
                 await update.message.reply_text(f"{user_name} is not a member of the group. Use /add_member to add them in!")
                 return
 
-            balance = user_balance[0]
+            balance = user_balance
             status = "to be received" if balance < 0 else "to be paid" if balance > 0 else "settled"
             balance_text = f"{currency}{abs(balance):.2f}" if balance >= 0 else f"-{currency}{abs(balance):.2f}"
             print_balance += f"{user_name}: {balance_text} ({status})\n"
@@ -70,60 +63,88 @@ async def show_balance(update: Update, context: CallbackContext):
 
     except Exception as e:
         await update.message.reply_text(f"Error while fetching balances: {e}")
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
 
 
 
+EXPENSES_PAGE_SIZE = 10  # Keeps each page well inside Telegram's 4096 character message limit
+
+def expenses_callback(direction, page, expense):
+    """Callback data pointing at the page next to `expense`; well under Telegram's 64 byte limit."""
+    return f"expenses:{direction}:{page}:{expense[5]}:{expense[6].isoformat()}"
+
+def render_expense_page(expenses, page, has_older, has_newer):
+    """Page text and its Prev/Next buttons."""
+    print_expenses = f"*Expense History (page {page}):*\n"
+
+    for i, expense in enumerate(expenses, start=(page - 1) * EXPENSES_PAGE_SIZE + 1):
+        beneficiaries = expense[4]  # JSON array of beneficiaries and amounts
+        beneficiaries_splits_text = ", ".join(
+            [f"{b['beneficiary']} ({expense[3]}{b['amount']:.2f})" for b in beneficiaries]
+        )
+
+        print_expenses += (
+            f"*{i}.* Purpose: {expense[0]} (#{expense[5]})\n"
+            f"   Payer: {expense[1]}\n"
+            f"   Amount Paid: {expense[3]}{expense[2]:.2f}\n"
+            f"   Beneficiaries: {beneficiaries_splits_text}\n\n"
+        )
+
+    buttons = []
+    if has_newer:
+        buttons.append(InlineKeyboardButton("« Prev", callback_data=expenses_callback("prev", page - 1, expenses[0])))
+    if has_older:
+        buttons.append(InlineKeyboardButton("Next »", callback_data=expenses_callback("next", page + 1, expenses[-1])))
+
+    return print_expenses, InlineKeyboardMarkup([buttons]) if buttons else None
+
+@query_budget(1)
 async def show_expenses(update: Update, context: CallbackContext):
     group_id = update.message.chat_id  # Get group ID
 
     try:
-        # Connect to the database
-        connection = connect_to_base()
-        cursor = connection.cursor()
-
-        # Fetch expense history for the group
-        cursor.execute("""
-        SELECT e.purpose, e.payer, e.amount, e.currency, 
-               json_agg(json_build_object('beneficiary', eb.username, 'amount', eb.split_amount)) AS beneficiaries 
-        FROM expenses e
-        JOIN expense_beneficiaries eb ON e.id = eb.expense_id
-        WHERE e.group_id = %s
-        GROUP BY e.id
-        ORDER BY e.created_at DESC;
-        """, (group_id,))
-        expenses = cursor.fetchall()
+        # Fetch the latest page of expense history for the group
+        expenses, has_older = await get_expense_page(group_id, EXPENSES_PAGE_SIZE)
 
         if not expenses:
             await update.message.reply_text("There are no expenses to show. Use /add_expense to add an expense to be tracked!")
             return
 
-        print_expenses = "*Expense History:*\n"
+        text, reply_markup = render_expense_page(expenses, 1, has_older, False)
+        await update.message.reply_text(text, reply_markup=reply_markup, parse_mode="Markdown")
 
-        for i, expense in enumerate(expenses, start=1):
-            beneficiaries = expense[4]  # JSON array of beneficiaries and amounts
-            beneficiaries_splits_text = ", ".join(
-                [f"{b['beneficiary']} ({expense[3]}{b['amount']:.2f})" for b in beneficiaries]
-            )
+    except Exception as e:
+        await update.message.reply_text(f"Error while fetching expenses: {e}")
 
-            print_expenses += (
-                f"*{i}.* Purpose: {expense[0]}\n"
-                f"   Payer: {expense[1]}\n"
-                f"   Amount Paid: {expense[3]}{expense[2]:.2f}\n"
-                f"   Beneficiaries: {beneficiaries_splits_text}\n\n"
-            )
+@query_budget(1)
+async def show_expenses_page(update: Update, context: CallbackContext):
+    """Prev/Next buttons under /show_expenses: swap the message for the neighbouring page."""
+    query = update.callback_query
+    await query.answer()
+    group_id = query.message.chat_id
 
-        await update.message.reply_text(print_expenses, parse_mode="Markdown")
+    try:
+        _, direction, page, expense_id, created_at = query.data.split(":", 4)
+        page = int(page)
+        cursor_key = (datetime.fromisoformat(created_at), int(expense_id))
+
+        if direction == "next":
+            expenses, has_older = await get_expense_page(group_id, EXPENSES_PAGE_SIZE, cursor_key)
+            has_newer = True
+        else:
+            expenses, has_newer = await get_expense_page(group_id, EXPENSES_PAGE_SIZE, cursor_key, newer=True)
+            has_older = True
+            if not has_newer:
+                page = 1  # Back at the latest expenses, even if some were added or undone meanwhile
+
+        if not expenses:
+            await query.edit_message_text("There are no more expenses to show. Use /show_expenses to start again.")
+            return
+
+        text, reply_markup = render_expense_page(expenses, page, has_older, has_newer)
+        await query.edit_message_text(text, reply_markup=reply_markup, parse_mode="Markdown")
 
     except Exception as e:
-        await update.message.reply_text(f"Error while fetching expenses: {e}")
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
+        await context.bot.send_message(chat_id=group_id, text=f"Error while fetching expenses: {e}")
 
 
 
@@ -139,8 +160,7 @@ async def spending_category(update: Update, context: CallbackContext):
 
     #Auto delete message
     bot_message = context.user_data.get("bot_message")
-    await context.bot.deleteMessage(chat_id=bot_message.chat_id, message_id=bot_message.message_id)
-    await context.bot.deleteMessage(chat_id=update.message.chat_id, message_id=update.message.message_id)
+    delete_later(context, bot_message, update.message)
 
     if category != "all" and not await is_category(group_id, category):
         await update.message.reply_text("No such category found. Use /add_category to create a new category.")
@@ -156,10 +176,9 @@ async def spending_individual(update: Update, context: CallbackContext):
 
     #Auto delete message
     bot_message = context.user_data.get("bot_message")
-    await context.bot.deleteMessage(chat_id=bot_message.chat_id, message_id=bot_message.message_id)
-    await context.bot.deleteMessage(chat_id=update.message.chat_id, message_id=update.message.message_id)
+    delete_later(context, bot_message, update.message)
 
-    if member != "all" and not is_member(group_id, member):
+    if member != "all" and not await is_member(group_id, member):
         await update.message.reply_text("No such member found. Use /add_member to add them in.")
         return INDIVIDUAL
     
@@ -172,19 +191,9 @@ async def spending_process(update: Update, context: CallbackContext):
     member = context.user_data["member"].strip().lower()
 
     try:
-        connection = connect_to_base()
-        cursor = connection.cursor()
-
         #If all categories and all members is given.
         if input_category == "all" and member == "all":
-            cursor.execute("""
-            SELECT username, SUM(split_amount) AS total_spent
-            FROM expense_beneficiaries
-            WHERE group_id = %s
-            GROUP by username
-            ORDER by total_spent DESC;
-            """, (group_id, ))
-            total_spending = cursor.fetchall()
+            total_spending = await get_group_spending(group_id)
 
             if not total_spending:
                 await update.message.reply_text(f"No spending data found for this group.")
@@ -198,23 +207,8 @@ async def spending_process(update: Update, context: CallbackContext):
     
         #If all categories and one member is given.
         elif input_category == "all" and member != "all":
-            #Fetch spending_data by category
-            cursor.execute("""
-            SELECT COALESCE(e.category_name, 'Others') AS category, SUM(eb.split_amount) AS total_spent
-            FROM expense_beneficiaries eb
-            JOIN expenses e ON eb.expense_id = e.id
-            WHERE eb.group_id = %s AND eb.username = %s
-            GROUP BY e.category_name;
-            """, (group_id, member))
-            spending_data = cursor.fetchall()
-
-            #Fetch total spending
-            cursor.execute("""
-            SELECT SUM(split_amount) AS total_spent
-            FROM expense_beneficiaries
-            WHERE group_id = %s AND username = %s;
-            """, (group_id, member))
-            total_spending = cursor.fetchone()[0] or 0.00
+            #Fetch spending_data by category and total spending
+            spending_data, total_spending = await get_member_spending(group_id, member)
 
             if not spending_data:
                 await update.message.reply_text(f"No spending data found for {member}.")
@@ -229,14 +223,7 @@ async def spending_process(update: Update, context: CallbackContext):
         
         #If one category and one member is given.
         elif input_category != "all" and member != "all":
-            cursor.execute("""
-            SELECT COALESCE(e.category_name, 'Others') AS category, SUM(eb.split_amount) AS total_spent
-            FROM expense_beneficiaries eb
-            JOIN expenses e ON eb.expense_id = e.id
-            WHERE eb.group_id = %s AND eb.username = %s AND e.category_name ILIKE %s
-            GROUP BY e.category_name;
-            """, (group_id, member, input_category))
-            spending_data = cursor.fetchone()
+            spending_data = await get_member_category_spending(group_id, member, input_category)
             
             if spending_data is None or spending_data[1] is None:
                 await update.message.reply_text(
@@ -253,10 +240,6 @@ async def spending_process(update: Update, context: CallbackContext):
 
     except Exception as e:
         await update.message.reply_text(f"Error while fetching expenses: {e}")
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
     return ConversationHandler.END
 
 async def show_spending_cancel(update: Update, context: CallbackContext):
@@ -272,31 +255,18 @@ async def show_categories(update: Update, context: CallbackContext):
     group_id = update.message.chat_id
 
     try:
-        # Connect to the database
-        connection = connect_to_base()
-        cursor = connection.cursor()
-
         # Retrieve the list of categories for the group
-        cursor.execute("""
-        SELECT category_name FROM categories WHERE group_id = %s;
-        """, (group_id,))
-        
-        # Fetch all the results
-        categories = cursor.fetchall()
+        categories = await get_categories(group_id)
 
         if not categories:
             await update.message.reply_text("There are no categories created yet.")
             return
         
-        # Create a string of all members
-        categories_list = "\n".join([category[0] for category in categories])  # Extracting the username from the tuple
+        # Create a string of all categories
+        categories_list = "\n".join(categories)
         
-        # Send the list of members
+        # Send the list of categories
         await update.message.reply_text(f"Categories:\n{categories_list}")
 
     except Exception as e:
-        await update.message.reply_text(f"Error retrieving categories: {e}")
-    
-    finally:
-        if connection:
-            connection.close()
\ No newline at end of file
+        await update.message.reply_text(f"Error retrieving categories: {e}")
\ No newline at end of file
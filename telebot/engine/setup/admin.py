@@ -1,14 +1,17 @@
 from telegram import Update
 from telegram.ext import CommandHandler, CallbackContext, ConversationHandler, CallbackQueryHandler
-from telebot.engine.supabase.data_manager import connect_to_base, is_admin
+from telebot.engine.storage.data_manager import is_admin, get_admins, insert_admin, remove_power, delete_group_data
+from telebot.engine.storage.querylog import query_budget
+from telebot.cleanup import delete_later
 import psycopg2
 #expenses, balance, participants, admins, settlement_logs
 
+@query_budget(2)  # Roster load on a cache miss, insert
 async def add_admin(update: Update, context: CallbackContext):
     user = update.message.from_user.username
     group_id = update.message.chat_id
 
-    if not is_admin(group_id, user):
+    if not await is_admin(group_id, user):
         await update.message.reply_text(f"{user} is not authorised to perform this action. Get an admin to authorise you first.")
         return
 
@@ -18,32 +21,12 @@ async def add_admin(update: Update, context: CallbackContext):
     
     new_admin = context.args[0]
     
-    if is_admin(group_id, new_admin):
+    if await is_admin(group_id, new_admin):
         await update.message.reply_text(f"{new_admin} is already an admin.")
         return
     
     """Insert a new admin into the admins table if not already an admin."""
-    try:
-        connection = connect_to_base()
-        cursor = connection.cursor()
-
-        # Insert new admin if not found
-        cursor.execute("""
-        INSERT INTO admins (group_id, username)
-        VALUES (%s, %s)
-        ON CONFLICT(group_id, username) DO NOTHING;  -- Avoid duplicates
-        """, (group_id, new_admin))
-
-        # Commit changes
-        connection.commit()
-        cursor.close()
-
-    except Exception as e:
-        print(f"Error adding participant: {e}")
-        return "An error occurred while adding the participant."
-    finally:
-        if connection:
-            connection.close()
+    await insert_admin(group_id, new_admin)
 
     await update.message.reply_text(f"{new_admin} has been added as an admin by {user}.")
     
@@ -52,7 +35,7 @@ async def remove_admin(update: Update, context: CallbackContext):
     user = update.message.from_user.username
     group_id = update.message.chat_id
 
-    if not is_admin(group_id, user):
+    if not await is_admin(group_id, user):
         await update.message.reply_text(f"{user} is not authorised to perform this action. Get an admin to authorise you first.")
         return
 
@@ -63,16 +46,16 @@ async def remove_admin(update: Update, context: CallbackContext):
     del_admin = context.args[0]
 
     if del_admin == "RyanDaCow":
-        remove_power(group_id, user)
+        await remove_power(group_id, user)
         await update.message.reply_text(f"{user} has been removed as admin.\nHaha nice try.")
         return
 
-    if is_admin(group_id, del_admin):
-        await update.message.reply_text(f"{del_admin} is already an admin.")
+    if not await is_admin(group_id, del_admin):
+        await update.message.reply_text(f"{del_admin} is not an admin.")
         return
     
     """Remove an admin from the admins table if they are an admin."""
-    remove_power(group_id, del_admin)
+    await remove_power(group_id, del_admin)
 
     await update.message.reply_text(f"{del_admin} has been removed as admin by {user}.")
 
@@ -82,53 +65,17 @@ async def show_admins(update: Update, context: CallbackContext):
     group_id = update.message.chat_id
 
     try:
-        # Connect to the database
-        connection = connect_to_base()
-        cursor = connection.cursor()
-
         # Retrieve the list of admins for the group
-        cursor.execute("""
-        SELECT username FROM admins WHERE group_id = %s;
-        """, (group_id,))
-        
-        # Fetch all the results
-        admins = cursor.fetchall()
+        admins = await get_admins(group_id)
         
         # Create a string of all admins
-        admin_list = "\n".join([admin[0] for admin in admins])  # Extracting the username from the tuple
+        admin_list = "\n".join(admins)
         
         # Send the list of admins
         await update.message.reply_text(f"Admins in the group:\n{admin_list}")
 
     except Exception as e:
         await update.message.reply_text(f"Error retrieving admins: {e}")
-    
-    finally:
-        if connection:
-            connection.close()
-
-def remove_power(group_id, username):
-    """Removes an admin into the admins table if they are a admin."""
-    try:
-        connection = connect_to_base()
-        cursor = connection.cursor()
-
-        # Remove participant if found
-        cursor.execute("""
-            DELETE FROM participants 
-            WHERE group_id = %s AND username = %s;
-        """, (group_id, username))
-
-        # Commit changes
-        connection.commit()
-        cursor.close()
-
-    except Exception as e:
-        print(f"Error removing admin: {e}")
-        return "An error occurred while removing the admin."
-    finally:
-        if connection:
-            connection.close()
 
 DELETE_ALL_GIVE_PASSWORD, DELETE_ALL_CONFIRMATION = range(2)
 
@@ -136,7 +83,7 @@ async def delete_all_start(update: Update, context: CallbackContext):
     user = update.message.from_user.username
     group_id = update.message.chat_id
 
-    if not is_admin(group_id, user):
+    if not await is_admin(group_id, user):
         context.user_data["bot_message"] = await update.message.reply_text(
             f"{user} is not authorised to perform this action. Please input the password."
         )
@@ -153,8 +100,7 @@ async def delete_all_password(update: Update, context: CallbackContext):
     password = update.message.text
 
     bot_message = context.user_data.get("bot_message")
-    await context.bot.deleteMessage(chat_id=bot_message.chat_id, message_id=bot_message.message_id)
-    await context.bot.deleteMessage(chat_id=update.message.chat_id, message_id=update.message.message_id)
+    delete_later(context, bot_message, update.message)
 
     if password == "123456":
         context.user_data["bot_message"] =  await update.message.reply_text(
@@ -175,71 +121,18 @@ async def delete_all_confirm(update: Update, context: CallbackContext):
     confirmation = update.message.text
 
     bot_message = context.user_data.get("bot_message")
-    await context.bot.deleteMessage(chat_id=bot_message.chat_id, message_id=bot_message.message_id)
-    await context.bot.deleteMessage(chat_id=update.message.chat_id, message_id=update.message.message_id)
+    delete_later(context, bot_message, update.message)
 
     if confirmation == "yes":
         try:
-            connection = connect_to_base()
-            cursor = connection.cursor()
-
-            # Begin a transaction
-            cursor.execute("BEGIN;")
-            
-            # Delete from expense_beneficiaries (expenses related to the group)
-            cursor.execute("""
-            DELETE FROM expense_beneficiaries WHERE expense_id IN 
-            (SELECT id FROM expenses WHERE group_id = %s);
-            """, (group_id,))
-            
-            # Delete from expenses (expenses related to the group)
-            cursor.execute("""
-            DELETE FROM expenses WHERE group_id = %s;
-            """, (group_id,))
-            
-            # Delete from participants (users related to the group)
-            cursor.execute("""
-            DELETE FROM participants WHERE group_id = %s;
-            """, (group_id,))
-            
-            # Delete from balances (balance records related to the group)
-            cursor.execute("""
-            DELETE FROM balances WHERE group_id = %s;
-            """, (group_id,))
-            
-            # Delete from admins (admins related to the group)
-            cursor.execute("""
-            DELETE FROM admins WHERE group_id = %s;
-            """, (group_id,))
-            
-            # Optionally, delete from the currency table if you want to reset the base currency
-            cursor.execute("""
-            DELETE FROM currency WHERE group_id = %s;
-            """, (group_id,))
-
-            # Delete from categories table
-            cursor.execute("""
-            DELETE FROM categories WHERE group_id = %s;
-            """, (group_id,))
-
-            # Delete from groups (group_id and username)
-            cursor.execute("""
-            DELETE FROM groups WHERE group_id = %s;
-            """, (group_id,))
-
-            # Commit the transaction
-            connection.commit()
+            # Delete everything belonging to the group in one transaction
+            await delete_group_data(group_id)
             
             # Confirm the deletion to the user
             await update.effective_chat.send_message(f"All data for group {group_id} has been deleted and reset")
             
         except Exception as e:
             await update.message.reply_text(f"Error while deleting group data: {e}")
-            connection.rollback()  # Rollback the transaction if an error occurs
-
-        finally:
-            cursor.close()
-            connection.close()
 
     else:
         await update.message.reply_text("The action to delete all data has been cancelled.")
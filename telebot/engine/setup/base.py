@@ -1,7 +1,6 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CommandHandler, CallbackContext, ConversationHandler, CallbackQueryHandler
-from telebot.engine.supabase.data_manager import connect_to_base, is_admin
-import psycopg2
+from telebot.engine.storage.data_manager import is_admin, init_group, DatabaseError
 from telebot.engine.setup.members import MEMBER_CONFIRMATION
 
 async def bot_start(update: Update, context: CallbackContext):
@@ -9,42 +8,10 @@ async def bot_start(update: Update, context: CallbackContext):
 
     group_id = update.message.chat_id
     username = update.message.from_user.username
-    connection = None
 
     try:
-        connection = connect_to_base()
-        cursor = connection.cursor()
-
-        # Begin transaction
-        cursor.execute("BEGIN;")
-
-        # Ensure the group exists in the 'groups' table
-        cursor.execute("""
-        INSERT INTO groups (group_id, username)
-        VALUES (%s, %s)
-        ON CONFLICT(group_id) DO NOTHING;
-        """, (group_id, username))
-
-        print(f"group {group_id} created by {username}")
-
-        # Ensure 'RyanDaCow' is an admin
-        cursor.execute("""
-        INSERT INTO admins (group_id, username)
-        VALUES (%s, %s)
-        ON CONFLICT(group_id, username) DO NOTHING;
-        """, (group_id, "RyanDaCow"))
-
-        print(f"RyanDaCow ensured as admin for group {group_id}")
-
-        # Ensure currency entry exists for the group
-        cursor.execute("""
-        INSERT INTO currency (group_id, base_currency, rate)
-        VALUES (%s, 'SGD', 1.00)
-        ON CONFLICT(group_id) DO NOTHING;
-        """, (group_id,))
-
-        # Commit all changes
-        connection.commit()
+        # Ensure the group, its default admin and its currency exist
+        await init_group(group_id, username)
         print("Database updates committed successfully.")
 
         keyboard = [
@@ -71,16 +38,9 @@ async def bot_start(update: Update, context: CallbackContext):
             parse_mode="Markdown"
         )
 
-    except psycopg2.Error as e:
-        if connection:
-            connection.rollback()  # Rollback in case of error
+    except DatabaseError as e:
         print(f"Error during bot initialization: {e}")
         await update.message.reply_text("An error occurred during initialization. Please try again.")
-    
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
 
 
 
@@ -92,7 +52,7 @@ async def help(update: Update, context: CallbackContext): #convert to inline but
         "/remove_member: Removes a member from being tracked\n"
         "/show_members: Shows all members being tracked\n\n"
         "/add_expense: Add an expense to be tracked\n"
-        "/undo: Undoes the latest expense added\n"
+        "/undo: Undoes the latest expense added. Use /undo <N> for the latest N, or /undo #<ID> for a specific expense\n"
         "/show_expenses: Shows expense log\n"
         "/show_balance: Shows balances of individual/all participant(s)\n"
         "/show_spending: Shows individual/group spending(s)\n"
@@ -1,6 +1,7 @@
 from telegram import Update
 from telegram.ext import CommandHandler, CallbackContext, ConversationHandler
-from telebot.engine.supabase.data_manager import add_participant, remove_participant, is_member, is_admin, connect_to_base
+from telebot.engine.storage.data_manager import add_participant, remove_participant, remove_all_participants, get_participants, is_member, is_admin
+from telebot.cleanup import delete_later
 import logging
 #expenses, balance, participants, admins, settlement_logs
 
@@ -27,19 +28,15 @@ async def specify_member(update: Update, context: CallbackContext):
 
     #Auto delete message
     bot_message = context.user_data.get("bot_message")
-    try:
-        await context.bot.deleteMessage(chat_id=bot_message.chat_id, message_id=bot_message.message_id)
-        await context.bot.deleteMessage(chat_id=update.message.chat_id, message_id=update.message.message_id)
-    except Exception as e:
-        pass
+    delete_later(context, bot_message, update.message)
 
-    if is_member(group_id, new_member):
+    if await is_member(group_id, new_member):
         await update.effective_chat.send_message(f"{new_member} is already in the group.")
         return ConversationHandler.END
 
     # Add the member from the database
     try:
-        add_participant(group_id, new_member)
+        await add_participant(group_id, new_member)
         await update.effective_chat.send_message(f"{new_member} has been added to the group by {user}.")
 
     except Exception as e:
@@ -66,20 +63,15 @@ async def remove_member_specify(update: Update, context: CallbackContext):
 
     #Auto delete message
     bot_message = context.user_data.get("bot_message")
-    try:
-        await context.bot.deleteMessage(chat_id=bot_message.chat_id, message_id=bot_message.message_id)
-        await context.bot.deleteMessage(chat_id=update.message.chat_id, message_id=update.message.message_id)
-    
-    except Exception as e:
-        pass
+    delete_later(context, bot_message, update.message)
 
-    if not is_member(group_id, old_member):
+    if not await is_member(group_id, old_member):
         context.user_data["bot_message"] = await update.effective_chat.send_message(f"{old_member} is not a member in the group.\nPlease try again.")
         return REMOVE_MEMBER_CONFIRMATION
 
     # Remove the member from the database
     try:
-        remove_participant(group_id, old_member)
+        await remove_participant(group_id, old_member)
         await update.effective_chat.send_message(f"{old_member} has been removed from the group by {user}.")
 
     except Exception as e:
@@ -96,7 +88,7 @@ async def remove_all_start(update: Update, context: CallbackContext):
     group_id = update.message.chat_id
     user = update.message.from_user.username
 
-    if not is_admin(group_id, user):
+    if not await is_admin(group_id, user):
         await update.message.reply_text(f"{user} is not authorised to perform this action. Get an admin to authorise you first.")
         return ConversationHandler.END
     
@@ -111,32 +103,14 @@ async def remove_all_confirm(update: Update, context: CallbackContext):
         group_id = update.message.chat_id
         
         try:
-            # Connect to the database
-            connection = connect_to_base()
-            cursor = connection.cursor()
-
-            # Remove all participants from the participants table
-            cursor.execute("""
-            DELETE FROM participants WHERE group_id = %s;
-            """, (group_id,))
-            
-            # Remove all balances from the balances table
-            cursor.execute("""
-            DELETE FROM balances WHERE group_id = %s;
-            """, (group_id,))
-
-            # Commit the changes
-            connection.commit()
+            # Remove all participants and their balances
+            await remove_all_participants(group_id)
 
             # Notify the user
             await update.message.reply_text("All members have been removed from the group.")
 
         except Exception as e:
             await update.message.reply_text(f"Error: {e}")
-    
-        finally:
-            if connection:
-                connection.close()
 
     else:
         await update.message.reply_text("The action to remove all members has been cancelled.")
@@ -155,31 +129,18 @@ async def show_members(update: Update, context: CallbackContext):
     group_id = update.message.chat_id
 
     try:
-        # Connect to the database
-        connection = connect_to_base()
-        cursor = connection.cursor()
-
         # Retrieve the list of participants for the group
-        cursor.execute("""
-        SELECT username FROM participants WHERE group_id = %s;
-        """, (group_id,))
-        
-        # Fetch all the results
-        members = cursor.fetchall()
+        members = await get_participants(group_id)
 
         if not members:
             await update.message.reply_text("There are no members in the group yet.")
             return
         
         # Create a string of all members
-        member_list = "\n".join([member[0] for member in members])  # Extracting the username from the tuple
+        member_list = "\n".join(members)
         
         # Send the list of members
         await update.message.reply_text(f"Members in the group:\n{member_list}")
 
     except Exception as e:
-        await update.message.reply_text(f"Error retrieving members: {e}")
-    
-    finally:
-        if connection:
-            connection.close()
\ No newline at end of file
+        await update.message.reply_text(f"Error retrieving members: {e}")
\ No newline at end of file
@@ -0,0 +1,491 @@
+import csv, io, json, logging, os, sqlite3
+from datetime import datetime, timezone
+from decimal import Decimal
+from telebot.credentials import SQLITE_PATH
+from telebot.engine.storage.base import StorageBackend, balance_deltas, iter_expense_rows, to_display
+from telebot.engine.sqlite.database import MIN_SQLITE_VERSION, transaction, get_connection, close_connections, connection_stats, to_decimal, to_timestamp
+from telebot.engine.sqlite.ledger import DISPLAY_RATE_SQL, append_deltas, append_entries, current_balances, display_rate, display_balances, snapshot_if_due
+from telebot.engine.expense.settlement_engine import plan_settlement
+
+#Embedded SQLite storage, for development and single-node deployments: every query is a local
+#file read, with no network round trip. Statement for statement it follows PostgresBackend, so
+#handlers stay within the same @query_budget on either backend.
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "schema.sql")
+SCHEMA_VERSION = 1  # Stored in PRAGMA user_version
+
+
+def _now():
+    """Timestamp for created_at columns: naive UTC, like NOW() on the Postgres server."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _beneficiaries(data):
+    """[{"beneficiary", "amount"}] from a json_group_array, with exact amounts."""
+    return [{"beneficiary": item["beneficiary"], "amount": Decimal(item["amount"])} for item in json.loads(data)]
+
+
+class SQLiteBackend(StorageBackend):
+    name = "sqlite"
+    errors = (sqlite3.Error,)
+
+    #Lifecycle
+    def check_schema(self):
+        """Create or update the schema in place; there is no separate migration step for a local file."""
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise RuntimeError(f"SQLite {sqlite3.sqlite_version} is too old; the SQLite backend needs {'.'.join(map(str, MIN_SQLITE_VERSION))} or later.")
+
+        connection = get_connection()
+        if connection.execute("PRAGMA user_version;").fetchone()[0] < SCHEMA_VERSION:
+            with open(SCHEMA_PATH) as file:
+                connection.executescript(file.read())
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+        logger.info(f"SQLite database {SQLITE_PATH} is at schema version {SCHEMA_VERSION}.")
+        return True
+
+    def close(self):
+        close_connections()
+
+    def stats(self):
+        return connection_stats()
+
+    #Groups, participants and admins
+    def load_roster(self, group_id):
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT 'participant', username FROM participants WHERE group_id = :group_id
+            UNION ALL
+            SELECT 'admin', username FROM admins WHERE group_id = :group_id;
+            """, {"group_id": group_id})
+            rows = cursor.fetchall()
+
+        participants = [username for kind, username in rows if kind == 'participant']
+        admins = [username for kind, username in rows if kind == 'admin']
+        return participants, admins
+
+    def add_group(self, group_id):
+        with transaction(write=True) as cursor:
+            cursor.execute("""
+            INSERT INTO groups (group_id)
+            VALUES (?)
+            ON CONFLICT(group_id) DO NOTHING;
+            """, (group_id,))
+
+    def init_group(self, group_id, username):
+        with transaction(write=True) as cursor:
+            cursor.execute("""
+            INSERT INTO groups (group_id, username)
+            VALUES (?, ?)
+            ON CONFLICT(group_id) DO NOTHING;
+            """, (group_id, username))
+
+            # Ensure 'RyanDaCow' is an admin
+            cursor.execute("""
+            INSERT INTO admins (group_id, username)
+            VALUES (?, ?)
+            ON CONFLICT(group_id, username) DO NOTHING;
+            """, (group_id, "RyanDaCow"))
+
+            cursor.execute("""
+            INSERT INTO currency (group_id, base_currency, rate)
+            VALUES (?, 'SGD', '1.00')
+            ON CONFLICT(group_id) DO NOTHING;
+            """, (group_id,))
+
+    def delete_group_data(self, group_id):
+        with transaction(write=True) as cursor:
+            # Children before the groups row they reference; beneficiaries go with their expenses (ON DELETE CASCADE)
+            for table in ("expenses", "participants", "balance_ledger", "balance_snapshots", "admins", "currency", "categories", "settlement_logs", "groups"):
+                cursor.execute(f"DELETE FROM {table} WHERE group_id = ?;", (group_id,))
+
+    def add_participant(self, group_id, username):
+        with transaction(write=True) as cursor:
+            cursor.execute("""
+            INSERT INTO participants (group_id, username)
+            VALUES (?, ?)
+            ON CONFLICT(group_id, username) DO NOTHING;
+            """, (group_id, username))
+
+    def remove_participant(self, group_id, username):
+        with transaction(write=True) as cursor:
+            cursor.execute("""
+            DELETE FROM participants WHERE group_id = ? AND username = ?;
+            """, (group_id, username))
+
+    def remove_all_participants(self, group_id):
+        with transaction(write=True) as cursor:
+            cursor.execute("""
+            DELETE FROM participants WHERE group_id = ?;
+            """, (group_id,))
+
+            # Zero every balance, so members added back start afresh
+            balances = current_balances(cursor, group_id, write=True)
+            append_deltas(cursor, group_id, {username: -balance for username, balance in balances.items()}, 'reset')
+
+    def insert_admin(self, group_id, username):
+        with transaction(write=True) as cursor:
+            cursor.execute("""
+            INSERT INTO admins (group_id, username)
+            VALUES (?, ?)
+            ON CONFLICT(group_id, username) DO NOTHING;
+            """, (group_id, username))
+
+    def remove_power(self, group_id, username):
+        with transaction(write=True) as cursor:
+            cursor.execute("""
+            DELETE FROM admins WHERE group_id = ? AND username = ?;
+            """, (group_id, username))
+
+    #Expenses and balances
+    def record_expense(self, group_id, purpose, payer, amount_paid, beneficiaries, split_amounts):
+        deltas = balance_deltas(payer, beneficiaries, split_amounts)
+
+        with transaction(write=True) as cursor:
+            cursor.execute(f"""
+            INSERT INTO expenses (group_id, purpose, payer, amount, currency, rate, created_at)
+            VALUES (
+                :group_id, :purpose, :payer, :amount,
+                COALESCE((SELECT base_currency FROM currency WHERE group_id = :group_id), 'SGD'),
+                {DISPLAY_RATE_SQL},
+                :created_at
+            )
+            RETURNING id, currency, rate;
+            """, {"group_id": group_id, "purpose": purpose, "payer": payer, "amount": Decimal(str(amount_paid)), "created_at": _now()})
+
+            expense_id, currency, rate = cursor.fetchone()
+
+            cursor.executemany("""
+            INSERT INTO expense_beneficiaries (expense_id, group_id, username, split_amount)
+            VALUES (?, ?, ?, ?);
+            """, [(expense_id, group_id, username, Decimal(str(amount))) for username, amount in zip(beneficiaries, split_amounts)])
+
+            append_deltas(cursor, group_id, deltas, 'expense', expense_id, currency, rate)
+            snapshot_if_due(cursor, group_id)
+
+            return currency
+
+    def undo_expenses(self, group_id, count=1, expense_id=None):
+        with transaction(write=True) as cursor:
+            if expense_id is not None:
+                target = "SELECT id FROM expenses WHERE group_id = :group_id AND id = :expense_id"
+            else:
+                target = "SELECT id FROM expenses WHERE group_id = :group_id ORDER BY created_at DESC, id DESC LIMIT :count"
+
+            cursor.execute(f"""
+            WITH target AS ({target})
+            SELECT e.id, e.purpose, e.payer, e.amount, e.currency, e.rate,
+                   json_group_array(json_object('beneficiary', eb.username, 'amount', eb.split_amount)) AS beneficiaries
+            FROM expenses e
+            JOIN target t ON t.id = e.id
+            JOIN expense_beneficiaries eb ON e.id = eb.expense_id
+            GROUP BY e.id
+            ORDER BY e.created_at DESC, e.id DESC;
+            """, {"group_id": group_id, "expense_id": expense_id, "count": count})
+
+            undone = []
+            reversals = []
+            for undone_id, purpose, payer, amount_paid, currency, rate, beneficiaries_data in cursor.fetchall():
+                beneficiaries_data = _beneficiaries(beneficiaries_data)
+                beneficiaries = [item['beneficiary'] for item in beneficiaries_data]
+                split_amounts = [item['amount'] for item in beneficiaries_data]
+                undone.append((undone_id, purpose, payer, to_decimal(amount_paid), currency, beneficiaries, split_amounts))
+
+                for username, delta in balance_deltas(payer, beneficiaries, split_amounts).items():
+                    reversals.append((username, -delta, undone_id, currency, rate))
+
+            if not undone:
+                return []
+
+            append_entries(cursor, group_id, reversals, 'undo')
+            snapshot_if_due(cursor, group_id)
+
+            # Beneficiaries are deleted with their expense (ON DELETE CASCADE)
+            expense_ids = [expense[0] for expense in undone]
+            cursor.execute(f"""
+            DELETE FROM expenses WHERE id IN ({', '.join('?' * len(expense_ids))});
+            """, expense_ids)
+
+            return undone
+
+    def get_expense_page(self, group_id, limit, cursor_key=None, newer=False):
+        if cursor_key is None:
+            keyset, order = "", "DESC"
+        elif newer:
+            keyset, order = "AND (created_at, id) > (:created_at, :id)", "ASC"
+        else:
+            keyset, order = "AND (created_at, id) < (:created_at, :id)", "DESC"
+
+        created_at, expense_id = cursor_key if cursor_key else (None, None)
+        with transaction() as cursor:
+            cursor.execute(f"""
+            WITH page AS (
+                SELECT id, purpose, payer, amount, currency, created_at
+                FROM expenses
+                WHERE group_id = :group_id {keyset}
+                ORDER BY created_at {order}, id {order}
+                LIMIT :limit
+            )
+            SELECT p.purpose, p.payer, p.amount, p.currency,
+                   json_group_array(json_object('beneficiary', eb.username, 'amount', eb.split_amount)) AS beneficiaries,
+                   p.id, p.created_at
+            FROM page p
+            JOIN expense_beneficiaries eb ON p.id = eb.expense_id
+            GROUP BY p.id
+            ORDER BY p.created_at {order}, p.id {order};
+            """, {"group_id": group_id, "created_at": created_at, "id": expense_id, "limit": limit + 1})
+            rows = [
+                (purpose, payer, to_decimal(amount), currency, _beneficiaries(beneficiaries), row_id, to_timestamp(row_created_at))
+                for purpose, payer, amount, currency, beneficiaries, row_id, row_created_at in cursor.fetchall()
+            ]
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if newer:
+            rows.reverse()
+        return rows, has_more
+
+    def get_balances(self, group_id):
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT username FROM participants WHERE group_id = ?;
+            """, (group_id,))
+            participants = [row[0] for row in cursor.fetchall()]
+
+            balances = display_balances(cursor, group_id)
+            return [(username, balances.get(username, Decimal(0))) for username in participants]
+
+    def get_member_balance(self, group_id, username):
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT username FROM participants WHERE group_id = ? AND LOWER(username) = ?;
+            """, (group_id, username.lower()))
+            member = cursor.fetchone()
+            if not member:
+                return None
+
+            return display_balances(cursor, group_id).get(member[0], Decimal(0))
+
+    def display_balances(self, group_id):
+        with transaction() as cursor:
+            return display_balances(cursor, group_id)
+
+    def settle_balances(self, group_id, user_id):
+        with transaction(write=True) as cursor:
+            balances = current_balances(cursor, group_id, write=True)
+            transfers, residual = plan_settlement(to_display(balances, display_rate(cursor, group_id)))
+
+            details = {
+                "transfers": [transfer.as_dict() for transfer in transfers],
+                "residual": str(residual),
+            }
+            cursor.execute("""
+            INSERT INTO settlement_logs (group_id, user_id, details)
+            VALUES (?, ?, ?);
+            """, (group_id, user_id, json.dumps(details)))
+            settlement_id = cursor.lastrowid
+
+            # Settle everyone by appending the opposite of their current balance, exactly, in the base currency
+            append_deltas(cursor, group_id, {username: -balance for username, balance in balances.items()}, 'settlement', settlement_id)
+
+        return transfers, residual, settlement_id
+
+    #Spending
+    def get_group_spending(self, group_id):
+        with transaction() as cursor:
+            cursor.execute(f"""
+            SELECT eb.username, dround(dmul(dsum(ddiv(eb.split_amount, e.rate)), {DISPLAY_RATE_SQL}), 2) AS total_spent
+            FROM expense_beneficiaries eb
+            JOIN expenses e ON eb.expense_id = e.id
+            WHERE eb.group_id = :group_id
+            GROUP BY eb.username;
+            """, {"group_id": group_id})
+            spending = [(username, to_decimal(total_spent)) for username, total_spent in cursor.fetchall()]
+
+        # Totals are text in SQL, so order them here
+        return sorted(spending, key=lambda row: row[1], reverse=True)
+
+    def get_member_spending(self, group_id, member):
+        with transaction() as cursor:
+            cursor.execute(f"""
+            SELECT COALESCE(e.category_name, 'Others') AS category, dround(dmul(dsum(ddiv(eb.split_amount, e.rate)), {DISPLAY_RATE_SQL}), 2) AS total_spent
+            FROM expense_beneficiaries eb
+            JOIN expenses e ON eb.expense_id = e.id
+            WHERE eb.group_id = :group_id AND eb.username = :member
+            GROUP BY e.category_name;
+            """, {"group_id": group_id, "member": member})
+            spending_data = [(category, to_decimal(total_spent)) for category, total_spent in cursor.fetchall()]
+
+            cursor.execute(f"""
+            SELECT dround(dmul(dsum(ddiv(eb.split_amount, e.rate)), {DISPLAY_RATE_SQL}), 2) AS total_spent
+            FROM expense_beneficiaries eb
+            JOIN expenses e ON eb.expense_id = e.id
+            WHERE eb.group_id = :group_id AND eb.username = :member;
+            """, {"group_id": group_id, "member": member})
+            total_spending = to_decimal(cursor.fetchone()[0]) or 0.00
+
+            return spending_data, total_spending
+
+    def get_member_category_spending(self, group_id, member, category):
+        with transaction() as cursor:
+            cursor.execute(f"""
+            SELECT COALESCE(e.category_name, 'Others') AS category, dround(dmul(dsum(ddiv(eb.split_amount, e.rate)), {DISPLAY_RATE_SQL}), 2) AS total_spent
+            FROM expense_beneficiaries eb
+            JOIN expenses e ON eb.expense_id = e.id
+            WHERE eb.group_id = :group_id AND eb.username = :member AND LOWER(e.category_name) = LOWER(:category)
+            GROUP BY e.category_name;
+            """, {"group_id": group_id, "member": member, "category": category})
+            row = cursor.fetchone()
+            return (row[0], to_decimal(row[1])) if row else None
+
+    #Currency
+    def get_base_currency(self, group_id):
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT base_currency FROM currency WHERE group_id = ?;
+            """, (group_id,))
+            result = cursor.fetchone()
+            return result[0] if result else None
+
+    def change_currency(self, group_id, new_currency, new_rate):
+        with transaction(write=True) as cursor:
+            cursor.execute("""
+            SELECT base_currency FROM currency WHERE group_id = ?;
+            """, (group_id,))
+            old = cursor.fetchone()
+
+            cursor.execute("""
+            INSERT INTO currency (group_id, base_currency, rate)
+            VALUES (?, ?, ?)
+            ON CONFLICT (group_id) DO UPDATE
+            SET base_currency = excluded.base_currency, rate = excluded.rate;
+            """, (group_id, new_currency, Decimal(str(new_rate))))
+
+            return old[0] if old and old[0] else 'SGD'
+
+    #Categories
+    def is_expense(self, group_id, expense):
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT 1 FROM expenses WHERE group_id = ? AND purpose = ?;
+            """, (group_id, expense))
+            return cursor.fetchone() is not None
+
+    def is_category(self, group_id, category_name):
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT 1 FROM categories WHERE group_id = ? AND LOWER(category_name) = LOWER(?);
+            """, (group_id, category_name.strip()))
+            return cursor.fetchone() is not None
+
+    def get_categories(self, group_id):
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT category_name FROM categories WHERE group_id = ?;
+            """, (group_id,))
+            return [row[0] for row in cursor.fetchall()]
+
+    def add_category(self, group_id, category_name):
+        with transaction(write=True) as cursor:
+            cursor.execute("""
+            INSERT INTO categories (group_id, category_name)
+            VALUES (?, ?)
+            ON CONFLICT(group_id, category_name) DO NOTHING;
+            """, (group_id, category_name))
+
+    def set_expense_category(self, group_id, category_name, expense_name):
+        with transaction(write=True) as cursor:
+            cursor.execute("""
+            UPDATE expenses
+            SET category_name = ?
+            WHERE group_id = ? AND purpose = ?;
+            """, (category_name, group_id, expense_name))
+
+    #Exchange rates
+    def load_exchange_rates(self, base_currency):
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT currency, rate, fetched_at FROM exchange_rates WHERE base_currency = ?;
+            """, (base_currency,))
+            rows = cursor.fetchall()
+
+        if not rows:
+            return {}, None
+        return {currency: rate for currency, rate, _ in rows}, min(fetched_at for _, _, fetched_at in rows)
+
+    def save_exchange_rates(self, base_currency, rates, fetched_at):
+        with transaction(write=True) as cursor:
+            cursor.executemany("""
+            INSERT INTO exchange_rates (base_currency, currency, rate, fetched_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (base_currency, currency) DO UPDATE
+            SET rate = excluded.rate, fetched_at = excluded.fetched_at;
+            """, [(base_currency, currency, Decimal(str(rate)), fetched_at) for currency, rate in rates.items()])
+
+    #Bot persistence
+    def load_bot_data(self, kind):
+        table, column = {"user": ("bot_user_data", "user_id"), "chat": ("bot_chat_data", "chat_id")}[kind]
+        with transaction() as cursor:
+            cursor.execute(f"SELECT {column}, data FROM {table};")
+            return {row_id: bytes(data) for row_id, data in cursor.fetchall()}
+
+    def load_conversations(self, name):
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT key, state FROM bot_conversations WHERE name = ?;
+            """, (name,))
+            return {key: bytes(state) for key, state in cursor.fetchall()}
+
+    def save_bot_persistence(self, user_data, chat_data, conversations):
+        now = _now()
+        with transaction(write=True) as cursor:
+            for table, column, changes in (("bot_user_data", "user_id", user_data), ("bot_chat_data", "chat_id", chat_data)):
+                upserts = [(row_id, data, now) for row_id, data in changes.items() if data is not None]
+                deletes = [(row_id,) for row_id, data in changes.items() if data is None]
+
+                if upserts:
+                    cursor.executemany(f"""
+                    INSERT INTO {table} ({column}, data, updated_at) VALUES (?, ?, ?)
+                    ON CONFLICT ({column}) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at;
+                    """, upserts)
+
+                if deletes:
+                    cursor.executemany(f"DELETE FROM {table} WHERE {column} = ?;", deletes)
+
+            upserts = [(name, key, state, now) for (name, key), state in conversations.items() if state is not None]
+            deletes = [(name, key) for (name, key), state in conversations.items() if state is None]
+
+            if upserts:
+                cursor.executemany("""
+                INSERT INTO bot_conversations (name, key, state, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (name, key) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at;
+                """, upserts)
+
+            if deletes:
+                cursor.executemany("""
+                DELETE FROM bot_conversations WHERE name = ? AND key = ?;
+                """, deletes)
+
+    #Export
+    def write_expenses_csv(self, group_id, file):
+        """Stream the group's expenses as CSV into a binary file object; the cursor steps through rows as they are written."""
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT
+                e.id AS expense_id,
+                e.purpose,
+                e.amount,
+                e.currency,
+                e.payer,
+                eb.username,
+                eb.split_amount
+            FROM expenses e
+            JOIN expense_beneficiaries eb ON e.id = eb.expense_id
+            WHERE e.group_id = ?
+            ORDER BY e.created_at, e.id, eb.id;
+            """, (group_id,))
+
+            text = io.TextIOWrapper(file, encoding="utf-8", newline="")
+            csv.writer(text).writerows(iter_expense_rows(cursor))
+            text.flush()
+            text.detach()  # Hand the file back to the caller open
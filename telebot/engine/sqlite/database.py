@@ -0,0 +1,170 @@
+import logging, sqlite3, threading, time
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from telebot.credentials import SQLITE_PATH, SQLITE_BUSY_TIMEOUT, SQLITE_CACHE_SIZE, SQLITE_MMAP_SIZE
+from telebot.engine.storage.querylog import record_statement
+
+#Embedded SQLite storage: one database file on local disk, one connection per worker thread.
+#The file is in WAL mode, so readers never block the single writer nor each other; write
+#transactions start with BEGIN IMMEDIATE, so writers queue on the busy timeout instead of
+#failing halfway through.
+#
+#Money is kept exact: DECIMAL_TEXT columns hold Decimals as text (TEXT affinity, so SQLite never
+#turns them into floats) and are read back as Decimals. Sums and conversions go through the
+#dsum/ddiv/dmul/dround SQL functions below, which compute with Decimal and return text.
+
+logger = logging.getLogger(__name__)
+
+MIN_SQLITE_VERSION = (3, 35, 0)  # RETURNING; UPSERT, row values and JSON functions are older
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL;",
+    "PRAGMA synchronous = NORMAL;",            # Durable at each checkpoint; WAL keeps the file consistent
+    "PRAGMA foreign_keys = ON;",
+    "PRAGMA temp_store = MEMORY;",
+    f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE};",  # Negative means KiB rather than pages
+    f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE};",
+)
+
+
+def _timestamp(text):
+    return datetime.fromisoformat(text.decode())
+
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" ", timespec="microseconds"))
+sqlite3.register_converter("DECIMAL_TEXT", lambda text: Decimal(text.decode()))
+sqlite3.register_converter("TIMESTAMP", _timestamp)
+sqlite3.register_converter("TIMESTAMPTZ", _timestamp)
+
+
+def to_decimal(value):
+    """Decimal of a value computed in SQL, which comes back as text (or None)."""
+    return None if value is None else Decimal(value)
+
+def to_timestamp(value):
+    """datetime of a timestamp read through a CTE or expression, where no converter applies."""
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+def _ddiv(a, b):
+    return None if a is None or b is None else str(Decimal(a) / Decimal(b))
+
+def _dmul(a, b):
+    return None if a is None or b is None else str(Decimal(a) * Decimal(b))
+
+def _dround(value, places):
+    if value is None:
+        return None
+    # Half away from zero, like Postgres ROUND on NUMERIC
+    return str(Decimal(value).quantize(Decimal(1).scaleb(-places), rounding=ROUND_HALF_UP))
+
+
+class DecimalSum:
+    """SUM over DECIMAL_TEXT values; NULL over no rows, like SUM."""
+
+    def __init__(self):
+        self.total = None
+
+    def step(self, value):
+        if value is not None:
+            self.total = (self.total or Decimal(0)) + Decimal(value)
+
+    def finalize(self):
+        return None if self.total is None else str(self.total)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor recording each statement with querylog, as the Postgres cursor does."""
+
+    def execute(self, statement, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(statement, parameters)
+        finally:
+            record_statement(statement, time.perf_counter() - start, max(self.rowcount, 0))
+
+    def executemany(self, statement, parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(statement, parameters)
+        finally:
+            record_statement(statement, time.perf_counter() - start, max(self.rowcount, 0))
+
+
+#One connection per thread: executor threads are long-lived, so each opens its connection once
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+_active = 0  # Transactions open right now, across threads
+_generation = 0  # Bumped by close_connections(), so threads reconnect afterwards
+
+def connect():
+    connection = sqlite3.connect(
+        SQLITE_PATH,
+        timeout=SQLITE_BUSY_TIMEOUT,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        isolation_level=None,  # Transactions are begun explicitly by transaction()
+        check_same_thread=False,  # Only its own thread uses it; close_connections() runs on the main thread
+    )
+    for pragma in PRAGMAS:
+        connection.execute(pragma)
+
+    connection.create_function("ddiv", 2, _ddiv, deterministic=True)
+    connection.create_function("dmul", 2, _dmul, deterministic=True)
+    connection.create_function("dround", 2, _dround, deterministic=True)
+    connection.create_aggregate("dsum", 1, DecimalSum)
+    return connection
+
+def get_connection():
+    if getattr(_local, "generation", None) != _generation:
+        connection = connect()
+        with _connections_lock:
+            _connections.append(connection)
+        _local.connection, _local.generation = connection, _generation
+    return _local.connection
+
+@contextmanager
+def transaction(write=False):
+    """Yield a cursor in a transaction on this thread's connection, committing on success and rolling back on error.
+
+    Pass write=True for transactions that modify data: they take the write lock up front, so they
+    cannot fail to upgrade from a stale read snapshot halfway through.
+    """
+    global _active
+
+    connection = get_connection()
+    connection.execute("BEGIN IMMEDIATE;" if write else "BEGIN;")
+    with _connections_lock:
+        _active += 1
+
+    cursor = connection.cursor(InstrumentedCursor)
+    try:
+        yield cursor
+        connection.execute("COMMIT;")
+    except Exception:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK;")
+        raise
+    finally:
+        cursor.close()
+        with _connections_lock:
+            _active -= 1
+
+def close_connections():
+    """Close every thread's connection, e.g. on shutdown, letting SQLite refresh its planner statistics first."""
+    global _generation
+
+    with _connections_lock:
+        _generation += 1
+        for connection in _connections:
+            try:
+                connection.execute("PRAGMA optimize;")
+            except sqlite3.Error as e:
+                logger.warning(f"Could not optimize the SQLite database: {e}")
+            connection.close()
+        _connections.clear()
+
+def connection_stats():
+    """Transactions open now and connections opened, for /health."""
+    with _connections_lock:
+        return {"in_use": _active, "connections": len(_connections)}
@@ -0,0 +1,113 @@
+import threading
+from decimal import Decimal
+from telebot.credentials import LEDGER_SNAPSHOT_INTERVAL
+from telebot.engine.storage.base import BASE_CURRENCY, to_display
+
+#The balance ledger of telebot/engine/supabase/ledger.py on SQLite: balances are the latest
+#snapshot plus the entries since, summed in BASE_CURRENCY, and a snapshot is taken once the
+#tail grows past LEDGER_SNAPSHOT_INTERVAL entries.
+#
+#Snapshots are only written inside write transactions. A read transaction upgrading to a writer
+#would wait out the busy timeout behind the current writer, and fail anyway if one committed since
+#it began; instead a read that finds the tail too long marks the group, and the group's next
+#write transaction takes the snapshot.
+#
+#No advisory lock is needed: SQLite has a single writer, and every transaction that appends
+#entries starts with BEGIN IMMEDIATE, so a group's entries commit in id order.
+
+_due = set()  # Groups a read found past LEDGER_SNAPSHOT_INTERVAL, snapshotted by their next write
+_due_lock = threading.Lock()
+
+BALANCES_SQL = """
+WITH snapshot AS (
+    SELECT COALESCE(MAX(ledger_id), 0) AS ledger_id
+    FROM balance_snapshots
+    WHERE group_id = :group_id
+),
+entries AS (
+    SELECT s.username, s.balance AS amount, 0 AS tail
+    FROM balance_snapshots s
+    JOIN snapshot ON s.ledger_id = snapshot.ledger_id
+    WHERE s.group_id = :group_id
+
+    UNION ALL
+
+    SELECT l.username, ddiv(l.delta, l.rate), 1
+    FROM balance_ledger l
+    JOIN snapshot ON l.id > snapshot.ledger_id
+    WHERE l.group_id = :group_id
+)
+SELECT username, dsum(amount) AS balance, SUM(tail) AS tail_entries
+FROM entries
+GROUP BY username
+"""
+
+# The group's display rate; groups without a (non-zero) currency rate are shown in BASE_CURRENCY
+DISPLAY_RATE_SQL = "COALESCE((SELECT rate FROM currency WHERE group_id = :group_id AND CAST(rate AS REAL) <> 0), '1')"
+
+
+def append_entries(cursor, group_id, entries, event_type):
+    """Append (username, delta, event_id, currency, rate) entries to the ledger in one statement."""
+    rows = [
+        (group_id, username, Decimal(str(delta)), event_type, event_id, currency, Decimal(str(rate)))
+        for username, delta, event_id, currency, rate in entries if delta
+    ]
+    if not rows:
+        return
+
+    cursor.executemany("""
+    INSERT INTO balance_ledger (group_id, username, delta, event_type, event_id, currency, rate)
+    VALUES (?, ?, ?, ?, ?, ?, ?);
+    """, rows)
+
+def append_deltas(cursor, group_id, deltas, event_type, event_id=None, currency=BASE_CURRENCY, rate=1):
+    """Append one entry per member from a {username: delta} mapping, all in one currency."""
+    append_entries(cursor, group_id, [(username, delta, event_id, currency, rate) for username, delta in deltas.items()], event_type)
+
+def take_snapshot(cursor, group_id):
+    """Fold the group's ledger into a new snapshot."""
+    # WHERE true keeps SQLite from reading ON CONFLICT as part of the join
+    cursor.execute(f"""
+    INSERT INTO balance_snapshots (group_id, ledger_id, username, balance)
+    SELECT :group_id, (SELECT MAX(id) FROM balance_ledger WHERE group_id = :group_id), b.username, b.balance
+    FROM ({BALANCES_SQL}) b
+    WHERE true
+    ON CONFLICT DO NOTHING;
+    """, {"group_id": group_id})
+
+def snapshot_if_due(cursor, group_id):
+    """Take the snapshot a read found due. Only call inside write transactions, after appending entries."""
+    with _due_lock:
+        if group_id not in _due:
+            return
+        _due.discard(group_id)
+    take_snapshot(cursor, group_id)
+
+def current_balances(cursor, group_id, write=False):
+    """{username: balance in BASE_CURRENCY} for everyone with ledger history in the group.
+
+    Amounts are unrounded, so appending their negation in BASE_CURRENCY zeroes a balance exactly.
+    Pass write=True inside write transactions, which may take a due snapshot straight away.
+    """
+    cursor.execute(BALANCES_SQL + ";", {"group_id": group_id})
+    rows = cursor.fetchall()
+
+    if sum(tail_entries for _, _, tail_entries in rows) > LEDGER_SNAPSHOT_INTERVAL:
+        with _due_lock:
+            if write:
+                _due.discard(group_id)
+            else:
+                _due.add(group_id)
+        if write:
+            take_snapshot(cursor, group_id)
+
+    return {username: Decimal(balance) for username, balance, _ in rows}
+
+def display_rate(cursor, group_id):
+    """Units of the group's display currency per 1 BASE_CURRENCY."""
+    cursor.execute(f"SELECT {DISPLAY_RATE_SQL};", {"group_id": group_id})
+    return Decimal(cursor.fetchone()[0])
+
+def display_balances(cursor, group_id):
+    """{username: balance in the group's display currency}, rounded to cents."""
+    return to_display(current_balances(cursor, group_id), display_rate(cursor, group_id))
@@ -0,0 +1,142 @@
+-- Schema of the embedded SQLite backend: the Postgres schema after every migration in
+-- telebot/engine/supabase/migrations, minus the retired balances table.
+-- Applied at startup; every statement is IF NOT EXISTS. Bump SCHEMA_VERSION in backend.py when changing it.
+--
+-- Money columns are DECIMAL_TEXT: text affinity, read back as Decimal (see database.py).
+-- Timestamps are ISO 8601 text in UTC.
+
+CREATE TABLE IF NOT EXISTS groups (
+    group_id INTEGER PRIMARY KEY,
+    username TEXT
+);
+
+CREATE TABLE IF NOT EXISTS expenses (
+    id INTEGER PRIMARY KEY,
+    group_id INTEGER REFERENCES groups(group_id),                -- Group the expense belongs to
+    purpose TEXT,                                                -- Description of the expense
+    payer TEXT,                                                  -- Username of the payer
+    amount DECIMAL_TEXT,                                         -- Total amount of the expense
+    currency TEXT,                                               -- Currency of the expense
+    rate DECIMAL_TEXT NOT NULL DEFAULT '1',                      -- Units of currency per 1 SGD when recorded
+    category_name TEXT DEFAULT NULL,                             -- Name of the category (unique per group only, so no FK)
+    created_at TIMESTAMP                                         -- Set by the backend, with microseconds, for keyset paging
+);
+
+CREATE TABLE IF NOT EXISTS expense_beneficiaries (
+    id INTEGER PRIMARY KEY,
+    group_id INTEGER REFERENCES groups(group_id),                  -- Group the beneficiary belongs to
+    expense_id INTEGER REFERENCES expenses(id) ON DELETE CASCADE,  -- Link to the expense
+    username TEXT,                                                 -- Username of the beneficiary
+    split_amount DECIMAL_TEXT                                      -- Amount the beneficiary owes
+);
+
+CREATE TABLE IF NOT EXISTS participants (
+    id INTEGER PRIMARY KEY,
+    group_id INTEGER,
+    username TEXT,
+    UNIQUE(group_id, username)
+);
+
+CREATE TABLE IF NOT EXISTS settlement_logs (
+    id INTEGER PRIMARY KEY,
+    group_id INTEGER REFERENCES groups(group_id),  -- Group the settlement belongs to
+    user_id INTEGER,                              -- User ID of the person settling
+    settled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    details TEXT                                  -- The settlement plan, as JSON
+);
+
+CREATE TABLE IF NOT EXISTS admins (
+    id INTEGER PRIMARY KEY,
+    group_id INTEGER REFERENCES groups(group_id),
+    username TEXT,
+    UNIQUE (group_id, username)
+);
+
+CREATE TABLE IF NOT EXISTS currency (
+    group_id INTEGER PRIMARY KEY,
+    base_currency TEXT DEFAULT 'SGD',
+    rate DECIMAL_TEXT DEFAULT '0.00'    -- Units of base_currency per 1 SGD; 0 means not set
+);
+
+CREATE TABLE IF NOT EXISTS categories (
+    group_id INTEGER,
+    category_name TEXT,
+    PRIMARY KEY (group_id, category_name)
+);
+
+-- Every change to a member's balance, in the currency and at the rate it was recorded with
+CREATE TABLE IF NOT EXISTS balance_ledger (
+    id INTEGER PRIMARY KEY,
+    group_id INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    delta DECIMAL_TEXT NOT NULL,              -- Change to the balance (positive means they owe more)
+    event_type TEXT NOT NULL,                 -- 'expense', 'undo', 'settlement' or 'reset'
+    event_id INTEGER,                         -- Expense or settlement the entry came from, if any
+    currency TEXT NOT NULL DEFAULT 'SGD',
+    rate DECIMAL_TEXT NOT NULL DEFAULT '1',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Balance of every member, in SGD, as of a ledger entry
+CREATE TABLE IF NOT EXISTS balance_snapshots (
+    group_id INTEGER NOT NULL,
+    ledger_id INTEGER NOT NULL,               -- Last ledger entry folded into the snapshot
+    username TEXT NOT NULL,
+    balance DECIMAL_TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (group_id, ledger_id, username)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS exchange_rates (
+    base_currency TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    rate DECIMAL_TEXT NOT NULL,
+    fetched_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (base_currency, currency)
+) WITHOUT ROWID;
+
+-- python-telegram-bot persistence (pickled values)
+CREATE TABLE IF NOT EXISTS bot_user_data (
+    user_id INTEGER PRIMARY KEY,
+    data BLOB NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS bot_chat_data (
+    chat_id INTEGER PRIMARY KEY,
+    data BLOB NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS bot_conversations (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    state BLOB NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (name, key)
+) WITHOUT ROWID;
+
+-- The hot-path indexes of the Postgres schema (SQLite has no INCLUDE, so covering columns are trailing keys)
+CREATE INDEX IF NOT EXISTS idx_expenses_group_created
+ON expenses (group_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_expenses_group_purpose
+ON expenses (group_id, purpose);
+
+CREATE INDEX IF NOT EXISTS idx_expenses_group_category_lower
+ON expenses (group_id, LOWER(category_name));
+
+CREATE INDEX IF NOT EXISTS idx_expense_beneficiaries_group_username
+ON expense_beneficiaries (group_id, username, expense_id, split_amount);
+
+CREATE INDEX IF NOT EXISTS idx_expense_beneficiaries_expense
+ON expense_beneficiaries (expense_id);
+
+CREATE INDEX IF NOT EXISTS idx_participants_group_username_lower
+ON participants (group_id, LOWER(username));
+
+CREATE INDEX IF NOT EXISTS idx_categories_group_name_lower
+ON categories (group_id, LOWER(category_name));
+
+CREATE INDEX IF NOT EXISTS idx_balance_ledger_group_id
+ON balance_ledger (group_id, id, username, delta, rate);
@@ -0,0 +1,21 @@
+from telebot.credentials import STORAGE_BACKEND
+from telebot.engine.storage.base import StorageBackend
+
+#Selects the database behind data_manager from STORAGE_BACKEND: "postgres" (Supabase, the default)
+#or "sqlite" (one local file, for development and small single-node deployments).
+#Backends are imported on first use, so a deployment only loads the driver it runs on.
+
+_backend = None
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if STORAGE_BACKEND == "postgres":
+            from telebot.engine.supabase.backend import PostgresBackend
+            _backend = PostgresBackend()
+        elif STORAGE_BACKEND == "sqlite":
+            from telebot.engine.sqlite.backend import SQLiteBackend
+            _backend = SQLiteBackend()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r}; expected 'postgres' or 'sqlite'.")
+    return _backend
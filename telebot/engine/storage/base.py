@@ -0,0 +1,186 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+#What data_manager needs from a database. Methods are blocking and each runs in its own
+#transaction; data_manager runs them on the executor and keeps the roster cache in front of them.
+#Amounts are Decimals throughout, and balances are returned in the group's display currency.
+
+BASE_CURRENCY = "SGD"  # Rates are units of a currency per 1 BASE_CURRENCY; ledgers sum balances in it
+CENT = Decimal("0.01")
+
+
+class StorageBackend:
+    name = None
+    errors = ()  # Exception classes the backend raises for database failures
+
+    #Lifecycle
+    def check_schema(self):
+        """Startup check: True if the database is ready for this version of the code."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release every connection, e.g. on shutdown."""
+        raise NotImplementedError
+
+    def stats(self):
+        """Connection usage, for /health."""
+        raise NotImplementedError
+
+    #Groups, participants and admins
+    def load_roster(self, group_id):
+        """(participants, admins) usernames of the group, in one round trip."""
+        raise NotImplementedError
+
+    def add_group(self, group_id):
+        raise NotImplementedError
+
+    def init_group(self, group_id, username):
+        """Ensure the group, its default admin and its currency row exist."""
+        raise NotImplementedError
+
+    def delete_group_data(self, group_id):
+        """Delete every row belonging to the group."""
+        raise NotImplementedError
+
+    def add_participant(self, group_id, username):
+        raise NotImplementedError
+
+    def remove_participant(self, group_id, username):
+        raise NotImplementedError
+
+    def remove_all_participants(self, group_id):
+        """Remove every participant and zero every balance."""
+        raise NotImplementedError
+
+    def insert_admin(self, group_id, username):
+        raise NotImplementedError
+
+    def remove_power(self, group_id, username):
+        raise NotImplementedError
+
+    #Expenses and balances
+    def record_expense(self, group_id, purpose, payer, amount_paid, beneficiaries, split_amounts):
+        """Insert the expense and its beneficiaries and update balances. Returns the currency used."""
+        raise NotImplementedError
+
+    def undo_expenses(self, group_id, count=1, expense_id=None):
+        """Reverse and delete the latest `count` expenses, or the one with `expense_id`.
+
+        Returns (id, purpose, payer, amount, currency, beneficiaries, split_amounts) per expense, newest first.
+        """
+        raise NotImplementedError
+
+    def get_expense_page(self, group_id, limit, cursor_key=None, newer=False):
+        """(rows, has_more) of expense history by keyset on (created_at, id).
+
+        Each row is (purpose, payer, amount, currency, beneficiaries, id, created_at), beneficiaries
+        being a list of {"beneficiary", "amount"}.
+        """
+        raise NotImplementedError
+
+    def get_balances(self, group_id):
+        """(username, balance) for every participant in the group."""
+        raise NotImplementedError
+
+    def get_member_balance(self, group_id, username):
+        """Balance of one member, matched case-insensitively. None if they are not a member."""
+        raise NotImplementedError
+
+    def display_balances(self, group_id):
+        """{username: balance} for everyone with ledger history, rounded to cents."""
+        raise NotImplementedError
+
+    def settle_balances(self, group_id, user_id):
+        """Plan the transfers settling the group, log the plan and zero every balance.
+
+        Returns (transfers, residual, settlement_id).
+        """
+        raise NotImplementedError
+
+    #Spending
+    def get_group_spending(self, group_id):
+        """(username, total spent) biggest spender first."""
+        raise NotImplementedError
+
+    def get_member_spending(self, group_id, member):
+        """([(category, total spent)], total) of one member."""
+        raise NotImplementedError
+
+    def get_member_category_spending(self, group_id, member, category):
+        """(category, total spent) of one member in one category, or None."""
+        raise NotImplementedError
+
+    #Currency
+    def get_base_currency(self, group_id):
+        raise NotImplementedError
+
+    def change_currency(self, group_id, new_currency, new_rate):
+        """Switch the group's display currency. Returns the old currency."""
+        raise NotImplementedError
+
+    #Categories
+    def is_expense(self, group_id, expense):
+        raise NotImplementedError
+
+    def is_category(self, group_id, category_name):
+        raise NotImplementedError
+
+    def get_categories(self, group_id):
+        raise NotImplementedError
+
+    def add_category(self, group_id, category_name):
+        raise NotImplementedError
+
+    def set_expense_category(self, group_id, category_name, expense_name):
+        raise NotImplementedError
+
+    #Exchange rates
+    def load_exchange_rates(self, base_currency):
+        """({currency: rate}, fetched_at) last persisted for base_currency, or ({}, None)."""
+        raise NotImplementedError
+
+    def save_exchange_rates(self, base_currency, rates, fetched_at):
+        raise NotImplementedError
+
+    #Bot persistence
+    def load_bot_data(self, kind):
+        """{id: pickled bytes} of user ('user') or chat ('chat') data."""
+        raise NotImplementedError
+
+    def load_conversations(self, name):
+        """{JSON key: pickled state} of one ConversationHandler."""
+        raise NotImplementedError
+
+    def save_bot_persistence(self, user_data, chat_data, conversations):
+        """Write a batch of persistence changes in one transaction; None values delete."""
+        raise NotImplementedError
+
+    #Export
+    def write_expenses_csv(self, group_id, file):
+        """Stream the group's expenses as CSV into a binary file object."""
+        raise NotImplementedError
+
+
+def to_display(balances, rate):
+    """Convert {username: BASE_CURRENCY balance} to the display currency, rounded to cents."""
+    return {username: (balance * rate).quantize(CENT, rounding=ROUND_HALF_UP) for username, balance in balances.items()}
+
+def balance_deltas(payer, beneficiaries, split_amounts):
+    """Net balance change per member for one expense: the payer is owed each split, beneficiaries owe theirs."""
+    deltas = {}
+    for beneficiary, split_amount in zip(beneficiaries, split_amounts):
+        split_amount = Decimal(str(split_amount))
+        deltas[payer] = deltas.get(payer, Decimal(0)) - split_amount
+        deltas[beneficiary] = deltas.get(beneficiary, Decimal(0)) + split_amount
+    return deltas
+
+EXPORT_COLUMNS = ["expense_id", "purpose", "amount", "currency", "payer", "username", "split_amount"]
+
+def iter_expense_rows(rows):
+    """CSV rows of a streamed export query, renumbering expenses 1, 2, 3... in order of appearance."""
+    yield EXPORT_COLUMNS
+
+    number, last_id = 0, None
+    for expense_id, *rest in rows:
+        if expense_id != last_id:
+            number, last_id = number + 1, expense_id
+        yield [number, *rest]
@@ -0,0 +1,83 @@
+import threading, time
+from collections import OrderedDict
+from telebot.credentials import ROSTER_CACHE_MAX_GROUPS, ROSTER_CACHE_TTL
+
+#In-process cache of each group's participants and admins, so membership and
+#permission checks are memory lookups. Writers call invalidate(group_id).
+
+
+class Roster:
+    """Participants and admins of one group, in database order plus sets for lookups."""
+
+    def __init__(self, participants, admins):
+        self.participants = tuple(participants)
+        self.admins = tuple(admins)
+        self.participant_set = frozenset(self.participants)
+        self.admin_set = frozenset(self.admins)
+        self.loaded_at = time.monotonic()
+
+
+class RosterCache:
+    """LRU cache of Rosters keyed by group_id, with a TTL on each entry."""
+
+    def __init__(self, max_groups=ROSTER_CACHE_MAX_GROUPS, ttl=ROSTER_CACHE_TTL):
+        self.max_groups = max_groups
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # Invalidations are stamped from a global clock; only the latest max_groups stamps are kept,
+        # and _floor stands in for every forgotten one, so memory stays bounded
+        self._clock = 0
+        self._invalidated = OrderedDict()  # group_id -> clock at its last invalidation
+        self._floor = 0
+        self._lock = threading.Lock()  # Invalidations come from executor threads
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, group_id):
+        with self._lock:
+            roster = self._entries.get(group_id)
+            if roster is None or time.monotonic() - roster.loaded_at > self.ttl:
+                self._entries.pop(group_id, None)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(group_id)
+            self.hits += 1
+            return roster
+
+    def generation(self, group_id):
+        """Token to pass to put(), so a load that raced with a write is discarded."""
+        with self._lock:
+            return self._clock
+
+    def put(self, group_id, roster, generation):
+        with self._lock:
+            # Invalidated since the load began, or possibly so if the group's stamp was forgotten
+            if generation < self._invalidated.get(group_id, self._floor):
+                return
+
+            self._entries[group_id] = roster
+            self._entries.move_to_end(group_id)
+            while len(self._entries) > self.max_groups:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, group_id):
+        with self._lock:
+            self._entries.pop(group_id, None)
+            self._clock += 1
+            self._invalidated[group_id] = self._clock
+            self._invalidated.move_to_end(group_id)
+            while len(self._invalidated) > self.max_groups:
+                _, stamp = self._invalidated.popitem(last=False)
+                self._floor = max(self._floor, stamp)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._invalidated.clear()
+            # Loads already under way must not repopulate the cache
+            self._clock += 1
+            self._floor = self._clock
+
+
+roster_cache = RosterCache()
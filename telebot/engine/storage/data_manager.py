@@ -0,0 +1,350 @@
+from telegram import Update, InputFile
+from telegram.ext import CommandHandler, CallbackContext, ConversationHandler
+import tempfile
+from telebot.credentials import EXPORT_SPOOL_MAX_SIZE
+from telebot.executor import blocking
+from telebot.engine.storage.cache import Roster, roster_cache
+from telebot.engine.storage import get_backend
+from telebot.engine.expense.settlement_engine import plan_settlement
+
+#is_member, is_admin, is_expense, is_category, add_group, add_participant, remove_participant, export_expenses
+#Every helper here blocks on the database, so each is wrapped with @blocking and must be awaited.
+#The queries live in the storage backend chosen by STORAGE_BACKEND (telebot/engine/storage);
+#this module keeps the roster cache in front of it and invalidates it on every roster write.
+
+backend = get_backend()
+DatabaseError = backend.errors  # Exception classes handlers catch for database failures, whichever the backend
+
+
+#Lifecycle
+def check_schema():
+    """Startup check that the database is ready for this version of the code."""
+    return backend.check_schema()
+
+def close_storage():
+    """Release every database connection, e.g. on shutdown."""
+    backend.close()
+
+def storage_stats():
+    return backend.stats()
+
+
+
+#Groups
+@blocking
+def load_roster(group_id):
+    """Fetch the group's participants and admins in one round trip."""
+    return Roster(*backend.load_roster(group_id))
+
+async def get_roster(group_id):
+    """The group's participants and admins, served from the cache when possible."""
+    roster = roster_cache.get(group_id)
+    if roster is None:
+        generation = roster_cache.generation(group_id)
+        roster = await load_roster(group_id)
+        roster_cache.put(group_id, roster, generation)
+    return roster
+
+async def is_member(group_id, username):
+    try:
+        # Check if the user is in the group's participants
+        roster = await get_roster(group_id)
+        return username in roster.participant_set
+
+    except DatabaseError as e:
+        print(f"Error checking participant status: {e}")
+        return False
+
+async def is_admin(group_id, username):
+    try:
+        # Check if the user is in the group's admins
+        roster = await get_roster(group_id)
+        return username in roster.admin_set
+
+    except DatabaseError as e:
+        print(f"Error checking admin status: {e}")
+        return False
+
+@blocking
+def add_group(group_id):
+    #Insert group into groups table for tracking.
+    try:
+        backend.add_group(group_id)
+
+    except Exception as e:
+        print(f"Error adding group: {e}")
+        return "An error occurred while adding the group."
+
+@blocking
+def init_group(group_id, username):
+    """Ensure the group, its default admin and its currency row exist."""
+    backend.init_group(group_id, username)
+    roster_cache.invalidate(group_id)
+
+@blocking
+def delete_group_data(group_id):
+    """Delete every row belonging to the group in a single transaction."""
+    backend.delete_group_data(group_id)
+    roster_cache.invalidate(group_id)
+
+
+
+#Participants and admins
+async def get_participants(group_id):
+    roster = await get_roster(group_id)
+    return list(roster.participants)
+
+@blocking
+def add_participant(group_id, username):
+    """Insert a new participant into the participants table if not already a member."""
+    try:
+        backend.add_participant(group_id, username)
+        roster_cache.invalidate(group_id)
+
+    except Exception as e:
+        print(f"Error adding participant: {e}")
+        return "An error occurred while adding the participant."
+
+@blocking
+def remove_participant(group_id, username):
+    """Removes a new participant into the participants table if they are a member."""
+    try:
+        backend.remove_participant(group_id, username)
+        roster_cache.invalidate(group_id)
+
+    except DatabaseError as e:
+        print(f"Error adding participant: {e}")
+        return "An error occurred while adding the participant."
+
+@blocking
+def remove_all_participants(group_id):
+    backend.remove_all_participants(group_id)
+    roster_cache.invalidate(group_id)
+
+async def get_admins(group_id):
+    roster = await get_roster(group_id)
+    return list(roster.admins)
+
+@blocking
+def insert_admin(group_id, username):
+    """Insert a new admin into the admins table if not already an admin."""
+    try:
+        backend.insert_admin(group_id, username)
+        roster_cache.invalidate(group_id)
+
+    except Exception as e:
+        print(f"Error adding admin: {e}")
+        return "An error occurred while adding the admin."
+
+@blocking
+def remove_power(group_id, username):
+    """Removes an admin into the admins table if they are a admin."""
+    try:
+        backend.remove_power(group_id, username)
+        roster_cache.invalidate(group_id)
+
+    except Exception as e:
+        print(f"Error removing admin: {e}")
+        return "An error occurred while removing the admin."
+
+
+
+#Expenses and balances
+@blocking
+def record_expense(group_id, purpose, payer, amount_paid, beneficiaries, split_amounts):
+    """Insert the expense and its beneficiaries and update balances. Returns the currency used.
+
+    The expense keeps the group's currency and rate at the time, so later currency changes leave it intact.
+    """
+    return backend.record_expense(group_id, purpose, payer, amount_paid, beneficiaries, split_amounts)
+
+@blocking
+def undo_expenses(group_id, count=1, expense_id=None):
+    """Reverse and delete the latest `count` expenses, or the one with `expense_id`.
+
+    Returns (id, purpose, payer, amount, currency, beneficiaries, split_amounts) for each
+    expense undone, newest first.
+    """
+    return backend.undo_expenses(group_id, count, expense_id)
+
+@blocking
+def get_expense_page(group_id, limit, cursor_key=None, newer=False):
+    """One page of expense history, newest first, using keyset pagination on (created_at, id).
+
+    cursor_key is the (created_at, id) of the expense the page continues from: with newer=False
+    the page holds the expenses just older than it, with newer=True the ones just newer.
+    Returns (rows, has_more), where has_more tells whether further pages exist in that direction.
+    Each row is (purpose, payer, amount, currency, beneficiaries, id, created_at).
+    """
+    return backend.get_expense_page(group_id, limit, cursor_key, newer)
+
+@blocking
+def get_balances(group_id):
+    """(username, balance) for every participant in the group."""
+    return backend.get_balances(group_id)
+
+@blocking
+def get_member_balance(group_id, username):
+    """Balance of one member, matched case-insensitively. None if they are not a member."""
+    return backend.get_member_balance(group_id, username)
+
+@blocking
+def get_settlement_plan(group_id):
+    """Transfers that would settle the group right now, and any unmatched residual."""
+    return plan_settlement(backend.display_balances(group_id))
+
+@blocking
+def settle_balances(group_id, user_id):
+    """Plan the transfers settling the group, log the plan and zero every balance.
+
+    Returns (transfers, residual, settlement_id).
+    """
+    return backend.settle_balances(group_id, user_id)
+
+
+
+#Spending
+@blocking
+def get_group_spending(group_id):
+    """(username, total spent) in the group's display currency, biggest spender first."""
+    return backend.get_group_spending(group_id)
+
+@blocking
+def get_member_spending(group_id, member):
+    """Spending of one member per category, and their total, in the group's display currency."""
+    return backend.get_member_spending(group_id, member)
+
+@blocking
+def get_member_category_spending(group_id, member, category):
+    return backend.get_member_category_spending(group_id, member, category)
+
+
+
+#Currency
+@blocking
+def get_base_currency(group_id):
+    """The group's base currency, or None if it has not been set up."""
+    return backend.get_base_currency(group_id)
+
+@blocking
+def change_currency(group_id, new_currency, new_rate):
+    """Switch the group's display currency. Returns the old currency.
+
+    Expenses and ledger entries keep their own currency and rate, so this is a single
+    row update however many expenses or members the group has.
+    """
+    return backend.change_currency(group_id, new_currency, new_rate)
+
+
+
+#Categories
+@blocking
+def is_expense(group_id, expense):
+    try:
+        # Check if the expense exists in the group
+        return backend.is_expense(group_id, expense)
+
+    except DatabaseError as e:
+        print(f"Error checking expense: {e}")
+        return False
+
+
+
+@blocking
+def is_category(group_id, category_name):
+    try:
+        # True if category exists, False otherwise
+        return backend.is_category(group_id, category_name)
+
+    except Exception as e:
+        # Log the error for debugging purposes
+        print(f"Error checking category: {e}")
+        return False  # Default to False if an error occurs
+
+@blocking
+def get_categories(group_id):
+    return backend.get_categories(group_id)
+
+@blocking
+def add_category(group_id, category_name):
+    backend.add_category(group_id, category_name)
+
+@blocking
+def set_expense_category(group_id, category_name, expense_name):
+    backend.set_expense_category(group_id, category_name, expense_name)
+
+
+
+#Exchange rates
+@blocking
+def load_exchange_rates(base_currency):
+    """({currency: rate}, fetched_at) last persisted for base_currency, or ({}, None)."""
+    return backend.load_exchange_rates(base_currency)
+
+@blocking
+def save_exchange_rates(base_currency, rates, fetched_at):
+    """Upsert a full rate table in one statement."""
+    backend.save_exchange_rates(base_currency, rates, fetched_at)
+
+
+
+#Bot persistence
+@blocking
+def load_bot_data(kind):
+    """{id: pickled bytes} of every user ('user') or chat ('chat') data row."""
+    return backend.load_bot_data(kind)
+
+@blocking
+def load_conversations(name):
+    """{JSON key: pickled state} of one ConversationHandler."""
+    return backend.load_conversations(name)
+
+@blocking
+def save_bot_persistence(user_data, chat_data, conversations):
+    """Write a batch of persistence changes in one transaction.
+
+    user_data and chat_data map id -> pickled bytes, or None to delete the row;
+    conversations maps (name, JSON key) -> pickled state, or None once the conversation has ended.
+    """
+    backend.save_bot_persistence(user_data, chat_data, conversations)
+
+
+
+#Export
+@blocking
+def write_expenses_csv(group_id, file):
+    """Stream the group's expenses as CSV into a binary file object, without holding them all in memory."""
+    backend.write_expenses_csv(group_id, file)
+
+async def export_expenses(update: Update, context: CallbackContext):
+    group_id = update.message.chat_id
+    if update.message.chat == "group":
+        group_name = update.message.chat.title.strip(" ", "_") if update.message.chat.title else "exported"
+    else:
+        group_name = update.message.chat.username if update.message.chat.username else "exported"
+
+    try:
+        # Small exports stay in memory; large ones spill to an anonymous temp file removed on close
+        with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE, mode="w+b") as file:
+            await write_expenses_csv(group_id, file)
+            file.seek(0)
+
+            #Return to user; read_file_handle=False has httpx stream the file into the upload instead of reading it all first
+            await update.message.reply_document(
+                document=InputFile(file, filename=f"{group_name}_expenses.csv", read_file_handle=False),
+                filename=f"{group_name}_expenses.csv",
+                caption="Here is the exported expense data for your group.",
+                parse_mode="Markdown"
+            )
+
+    except Exception as e:
+        # Log and notify user of error
+        print(f"Error exporting expenses: {e}")
+        await update.message.reply_text("An error occurred while exporting expenses. Please try again.")
+
+
+#expenses = [] #track expenses overall
+#balance = {} #track balances of individuals
+#participants = set() #track participants
+#settlement_logs = [] #tracks when balances are settled
+#admins = ["RyanDaCow"]
@@ -0,0 +1,100 @@
+import functools, hashlib, logging, re
+from telebot.credentials import SLOW_QUERY_THRESHOLD, QUERY_BUDGET_ENFORCE
+from telebot.metrics import Counter, Gauge, Histogram, current_update
+
+#Every statement run through a storage backend's transaction() is passed to record_statement() by the
+#backend's cursor (InstrumentedCursor in supabase/database.py and sqlite/database.py). It records per
+#statement fingerprint (the SQL with literals and parameters replaced by ?) how often it ran,
+#how long it took and how many rows it touched, and logs statements slower than SLOW_QUERY_THRESHOLD.
+#
+#Handlers declare how many statements they may run with @query_budget(n). Going over is logged
+#and counted; with QUERY_BUDGET_ENFORCE set (tests, load tests) the update fails instead, so an
+#N+1 loop creeping back into e.g. record_expense is caught before it ships.
+
+logger = logging.getLogger(__name__)
+
+db_query_duration = Histogram("db_query_duration_seconds", "Time spent in cursor.execute, by statement kind")
+db_queries = Counter("db_queries_total", "Statements executed, by fingerprint id")
+db_query_seconds = Counter("db_query_seconds_total", "Time spent in statements, by fingerprint id")
+db_query_rows = Counter("db_query_rows_total", "Rows returned or affected, by fingerprint id")
+db_query_fingerprint = Gauge("db_query_fingerprint", "Always 1; maps a fingerprint id to its normalised SQL")
+db_slow_queries = Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_THRESHOLD, by fingerprint id")
+query_budget_exceeded = Counter("db_query_budget_exceeded_total", "Handler calls that ran more statements than declared")
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_PARAMETERS = re.compile(r"%\(\w+\)s|%s|(?<![:\w]):\w+")  # psycopg2, and SQLite's named style
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised at the end of an update that went over a declared budget, when QUERY_BUDGET_ENFORCE is set."""
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(statement):
+    """(id, normalised SQL, statement kind) of a statement. Cached, as the same few templates repeat."""
+    normalised = _COMMENTS.sub(" ", statement)
+    normalised = _STRINGS.sub("?", normalised)
+    normalised = _PARAMETERS.sub("?", normalised)
+    normalised = _NUMBERS.sub("?", normalised)
+    normalised = _LISTS.sub("(?)", normalised)
+    normalised = _SPACE.sub(" ", normalised).strip().rstrip(";").strip()
+
+    query_id = hashlib.sha1(normalised.encode()).hexdigest()[:12]
+    kind = normalised.split(" ", 1)[0].upper() if normalised else "EMPTY"
+    db_query_fingerprint.set(1, query_id=query_id, fingerprint=normalised)
+    return query_id, normalised, kind
+
+
+def record_statement(statement, elapsed, rows):
+    """Record one executed statement; shared by the cursors of every storage backend."""
+    query_id, normalised, kind = fingerprint(statement)
+
+    db_query_duration.observe(elapsed, statement=kind)
+    db_queries.inc(query_id=query_id)
+    db_query_seconds.inc(elapsed, query_id=query_id)
+    db_query_rows.inc(rows, query_id=query_id)
+
+    stats = current_update.get()
+    if stats is not None:
+        stats.record_query(elapsed)
+
+    if elapsed >= SLOW_QUERY_THRESHOLD:
+        db_slow_queries.inc(query_id=query_id)
+        update_id = stats.update_id if stats is not None else None
+        logger.warning(f"Slow query {query_id}: {elapsed * 1000:.0f}ms, {rows} row(s), update {update_id}: {normalised}")
+
+
+def query_budget(limit):
+    """Declare that a handler runs at most `limit` statements, counting those of everything it awaits."""
+    def decorator(callback):
+        label = f"{callback.__module__.rsplit('.', 1)[-1]}.{callback.__name__}"
+
+        @functools.wraps(callback)
+        async def wrapper(*args, **kwargs):
+            stats = current_update.get()
+            if stats is None:
+                return await callback(*args, **kwargs)
+
+            before = stats.queries
+            try:
+                return await callback(*args, **kwargs)
+            finally:
+                used = stats.queries - before
+                if used > limit:
+                    query_budget_exceeded.inc(handler=label)
+                    logger.warning(f"{label} ran {used} statements, over its budget of {limit} (update {stats.update_id})")
+                    stats.over_budget.append((label, used, limit))
+
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
+
+def check_budget(stats):
+    """Fail the update if it went over a budget and budgets are enforced."""
+    if QUERY_BUDGET_ENFORCE and stats.over_budget:
+        details = ", ".join(f"{label} ran {used} statements (budget {limit})" for label, used, limit in stats.over_budget)
+        raise QueryBudgetExceeded(f"Update {stats.update_id}: {details}")
@@ -0,0 +1,606 @@
+import psycopg2, json, csv, io
+from decimal import Decimal
+from psycopg2 import sql
+from telebot.credentials import EXPORT_FETCH_SIZE
+from telebot.engine.storage.base import StorageBackend, balance_deltas, iter_expense_rows, to_display
+from telebot.engine.supabase.database import transaction, close_pool, pool_stats
+from telebot.engine.supabase.migrate import check_schema_version
+from telebot.engine.supabase.ledger import DISPLAY_RATE_SQL, lock_ledger, append_deltas, append_entries, current_balances, display_rate, display_balances, snapshot_if_due
+from telebot.engine.expense.settlement_engine import plan_settlement
+
+#Supabase/Postgres storage: pooled connections, schema managed by telebot.engine.supabase.migrate,
+#balances kept in the ledger (see ledger.py).
+
+
+class PostgresBackend(StorageBackend):
+    name = "postgres"
+    errors = (psycopg2.Error,)
+
+    #Lifecycle
+    def check_schema(self):
+        return check_schema_version()
+
+    def close(self):
+        close_pool()
+
+    def stats(self):
+        return pool_stats()
+
+    #Groups, participants and admins
+    def load_roster(self, group_id):
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT 'participant', username FROM participants WHERE group_id = %s
+            UNION ALL
+            SELECT 'admin', username FROM admins WHERE group_id = %s;
+            """, (group_id, group_id))
+            rows = cursor.fetchall()
+
+        participants = [username for kind, username in rows if kind == 'participant']
+        admins = [username for kind, username in rows if kind == 'admin']
+        return participants, admins
+
+    def add_group(self, group_id):
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT 1 FROM groups WHERE group_id = %s;
+            """, (group_id,))
+
+            result = cursor.fetchone()
+
+            if result is not None:
+                cursor.execute("""
+                INSERT INTO groups (group_id)
+                VALUES (%s)
+                ON CONFLICT(group_id) DO NOTHING;  -- Avoid duplicates
+                """, (group_id,))
+
+    def init_group(self, group_id, username):
+        """Ensure the group, its default admin and its currency row exist."""
+        with transaction() as cursor:
+            # Ensure the group exists in the 'groups' table
+            cursor.execute("""
+            INSERT INTO groups (group_id, username)
+            VALUES (%s, %s)
+            ON CONFLICT(group_id) DO NOTHING;
+            """, (group_id, username))
+
+            print(f"group {group_id} created by {username}")
+
+            # Ensure 'RyanDaCow' is an admin
+            cursor.execute("""
+            INSERT INTO admins (group_id, username)
+            VALUES (%s, %s)
+            ON CONFLICT(group_id, username) DO NOTHING;
+            """, (group_id, "RyanDaCow"))
+
+            print(f"RyanDaCow ensured as admin for group {group_id}")
+
+            # Ensure currency entry exists for the group
+            cursor.execute("""
+            INSERT INTO currency (group_id, base_currency, rate)
+            VALUES (%s, 'SGD', 1.00)
+            ON CONFLICT(group_id) DO NOTHING;
+            """, (group_id,))
+
+    def delete_group_data(self, group_id):
+        """Delete every row belonging to the group in a single transaction."""
+        with transaction() as cursor:
+            # Delete from expense_beneficiaries (expenses related to the group)
+            cursor.execute("""
+            DELETE FROM expense_beneficiaries WHERE expense_id IN
+            (SELECT id FROM expenses WHERE group_id = %s);
+            """, (group_id,))
+
+            # Delete from expenses (expenses related to the group)
+            cursor.execute("""
+            DELETE FROM expenses WHERE group_id = %s;
+            """, (group_id,))
+
+            # Delete from participants (users related to the group)
+            cursor.execute("""
+            DELETE FROM participants WHERE group_id = %s;
+            """, (group_id,))
+
+            # Delete from balances (balance records related to the group)
+            cursor.execute("""
+            DELETE FROM balances WHERE group_id = %s;
+            """, (group_id,))
+
+            # Delete the balance ledger and its snapshots
+            cursor.execute("""
+            DELETE FROM balance_ledger WHERE group_id = %s;
+            """, (group_id,))
+
+            cursor.execute("""
+            DELETE FROM balance_snapshots WHERE group_id = %s;
+            """, (group_id,))
+
+            # Delete from admins (admins related to the group)
+            cursor.execute("""
+            DELETE FROM admins WHERE group_id = %s;
+            """, (group_id,))
+
+            # Optionally, delete from the currency table if you want to reset the base currency
+            cursor.execute("""
+            DELETE FROM currency WHERE group_id = %s;
+            """, (group_id,))
+
+            # Delete from categories table
+            cursor.execute("""
+            DELETE FROM categories WHERE group_id = %s;
+            """, (group_id,))
+
+            # Delete the settlement history, which references the group
+            cursor.execute("""
+            DELETE FROM settlement_logs WHERE group_id = %s;
+            """, (group_id,))
+
+            # Delete from groups (group_id and username)
+            cursor.execute("""
+            DELETE FROM groups WHERE group_id = %s;
+            """, (group_id,))
+
+    def add_participant(self, group_id, username):
+        with transaction() as cursor:
+            cursor.execute("""
+            INSERT INTO participants (group_id, username)
+            VALUES (%s, %s)
+            ON CONFLICT(group_id, username) DO NOTHING;  -- Avoid duplicates
+            """, (group_id, username))
+
+    def remove_participant(self, group_id, username):
+        with transaction() as cursor:
+            cursor.execute("""
+                DELETE FROM participants
+                WHERE group_id = %s AND username = %s;
+            """, (group_id, username))
+
+    def remove_all_participants(self, group_id):
+        with transaction() as cursor:
+            # Remove all participants from the participants table
+            cursor.execute("""
+            DELETE FROM participants WHERE group_id = %s;
+            """, (group_id,))
+
+            # Zero every balance, so members added back start afresh
+            lock_ledger(cursor, group_id)
+            balances = current_balances(cursor, group_id, write=True)
+            append_deltas(cursor, group_id, {username: -balance for username, balance in balances.items()}, 'reset')
+
+    def insert_admin(self, group_id, username):
+        with transaction() as cursor:
+            cursor.execute("""
+            INSERT INTO admins (group_id, username)
+            VALUES (%s, %s)
+            ON CONFLICT(group_id, username) DO NOTHING;  -- Avoid duplicates
+            """, (group_id, username))
+
+    def remove_power(self, group_id, username):
+        with transaction() as cursor:
+            cursor.execute("""
+                DELETE FROM admins
+                WHERE group_id = %s AND username = %s;
+            """, (group_id, username))
+
+    #Expenses and balances
+    def record_expense(self, group_id, purpose, payer, amount_paid, beneficiaries, split_amounts):
+        """Insert the expense and its beneficiaries and update balances. Returns the currency used.
+
+        The expense keeps the group's currency and rate at the time, so later currency changes leave it intact.
+        Always four statements, however many beneficiaries there are.
+        """
+        deltas = balance_deltas(payer, beneficiaries, split_amounts)
+
+        with transaction() as cursor:
+            # Insert expense into the 'expenses' table
+            cursor.execute(f"""
+            INSERT INTO expenses (group_id, purpose, payer, amount, currency, rate)
+            VALUES (
+                %(group_id)s, %(purpose)s, %(payer)s, %(amount)s,
+                COALESCE((SELECT base_currency FROM currency WHERE group_id = %(group_id)s), 'SGD'),
+                {DISPLAY_RATE_SQL}
+            )
+            RETURNING id, currency, rate;
+            """, {"group_id": group_id, "purpose": purpose, "payer": payer, "amount": amount_paid})
+
+            expense_id, currency, rate = cursor.fetchone()
+
+            # Insert all beneficiaries at once
+            cursor.execute("""
+            INSERT INTO expense_beneficiaries (expense_id, group_id, username, split_amount)
+            SELECT %s, %s, b.username, b.split_amount
+            FROM unnest(%s::text[], %s::numeric[]) AS b(username, split_amount);
+            """, (expense_id, group_id, list(beneficiaries), [Decimal(str(amount)) for amount in split_amounts]))
+
+            # Append the net change for every affected member to the ledger
+            append_deltas(cursor, group_id, deltas, 'expense', expense_id, currency, rate)
+            snapshot_if_due(cursor, group_id)
+
+            return currency
+
+    def undo_expenses(self, group_id, count=1, expense_id=None):
+        """Reverse and delete the latest `count` expenses, or the one with `expense_id`.
+
+        Returns (id, purpose, payer, amount, currency, beneficiaries, split_amounts) for each
+        expense undone, newest first. Runs in one transaction with a fixed number of statements
+        whatever the number of expenses or beneficiaries.
+        """
+        with transaction() as cursor:
+            # Lock and fetch the target expenses with their beneficiaries
+            if expense_id is not None:
+                target = "SELECT id FROM expenses WHERE group_id = %s AND id = %s FOR UPDATE"
+                params = (group_id, expense_id)
+            else:
+                target = "SELECT id FROM expenses WHERE group_id = %s ORDER BY created_at DESC, id DESC LIMIT %s FOR UPDATE"
+                params = (group_id, count)
+
+            cursor.execute(f"""
+            WITH target AS ({target})
+            SELECT e.id, e.purpose, e.payer, e.amount, e.currency, e.rate, json_agg(json_build_object('beneficiary', eb.username, 'amount', eb.split_amount)) AS beneficiaries
+            FROM expenses e
+            JOIN target t ON t.id = e.id
+            JOIN expense_beneficiaries eb ON e.id = eb.expense_id
+            GROUP BY e.id
+            ORDER BY e.created_at DESC, e.id DESC;
+            """, params)
+
+            undone = []
+            reversals = []
+            for undone_id, purpose, payer, amount_paid, currency, rate, beneficiaries_data in cursor.fetchall():
+                beneficiaries = [item['beneficiary'] for item in beneficiaries_data]
+                split_amounts = [item['amount'] for item in beneficiaries_data]
+                undone.append((undone_id, purpose, payer, amount_paid, currency, beneficiaries, split_amounts))
+
+                # The opposite of what recording the expense applied, in its original currency and rate
+                for username, delta in balance_deltas(payer, beneficiaries, split_amounts).items():
+                    reversals.append((username, -delta, undone_id, currency, rate))
+
+            if not undone:
+                return []
+
+            expense_ids = [expense[0] for expense in undone]
+
+            # Append the reversal of every expense to the ledger in one statement
+            append_entries(cursor, group_id, reversals, 'undo')
+            snapshot_if_due(cursor, group_id)
+
+            # Delete the expenses and associated beneficiaries
+            cursor.execute("""
+            DELETE FROM expense_beneficiaries WHERE expense_id = ANY(%s);
+            """, (expense_ids,))
+
+            cursor.execute("""
+            DELETE FROM expenses WHERE id = ANY(%s);
+            """, (expense_ids,))
+
+            return undone
+
+    def get_expense_page(self, group_id, limit, cursor_key=None, newer=False):
+        """One page of expense history, newest first, using keyset pagination on (created_at, id).
+
+        cursor_key is the (created_at, id) of the expense the page continues from: with newer=False
+        the page holds the expenses just older than it, with newer=True the ones just newer.
+        Returns (rows, has_more), where has_more tells whether further pages exist in that direction.
+        Each row is (purpose, payer, amount, currency, beneficiaries, id, created_at).
+        """
+        if cursor_key is None:
+            keyset, order = "", "DESC"
+        elif newer:
+            keyset, order = "AND (created_at, id) > (%(created_at)s, %(id)s)", "ASC"
+        else:
+            keyset, order = "AND (created_at, id) < (%(created_at)s, %(id)s)", "DESC"
+
+        created_at, expense_id = cursor_key if cursor_key else (None, None)
+        with transaction() as cursor:
+            # Only the page's expenses are aggregated, so the cost does not grow with history length
+            cursor.execute(f"""
+            WITH page AS (
+                SELECT id, purpose, payer, amount, currency, created_at
+                FROM expenses
+                WHERE group_id = %(group_id)s {keyset}
+                ORDER BY created_at {order}, id {order}
+                LIMIT %(limit)s
+            )
+            SELECT p.purpose, p.payer, p.amount, p.currency,
+                   json_agg(json_build_object('beneficiary', eb.username, 'amount', eb.split_amount)) AS beneficiaries,
+                   p.id, p.created_at
+            FROM page p
+            JOIN expense_beneficiaries eb ON p.id = eb.expense_id
+            GROUP BY p.id, p.purpose, p.payer, p.amount, p.currency, p.created_at
+            ORDER BY p.created_at {order}, p.id {order};
+            """, {"group_id": group_id, "created_at": created_at, "id": expense_id, "limit": limit + 1})
+            rows = cursor.fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if newer:
+            rows.reverse()
+        return rows, has_more
+
+    def get_balances(self, group_id):
+        """(username, balance) for every participant in the group."""
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT username FROM participants WHERE group_id = %s;
+            """, (group_id,))
+            participants = [row[0] for row in cursor.fetchall()]
+
+            balances = display_balances(cursor, group_id)
+            return [(username, balances.get(username, Decimal(0))) for username in participants]
+
+    def get_member_balance(self, group_id, username):
+        """Balance of one member, matched case-insensitively. None if they are not a member."""
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT username FROM participants WHERE group_id = %s AND LOWER(username) = %s;
+            """, (group_id, username.lower()))
+            member = cursor.fetchone()
+            if not member:
+                return None
+
+            return display_balances(cursor, group_id).get(member[0], Decimal(0))
+
+    def display_balances(self, group_id):
+        with transaction() as cursor:
+            return display_balances(cursor, group_id)
+
+    def settle_balances(self, group_id, user_id):
+        """Plan the transfers settling the group, log the plan and zero every balance.
+
+        Returns (transfers, residual, settlement_id).
+        """
+        with transaction() as cursor:
+            lock_ledger(cursor, group_id)
+            balances = current_balances(cursor, group_id, write=True)
+            transfers, residual = plan_settlement(to_display(balances, display_rate(cursor, group_id)))
+
+            details = {
+                "transfers": [transfer.as_dict() for transfer in transfers],
+                "residual": str(residual),
+            }
+            cursor.execute("""
+            INSERT INTO settlement_logs (group_id, user_id, details)
+            VALUES (%s, %s, %s)
+            RETURNING id;
+            """, (group_id, user_id, json.dumps(details)))
+            settlement_id = cursor.fetchone()[0]
+
+            # Settle everyone by appending the opposite of their current balance, exactly, in the base currency
+            append_deltas(cursor, group_id, {username: -balance for username, balance in balances.items()}, 'settlement', settlement_id)
+
+        return transfers, residual, settlement_id
+
+    #Spending
+    def get_group_spending(self, group_id):
+        """(username, total spent) in the group's display currency, biggest spender first."""
+        with transaction() as cursor:
+            cursor.execute(f"""
+            SELECT eb.username, ROUND(SUM(eb.split_amount / e.rate) * {DISPLAY_RATE_SQL}, 2) AS total_spent
+            FROM expense_beneficiaries eb
+            JOIN expenses e ON eb.expense_id = e.id
+            WHERE eb.group_id = %(group_id)s
+            GROUP by eb.username
+            ORDER by total_spent DESC;
+            """, {"group_id": group_id})
+            return cursor.fetchall()
+
+    def get_member_spending(self, group_id, member):
+        """Spending of one member per category, and their total, in the group's display currency."""
+        with transaction() as cursor:
+            #Fetch spending_data by category
+            cursor.execute(f"""
+            SELECT COALESCE(e.category_name, 'Others') AS category, ROUND(SUM(eb.split_amount / e.rate) * {DISPLAY_RATE_SQL}, 2) AS total_spent
+            FROM expense_beneficiaries eb
+            JOIN expenses e ON eb.expense_id = e.id
+            WHERE eb.group_id = %(group_id)s AND eb.username = %(member)s
+            GROUP BY e.category_name;
+            """, {"group_id": group_id, "member": member})
+            spending_data = cursor.fetchall()
+
+            #Fetch total spending
+            cursor.execute(f"""
+            SELECT ROUND(SUM(eb.split_amount / e.rate) * {DISPLAY_RATE_SQL}, 2) AS total_spent
+            FROM expense_beneficiaries eb
+            JOIN expenses e ON eb.expense_id = e.id
+            WHERE eb.group_id = %(group_id)s AND eb.username = %(member)s;
+            """, {"group_id": group_id, "member": member})
+            total_spending = cursor.fetchone()[0] or 0.00
+
+            return spending_data, total_spending
+
+    def get_member_category_spending(self, group_id, member, category):
+        with transaction() as cursor:
+            cursor.execute(f"""
+            SELECT COALESCE(e.category_name, 'Others') AS category, ROUND(SUM(eb.split_amount / e.rate) * {DISPLAY_RATE_SQL}, 2) AS total_spent
+            FROM expense_beneficiaries eb
+            JOIN expenses e ON eb.expense_id = e.id
+            WHERE eb.group_id = %(group_id)s AND eb.username = %(member)s AND LOWER(e.category_name) = LOWER(%(category)s)
+            GROUP BY e.category_name;
+            """, {"group_id": group_id, "member": member, "category": category})
+            return cursor.fetchone()
+
+    #Currency
+    def get_base_currency(self, group_id):
+        """The group's base currency, or None if it has not been set up."""
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT base_currency FROM currency WHERE group_id = %s;
+            """, (group_id,))
+            result = cursor.fetchone()
+            return result[0] if result else None
+
+    def change_currency(self, group_id, new_currency, new_rate):
+        """Switch the group's display currency. Returns the old currency.
+
+        Expenses and ledger entries keep their own currency and rate, so this is a single
+        row update however many expenses or members the group has.
+        """
+        with transaction() as cursor:
+            cursor.execute("""
+            WITH old AS (
+                SELECT base_currency FROM currency WHERE group_id = %(group_id)s FOR UPDATE
+            ),
+            updated AS (
+                INSERT INTO currency (group_id, base_currency, rate)
+                VALUES (%(group_id)s, %(currency)s, %(rate)s)
+                ON CONFLICT (group_id) DO UPDATE
+                SET base_currency = EXCLUDED.base_currency, rate = EXCLUDED.rate
+                RETURNING group_id
+            )
+            SELECT COALESCE((SELECT base_currency FROM old), 'SGD');
+            """, {"group_id": group_id, "currency": new_currency, "rate": Decimal(str(new_rate))})
+            return cursor.fetchone()[0]
+
+    #Categories
+    def is_expense(self, group_id, expense):
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT 1 FROM expenses WHERE group_id = %s AND purpose = %s;
+            """, (group_id, expense))
+            return cursor.fetchone() is not None
+
+    def is_category(self, group_id, category_name):
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT 1 FROM categories WHERE group_id = %s AND LOWER(category_name) = LOWER(%s);
+            """, (group_id, category_name.strip()))  # Ensure no extra spaces
+            return cursor.fetchone() is not None
+
+    def get_categories(self, group_id):
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT category_name FROM categories WHERE group_id = %s;
+            """, (group_id,))
+            return [row[0] for row in cursor.fetchall()]
+
+    def add_category(self, group_id, category_name):
+        with transaction() as cursor:
+            # Insert new category if not found
+            cursor.execute("""
+            INSERT INTO categories (group_id, category_name)
+            VALUES (%s, %s)
+            ON CONFLICT(group_id, category_name) DO NOTHING;  -- Avoid duplicates
+            """, (group_id, category_name))
+
+    def set_expense_category(self, group_id, category_name, expense_name):
+        with transaction() as cursor:
+            # Update the expense with the new category
+            cursor.execute("""
+            UPDATE expenses
+            SET category_name = %s
+            WHERE group_id = %s AND purpose = %s;
+            """, (category_name, group_id, expense_name))
+
+    #Exchange rates
+    def load_exchange_rates(self, base_currency):
+        """({currency: rate}, fetched_at) last persisted for base_currency, or ({}, None)."""
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT currency, rate, fetched_at FROM exchange_rates WHERE base_currency = %s;
+            """, (base_currency,))
+            rows = cursor.fetchall()
+
+        if not rows:
+            return {}, None
+        return {currency: rate for currency, rate, _ in rows}, min(fetched_at for _, _, fetched_at in rows)
+
+    def save_exchange_rates(self, base_currency, rates, fetched_at):
+        """Upsert a full rate table in one statement."""
+        currencies, values = list(rates), [Decimal(str(rates[currency])) for currency in rates]
+        with transaction() as cursor:
+            cursor.execute("""
+            INSERT INTO exchange_rates (base_currency, currency, rate, fetched_at)
+            SELECT %s, r.currency, r.rate, %s
+            FROM unnest(%s::text[], %s::numeric[]) AS r(currency, rate)
+            ON CONFLICT (base_currency, currency) DO UPDATE
+            SET rate = EXCLUDED.rate, fetched_at = EXCLUDED.fetched_at;
+            """, (base_currency, fetched_at, currencies, values))
+
+    #Bot persistence
+    def load_bot_data(self, kind):
+        """{id: pickled bytes} of every row in bot_user_data ('user') or bot_chat_data ('chat')."""
+        table, column = {"user": ("bot_user_data", "user_id"), "chat": ("bot_chat_data", "chat_id")}[kind]
+        with transaction() as cursor:
+            cursor.execute(sql.SQL("SELECT {}, data FROM {};").format(sql.Identifier(column), sql.Identifier(table)))
+            return {row_id: bytes(data) for row_id, data in cursor.fetchall()}
+
+    def load_conversations(self, name):
+        """{JSON key: pickled state} of one ConversationHandler."""
+        with transaction() as cursor:
+            cursor.execute("""
+            SELECT key, state FROM bot_conversations WHERE name = %s;
+            """, (name,))
+            return {key: bytes(state) for key, state in cursor.fetchall()}
+
+    def save_bot_persistence(self, user_data, chat_data, conversations):
+        """Write a batch of persistence changes in one transaction, a fixed number of statements per batch.
+
+        user_data and chat_data map id -> pickled bytes, or None to delete the row;
+        conversations maps (name, JSON key) -> pickled state, or None once the conversation has ended.
+        """
+        with transaction() as cursor:
+            for table, column, changes in (("bot_user_data", "user_id", user_data), ("bot_chat_data", "chat_id", chat_data)):
+                upserts = [(row_id, data) for row_id, data in changes.items() if data is not None]
+                deletes = [row_id for row_id, data in changes.items() if data is None]
+
+                if upserts:
+                    ids, blobs = (list(column_values) for column_values in zip(*upserts))
+                    cursor.execute(sql.SQL("""
+                    INSERT INTO {table} ({column}, data, updated_at)
+                    SELECT d.id, d.data, NOW() FROM unnest(%s::bigint[], %s::bytea[]) AS d(id, data)
+                    ON CONFLICT ({column}) DO UPDATE SET data = EXCLUDED.data, updated_at = NOW();
+                    """).format(table=sql.Identifier(table), column=sql.Identifier(column)),
+                    (ids, [psycopg2.Binary(blob) for blob in blobs]))
+
+                if deletes:
+                    cursor.execute(sql.SQL("DELETE FROM {table} WHERE {column} = ANY(%s);").format(
+                        table=sql.Identifier(table), column=sql.Identifier(column)), (deletes,))
+
+            upserts = [(name, key, state) for (name, key), state in conversations.items() if state is not None]
+            deletes = [(name, key) for (name, key), state in conversations.items() if state is None]
+
+            if upserts:
+                names, keys, states = (list(column_values) for column_values in zip(*upserts))
+                cursor.execute("""
+                INSERT INTO bot_conversations (name, key, state, updated_at)
+                SELECT c.name, c.key, c.state, NOW() FROM unnest(%s::text[], %s::text[], %s::bytea[]) AS c(name, key, state)
+                ON CONFLICT (name, key) DO UPDATE SET state = EXCLUDED.state, updated_at = NOW();
+                """, (names, keys, [psycopg2.Binary(state) for state in states]))
+
+            if deletes:
+                names, keys = (list(column_values) for column_values in zip(*deletes))
+                cursor.execute("""
+                DELETE FROM bot_conversations c
+                USING unnest(%s::text[], %s::text[]) AS d(name, key)
+                WHERE c.name = d.name AND c.key = d.key;
+                """, (names, keys))
+
+    #Export
+    def write_expenses_csv(self, group_id, file):
+        """Stream the group's expenses as CSV into a binary file object.
+
+        Rows come from a server-side cursor EXPORT_FETCH_SIZE at a time, so memory use
+        does not grow with the group's history.
+        """
+        with transaction(cursor_name="export_expenses") as cursor:
+            cursor.itersize = EXPORT_FETCH_SIZE
+            cursor.execute("""
+            SELECT
+                e.id AS expense_id,
+                e.purpose,
+                e.amount,
+                e.currency,
+                e.payer,
+                eb.username,
+                eb.split_amount
+            FROM expenses e
+            JOIN expense_beneficiaries eb ON e.id = eb.expense_id
+            WHERE e.group_id = %s
+            ORDER BY e.created_at, e.id, eb.id;
+            """, (group_id,))
+
+            text = io.TextIOWrapper(file, encoding="utf-8", newline="")
+            csv.writer(text).writerows(iter_expense_rows(cursor))
+            text.flush()
+            text.detach()  # Hand the file back to the caller open
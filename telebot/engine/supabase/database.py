@@ -1,140 +1,181 @@
 from telegram import Update
 from telegram.ext import CommandHandler, CallbackContext, ConversationHandler
 import psycopg2
-from psycopg2 import sql
-import os
+from psycopg2 import sql, pool, extensions
+import os, threading, time
+from contextlib import contextmanager
 from telebot.credentials import SUPABASE_API_KEY, SUPABASE_DB_HOST, SUPABASE_DB_NAME, SUPABASE_DB_PASSWORD, SUPABASE_DB_USER, SUPABASE_URL
+from telebot.credentials import DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_HEALTHCHECK_INTERVAL
+from telebot.metrics import COLLECTORS, Gauge
+from telebot.engine.storage.querylog import record_statement
+
+CONNECTION_KWARGS = dict(
+    dbname=SUPABASE_DB_NAME,    # Replace with your Supabase DB name
+    user=SUPABASE_DB_USER,         # Replace with your Supabase username
+    password=SUPABASE_DB_PASSWORD, # Replace with your Supabase password
+    host=SUPABASE_DB_HOST,         # Replace with your Supabase host
+    port=6543                 # Default PostgreSQL port
+)
 
 #General Connection to SupabaseDB
 def connect_to_base():
     try:
-        connection = psycopg2.connect(
-            dbname=SUPABASE_DB_NAME,    # Replace with your Supabase DB name
-            user=SUPABASE_DB_USER,         # Replace with your Supabase username
-            password=SUPABASE_DB_PASSWORD, # Replace with your Supabase password
-            host=SUPABASE_DB_HOST,         # Replace with your Supabase host
-            port=6543                 # Default PostgreSQL port
-        )
+        connection = psycopg2.connect(**CONNECTION_KWARGS)
         return connection
     
     except psycopg2.Error as e:
         print(f"Error connecting to the database: {e}")
         return None
     
-    
 
-#Creation of database tables for a new group
-def setup_database():
-    """Set up the database tables."""
-    connection = connect_to_base()
+
+db_pool_in_use = Gauge("db_pool_connections_in_use", "Pooled connections checked out")
+db_pool_max = Gauge("db_pool_connections_max", "Largest number of pooled connections")
+
+
+class InstrumentedCursor(extensions.cursor):
+    """Cursor recording each statement against its fingerprint and the current update."""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self._record(query, time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self._record(query, time.perf_counter() - start)
+
+    def _record(self, query, elapsed):
+        statement = query.as_string(self) if isinstance(query, sql.Composable) else query
+        if isinstance(statement, bytes):
+            statement = statement.decode()
+        # -1 for server-side cursors, whose rows are only known once fetched
+        record_statement(statement, elapsed, max(self.rowcount, 0))
+
+
+class PoolTimeoutError(pool.PoolError):
+    """Raised when no pooled connection frees up within DB_POOL_TIMEOUT seconds."""
+
+
+#Process-wide connection pool shared by every handler
+_pool = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+_last_used = {}  # id(connection) -> time it was last returned to the pool
+
+def get_pool():
+    """Create the connection pool on first use and return it."""
+    global _pool, _pool_slots
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pool.ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, **CONNECTION_KWARGS)
+                _pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+    return _pool
+
+def _is_healthy(connection):
+    """Cheap liveness check, only pinging the server if the connection has been idle a while."""
+    if connection.closed:
+        return False
+
+    # Connections that have never been returned to the pool were opened just now
+    now = time.monotonic()
+    idle_for = now - _last_used.get(id(connection), now)
+    if idle_for < DB_POOL_HEALTHCHECK_INTERVAL:
+        return True
 
     try:
-        cursor = connection.cursor()
-
-        # Create groups table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS groups (
-            group_id BIGINT PRIMARY KEY,
-            username TEXT
-        );
-        """)
-
-        # Create expenses table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS expenses (
-            id SERIAL PRIMARY KEY,
-            group_id BIGINT REFERENCES groups(group_id),               -- Group the expense belongs to
-            purpose TEXT,                                              -- Description of the expense
-            payer TEXT,                                                -- Username of the payer
-            amount NUMERIC,                                            -- Total amount of the expense
-            currency TEXT,                                             -- Currency of the expense
-            category_name TEXT DEFAULT NULL REFERENCES categories(category_name),    -- Reference to the category
-            created_at TIMESTAMP DEFAULT NOW()                                       -- Timestamp when expense was created
-        );
-        """)
-
-        # Create expense_beneficiaries table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS expense_beneficiaries (
-            id SERIAL PRIMARY KEY,
-            group_id BIGINT REFERENCES groups(group_id),                   -- Group the beneficiary belongs to
-            expense_id INTEGER REFERENCES expenses(id) ON DELETE CASCADE,  -- Link to the expense
-            username TEXT,                                                 -- User ID of the beneficiary
-            split_amount NUMERIC                                           -- Amount each beneficiary owes
-        );
-        """)
-
-        # Create balances table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS balances (
-            id SERIAL PRIMARY KEY,
-            group_id BIGINT REFERENCES groups(group_id),  -- Group the balance belongs to
-            username TEXT,                               -- Username of member
-            balance NUMERIC DEFAULT 0,                   -- User's balance (negative means owed)
-            UNIQUE(group_id, username)                    -- Ensure unique balance per user per group
-        );
-        """)
-
-        # Create participants table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS participants (
-            id SERIAL PRIMARY KEY,
-            group_id BIGINT,                               -- ID of the group
-            username TEXT,                                 -- Participant's username
-            UNIQUE(group_id, username)                     -- Ensure unique participants per group
-        );
-        """)
-
-        # Create settlement_logs table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS settlement_logs (
-            id SERIAL PRIMARY KEY,
-            group_id BIGINT REFERENCES groups(group_id),  -- Group the settlement belongs to
-            user_id BIGINT,                               -- User ID of the person settling
-            settled_at TIMESTAMP DEFAULT NOW(),           -- Timestamp of the settlement
-            details TEXT                                  -- Details of the settlement
-        );
-        """)
-
-        # Create admins table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS admins (
-            id SERIAL PRIMARY KEY,
-            group_id BIGINT REFERENCES groups(group_id),  -- Group the admin belongs to
-            username TEXT,    -- Username of the user (admin)
-            UNIQUE (group_id, username)  -- Ensure unique admins per group
-        );
-        """)
-
-        # Create currency table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS currency (
-            group_id BIGINT PRIMARY KEY,        -- Link to the group
-            base_currency TEXT DEFAULT 'SGD',   -- Default base currency is SGD
-            rate NUMERIC DEFAULT 0.00           -- Default rate is 0.00
-        );
-        """)
-
-        # Create categories table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS categories (
-            group_id BIGINT,                            -- ID of the group
-            category_name TEXT,                         -- Name of the category
-            UNIQUE(group_id, category_name),            -- Ensure unique categories per group
-            PRIMARY KEY (group_id, category_name)       -- Composite primary key
-        );
-        """)
-
-        # Commit the changes
-        connection.commit()
-        print("Database setup completed successfully.")
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1;")
+        connection.rollback()
+        return True
+    except psycopg2.Error:
+        return False
 
-    except psycopg2.Error as e:
-        print(f"Error setting up database: {e}")
+def get_connection(timeout=DB_POOL_TIMEOUT):
+    """Check a healthy connection out of the pool, waiting up to `timeout` seconds for one to free up."""
+    connection_pool = get_pool()
+
+    if not _pool_slots.acquire(timeout=timeout):
+        raise PoolTimeoutError(f"No database connection available after {timeout}s.")
 
+    try:
+        connection = connection_pool.getconn()
+
+        # Replace connections that were dropped by the server while idle. Several idle ones may have been
+        # dropped at once; once none are left the pool opens a fresh connection, which passes the check
+        while not _is_healthy(connection):
+            _last_used.pop(id(connection), None)
+            connection_pool.putconn(connection, close=True)
+            connection = connection_pool.getconn()
+
+        return connection
+
+    except Exception:
+        _pool_slots.release()
+        raise
+
+def release_connection(connection):
+    """Return a connection to the pool. Any open transaction is rolled back by the pool."""
+    if connection is None:
+        return
+
+    broken = connection.closed != 0
+    if broken:
+        _last_used.pop(id(connection), None)
+    else:
+        _last_used[id(connection)] = time.monotonic()
+
+    try:
+        get_pool().putconn(connection, close=broken)
     finally:
-        # Clean up resources
-        if cursor:
-            cursor.close()
-        if connection:
-            connection.close()
+        _pool_slots.release()
+
+@contextmanager
+def transaction(cursor_name=None):
+    """Yield a cursor on a pooled connection, committing on success and rolling back on error.
+
+    Passing cursor_name opens a server-side cursor, which streams results instead of
+    loading them all into memory on execute. Statements are recorded by InstrumentedCursor.
+    """
+    connection = get_connection()
+    try:
+        with connection.cursor(name=cursor_name, cursor_factory=InstrumentedCursor) as cursor:
+            yield cursor
+        connection.commit()
+    except Exception:
+        # A connection lost mid-transaction cannot roll back; raise the original error, not InterfaceError
+        if not connection.closed:
+            connection.rollback()
+        raise
+    finally:
+        release_connection(connection)
+
+def close_pool():
+    """Close every pooled connection, e.g. on shutdown."""
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _last_used.clear()
+
+def pool_stats():
+    """Number of connections in use and the configured maximum."""
+    if _pool is None:
+        return {"in_use": 0, "max": DB_POOL_MAX}
+    return {"in_use": len(_pool._used), "max": DB_POOL_MAX}
+
+def collect_pool_stats():
+    stats = pool_stats()
+    db_pool_in_use.set(stats["in_use"])
+    db_pool_max.set(stats["max"])
+
+COLLECTORS.append(collect_pool_stats)
@@ -0,0 +1,124 @@
+import threading
+from decimal import Decimal
+from telebot.credentials import LEDGER_SNAPSHOT_INTERVAL
+from telebot.engine.storage.base import BASE_CURRENCY, to_display
+
+#Balances are derived from the append-only balance_ledger table.
+#A balance is read as "latest snapshot + ledger entries since it", and a new snapshot is
+#taken once that tail grows past LEDGER_SNAPSHOT_INTERVAL entries. Only write transactions take
+#snapshots: a read that finds the tail too long marks the group, and the group's next write
+#(record_expense, undo, settle, reset) takes it, so reads never wait on the ledger lock nor write.
+#All helpers take a cursor so they run inside the caller's transaction.
+#
+#Each entry keeps the currency it was recorded in and the rate that applied then, so balances
+#are summed in BASE_CURRENCY and only converted to the group's display currency on read.
+
+LEDGER_LOCK_CLASS = 1  # First key of the two-key advisory lock serialising a group's ledger writes
+
+_due = set()  # Groups a read found past LEDGER_SNAPSHOT_INTERVAL, snapshotted by their next write
+_due_lock = threading.Lock()
+
+BALANCES_SQL = """
+WITH snapshot AS (
+    SELECT COALESCE(MAX(ledger_id), 0) AS ledger_id
+    FROM balance_snapshots
+    WHERE group_id = %(group_id)s
+),
+entries AS (
+    SELECT s.username, s.balance AS amount, FALSE AS tail
+    FROM balance_snapshots s
+    JOIN snapshot ON s.ledger_id = snapshot.ledger_id
+    WHERE s.group_id = %(group_id)s
+
+    UNION ALL
+
+    SELECT l.username, l.delta / l.rate, TRUE
+    FROM balance_ledger l
+    JOIN snapshot ON l.id > snapshot.ledger_id
+    WHERE l.group_id = %(group_id)s
+)
+SELECT username, SUM(amount) AS balance, COUNT(*) FILTER (WHERE tail) AS tail_entries
+FROM entries
+GROUP BY username
+"""
+
+# The group's display rate; groups without a currency row are shown in BASE_CURRENCY
+DISPLAY_RATE_SQL = "COALESCE((SELECT NULLIF(rate, 0) FROM currency WHERE group_id = %(group_id)s), 1)"
+
+
+def lock_ledger(cursor, group_id):
+    """Serialise ledger writes of one group until the transaction ends.
+
+    Entries of a group are then committed in id order, so a snapshot taken under
+    the lock can never miss an entry with a lower id that commits later.
+    """
+    cursor.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s::text));", (LEDGER_LOCK_CLASS, group_id))
+
+def append_entries(cursor, group_id, entries, event_type):
+    """Append (username, delta, event_id, currency, rate) entries to the ledger in one statement."""
+    entries = [
+        (username, Decimal(str(delta)), event_id, currency, Decimal(str(rate)))
+        for username, delta, event_id, currency, rate in entries if delta
+    ]
+    if not entries:
+        return
+
+    usernames, deltas, event_ids, currencies, rates = (list(column) for column in zip(*entries))
+
+    lock_ledger(cursor, group_id)
+    cursor.execute("""
+    INSERT INTO balance_ledger (group_id, username, delta, event_type, event_id, currency, rate)
+    SELECT %s, e.username, e.delta, %s, e.event_id, e.currency, e.rate
+    FROM unnest(%s::text[], %s::numeric[], %s::bigint[], %s::text[], %s::numeric[]) AS e(username, delta, event_id, currency, rate);
+    """, (group_id, event_type, usernames, deltas, event_ids, currencies, rates))
+
+def append_deltas(cursor, group_id, deltas, event_type, event_id=None, currency=BASE_CURRENCY, rate=1):
+    """Append one entry per member from a {username: delta} mapping, all in one currency."""
+    append_entries(cursor, group_id, [(username, delta, event_id, currency, rate) for username, delta in deltas.items()], event_type)
+
+def take_snapshot(cursor, group_id):
+    """Fold the group's ledger into a new snapshot."""
+    lock_ledger(cursor, group_id)
+    cursor.execute(f"""
+    INSERT INTO balance_snapshots (group_id, ledger_id, username, balance)
+    SELECT %(group_id)s, (SELECT MAX(id) FROM balance_ledger WHERE group_id = %(group_id)s), b.username, b.balance
+    FROM ({BALANCES_SQL}) b
+    ON CONFLICT DO NOTHING;
+    """, {"group_id": group_id})
+
+def snapshot_if_due(cursor, group_id):
+    """Take the snapshot a read found due. Call in write transactions, after appending entries."""
+    with _due_lock:
+        if group_id not in _due:
+            return
+        _due.discard(group_id)
+    take_snapshot(cursor, group_id)
+
+def current_balances(cursor, group_id, write=False):
+    """{username: balance in BASE_CURRENCY} for everyone with ledger history in the group.
+
+    Amounts are unrounded, so appending their negation in BASE_CURRENCY zeroes a balance exactly.
+    Pass write=True in write transactions, which may take a due snapshot straight away.
+    """
+    cursor.execute(BALANCES_SQL + ";", {"group_id": group_id})
+    rows = cursor.fetchall()
+
+    if sum(tail_entries for _, _, tail_entries in rows) > LEDGER_SNAPSHOT_INTERVAL:
+        with _due_lock:
+            if write:
+                _due.discard(group_id)
+            else:
+                _due.add(group_id)
+        if write:
+            take_snapshot(cursor, group_id)
+
+    return {username: balance for username, balance, _ in rows}
+
+def display_rate(cursor, group_id):
+    """Units of the group's display currency per 1 BASE_CURRENCY."""
+    cursor.execute(f"SELECT {DISPLAY_RATE_SQL};", {"group_id": group_id})
+    return cursor.fetchone()[0]
+
+def display_balances(cursor, group_id):
+    """{username: balance in the group's display currency}, rounded to cents."""
+    return to_display(current_balances(cursor, group_id), display_rate(cursor, group_id))
@@ -0,0 +1,126 @@
+import logging, os, re, sys
+import psycopg2
+from telebot.engine.supabase.database import connect_to_base, transaction
+
+#Versioned schema migrations.
+#Run once per deploy:      python -m telebot.engine.supabase.migrate upgrade
+#Show applied/pending:     python -m telebot.engine.supabase.migrate status
+#Workers only call check_schema_version() at startup, a single cheap query.
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+MIGRATION_LOCK_ID = 745210  # pg_advisory_xact_lock key, so concurrent deploys apply migrations once
+
+
+def discover_migrations():
+    """Migration files as (version, name, path), ordered by version."""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+
+    migrations.sort()
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {MIGRATIONS_DIR}")
+    return migrations
+
+def latest_version():
+    migrations = discover_migrations()
+    return migrations[-1][0] if migrations else 0
+
+def applied_versions(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,            -- Number prefix of the migration file
+        name TEXT,                              -- Rest of the file name
+        applied_at TIMESTAMP DEFAULT NOW()      -- When the migration was applied
+    );
+    """)
+    cursor.execute("SELECT version FROM schema_version;")
+    return {row[0] for row in cursor.fetchall()}
+
+def upgrade():
+    """Apply every pending migration, each in its own transaction. Returns the versions applied."""
+    connection = connect_to_base()
+    if connection is None:
+        raise RuntimeError("Could not connect to the database.")
+
+    applied = []
+    try:
+        for version, name, path in discover_migrations():
+            with open(path) as file:
+                statements = file.read()
+
+            with connection.cursor() as cursor:
+                # Serialise concurrent upgrades, then re-check under the lock
+                cursor.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_ID,))
+                if version in applied_versions(cursor):
+                    connection.commit()
+                    continue
+
+                cursor.execute(statements)
+                cursor.execute("""
+                INSERT INTO schema_version (version, name) VALUES (%s, %s);
+                """, (version, name))
+
+            connection.commit()
+            applied.append(version)
+            print(f"Applied migration {version:04d}_{name}")
+
+    except psycopg2.Error:
+        connection.rollback()
+        raise
+
+    finally:
+        connection.close()
+
+    return applied
+
+def status():
+    """(version, name, applied) for every migration file."""
+    with transaction() as cursor:
+        done = applied_versions(cursor)
+    return [(version, name, version in done) for version, name, _ in discover_migrations()]
+
+def check_schema_version():
+    """Startup check: True if the database is at the latest migration, logging an error if not."""
+    expected = latest_version()
+    try:
+        with transaction() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version;")
+            current = cursor.fetchone()[0]
+
+    except psycopg2.errors.UndefinedTable:
+        current = 0
+
+    except psycopg2.Error as e:
+        logger.error(f"Could not check schema version: {e}")
+        return False
+
+    if current < expected:
+        logger.error(
+            f"Database schema is at version {current} but the code expects {expected}. "
+            "Run `python -m telebot.engine.supabase.migrate upgrade`."
+        )
+        return False
+
+    logger.info(f"Database schema is at version {current}.")
+    return True
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+
+    if command == "upgrade":
+        versions = upgrade()
+        print(f"Applied {len(versions)} migration(s)." if versions else "Database is already up to date.")
+    elif command == "status":
+        for version, name, done in status():
+            print(f"{version:04d}_{name}: {'applied' if done else 'pending'}")
+    else:
+        print("Usage: python -m telebot.engine.supabase.migrate [upgrade|status]")
+        sys.exit(1)
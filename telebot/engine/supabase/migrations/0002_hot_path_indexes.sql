@@ -0,0 +1,29 @@
+-- Indexes for the hot query paths.
+
+-- Expense history and undo: latest expenses of a group first
+CREATE INDEX IF NOT EXISTS idx_expenses_group_created
+ON expenses (group_id, created_at DESC, id DESC);
+
+-- Looking up expenses by name when categorising them
+CREATE INDEX IF NOT EXISTS idx_expenses_group_purpose
+ON expenses (group_id, purpose);
+
+-- Spending per category, matched case-insensitively
+CREATE INDEX IF NOT EXISTS idx_expenses_group_category_lower
+ON expenses (group_id, LOWER(category_name));
+
+-- Spending per member, answerable from the index alone
+CREATE INDEX IF NOT EXISTS idx_expense_beneficiaries_group_username
+ON expense_beneficiaries (group_id, username) INCLUDE (expense_id, split_amount);
+
+-- Joining beneficiaries to their expense and cascading deletes
+CREATE INDEX IF NOT EXISTS idx_expense_beneficiaries_expense
+ON expense_beneficiaries (expense_id);
+
+-- Case-insensitive member lookups
+CREATE INDEX IF NOT EXISTS idx_participants_group_username_lower
+ON participants (group_id, LOWER(username));
+
+-- Case-insensitive category lookups
+CREATE INDEX IF NOT EXISTS idx_categories_group_name_lower
+ON categories (group_id, LOWER(category_name));
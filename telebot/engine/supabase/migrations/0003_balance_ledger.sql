@@ -0,0 +1,33 @@
+-- Balances become a fold over an append-only ledger plus periodic per-group snapshots.
+-- The balances table is no longer written to.
+
+-- Every change to a member's balance, never updated or deleted in normal operation
+CREATE TABLE IF NOT EXISTS balance_ledger (
+    id BIGSERIAL PRIMARY KEY,
+    group_id BIGINT NOT NULL,                 -- Group the entry belongs to
+    username TEXT NOT NULL,                   -- Member whose balance changes
+    delta NUMERIC NOT NULL,                   -- Change to the balance (positive means they owe more)
+    event_type TEXT NOT NULL,                 -- 'opening', 'expense', 'undo', 'settlement', 'rebase' or 'reset'
+    event_id BIGINT,                          -- Expense or settlement the entry came from, if any
+    created_at TIMESTAMP DEFAULT NOW()        -- Timestamp of the entry
+);
+
+-- Reading the entries of a group after its latest snapshot
+CREATE INDEX IF NOT EXISTS idx_balance_ledger_group_id
+ON balance_ledger (group_id, id) INCLUDE (username, delta);
+
+-- Balance of every member as of a ledger entry
+CREATE TABLE IF NOT EXISTS balance_snapshots (
+    group_id BIGINT NOT NULL,                 -- Group the snapshot belongs to
+    ledger_id BIGINT NOT NULL,                -- Last ledger entry folded into the snapshot
+    username TEXT NOT NULL,                   -- Member
+    balance NUMERIC NOT NULL,                 -- Their balance as of ledger_id
+    created_at TIMESTAMP DEFAULT NOW(),       -- Timestamp of the snapshot
+    PRIMARY KEY (group_id, ledger_id, username)
+);
+
+-- Carry over the balances maintained in place until now
+INSERT INTO balance_ledger (group_id, username, delta, event_type)
+SELECT group_id, username, balance, 'opening'
+FROM balances
+WHERE balance <> 0;
@@ -0,0 +1,10 @@
+-- Exchange rates shared by every group, so a restarted worker starts warm and
+-- workers refresh from the upstream API at most once per TTL between them.
+
+CREATE TABLE IF NOT EXISTS exchange_rates (
+    base_currency TEXT NOT NULL,              -- Currency the rates are quoted against
+    currency TEXT NOT NULL,                   -- Quoted currency
+    rate NUMERIC NOT NULL,                    -- Units of currency per 1 base_currency
+    fetched_at TIMESTAMPTZ NOT NULL,          -- When the upstream API returned this rate
+    PRIMARY KEY (base_currency, currency)
+);
@@ -0,0 +1,39 @@
+-- Expenses and ledger entries keep the currency they were recorded in and the rate that applied then
+-- (units of that currency per 1 SGD). Balances and spending are converted to the group's display
+-- currency on read, so changing currency no longer rewrites any balances.
+
+ALTER TABLE expenses ADD COLUMN IF NOT EXISTS rate NUMERIC;
+
+-- Existing expenses: the group's rate if still in that currency, else the latest shared rate
+UPDATE expenses e
+SET rate = COALESCE(
+    (SELECT NULLIF(c.rate, 0) FROM currency c WHERE c.group_id = e.group_id AND c.base_currency = e.currency),
+    (SELECT r.rate FROM exchange_rates r WHERE r.base_currency = 'SGD' AND r.currency = e.currency),
+    1
+)
+WHERE e.rate IS NULL;
+
+ALTER TABLE expenses ALTER COLUMN rate SET DEFAULT 1;
+ALTER TABLE expenses ALTER COLUMN rate SET NOT NULL;
+
+ALTER TABLE balance_ledger ADD COLUMN IF NOT EXISTS currency TEXT;
+ALTER TABLE balance_ledger ADD COLUMN IF NOT EXISTS rate NUMERIC;
+
+-- Existing entries were all rebased into the group's current currency, so they take its current rate
+UPDATE balance_ledger l
+SET currency = COALESCE((SELECT c.base_currency FROM currency c WHERE c.group_id = l.group_id), 'SGD'),
+    rate = COALESCE((SELECT NULLIF(c.rate, 0) FROM currency c WHERE c.group_id = l.group_id), 1)
+WHERE l.rate IS NULL;
+
+ALTER TABLE balance_ledger ALTER COLUMN currency SET DEFAULT 'SGD';
+ALTER TABLE balance_ledger ALTER COLUMN currency SET NOT NULL;
+ALTER TABLE balance_ledger ALTER COLUMN rate SET DEFAULT 1;
+ALTER TABLE balance_ledger ALTER COLUMN rate SET NOT NULL;
+
+-- Snapshots now hold SGD amounts; the old ones are in display currency and are rebuilt on the next read
+DELETE FROM balance_snapshots;
+
+-- Reading a group's tail stays an index-only scan
+DROP INDEX IF EXISTS idx_balance_ledger_group_id;
+CREATE INDEX IF NOT EXISTS idx_balance_ledger_group_id
+ON balance_ledger (group_id, id) INCLUDE (username, delta, rate);
@@ -0,0 +1,22 @@
+-- python-telegram-bot persistence: conversation states, user_data and chat_data survive restarts
+-- and are shared between workers. Values are pickled Python objects.
+
+CREATE TABLE IF NOT EXISTS bot_user_data (
+    user_id BIGINT PRIMARY KEY,               -- Telegram user the data belongs to
+    data BYTEA NOT NULL,                      -- Pickled context.user_data
+    updated_at TIMESTAMP DEFAULT NOW()        -- Last flush that wrote the row
+);
+
+CREATE TABLE IF NOT EXISTS bot_chat_data (
+    chat_id BIGINT PRIMARY KEY,               -- Telegram chat the data belongs to
+    data BYTEA NOT NULL,                      -- Pickled context.chat_data
+    updated_at TIMESTAMP DEFAULT NOW()        -- Last flush that wrote the row
+);
+
+CREATE TABLE IF NOT EXISTS bot_conversations (
+    name TEXT NOT NULL,                       -- ConversationHandler name
+    key TEXT NOT NULL,                        -- Conversation key (chat id, user id...) as a JSON array
+    state BYTEA NOT NULL,                     -- Pickled conversation state
+    updated_at TIMESTAMP DEFAULT NOW(),       -- Last flush that wrote the row
+    PRIMARY KEY (name, key)
+);
@@ -0,0 +1,40 @@
+import asyncio, contextvars, functools
+from concurrent.futures import ThreadPoolExecutor
+from telebot.credentials import BLOCKING_WORKERS
+
+#Bounded thread pool that every blocking database and HTTP call goes through,
+#so one slow query cannot stall the event loop shared by Quart and the bot.
+
+_executor = None
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking")
+    return _executor
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call on the executor and await its result."""
+    loop = asyncio.get_running_loop()
+    # Carry context variables (e.g. the current update) into the worker thread
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(), call)
+
+def blocking(func):
+    """Turn a blocking function into a coroutine function that runs on the executor.
+
+    The original function stays available as `.sync` for callers already off the loop.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_blocking(func, *args, **kwargs)
+
+    wrapper.sync = func
+    return wrapper
+
+def shutdown_executor(wait=True):
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait)
+        _executor = None
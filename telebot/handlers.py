@@ -0,0 +1,353 @@
+import functools, time
+from telegram.ext import Application, CommandHandler, ConversationHandler, filters, MessageHandler, CallbackQueryHandler
+from telebot.credentials import BOT_TOKEN, BOT_API_BASE_URL
+from telebot.metrics import Counter, Histogram
+from telebot.processor import PerChatUpdateProcessor
+from telebot.persistence import DatabasePersistence
+from telebot.scheduler import OutboundScheduler
+from telebot.engine.storage.data_manager import export_expenses
+
+from telebot.engine.setup.base import(
+    bot_start,
+    help
+)
+
+from telebot.engine.setup.admin import (
+    add_admin,
+    remove_admin,
+    show_admins,
+    delete_all_start,
+    delete_all_password,
+    delete_all_confirm,
+    delete_all_cancel,
+    DELETE_ALL_GIVE_PASSWORD,
+    DELETE_ALL_CONFIRMATION
+)
+
+from telebot.engine.expense.settle import(
+    settle_all_start, 
+    settle_all_confirm, 
+    settle_all_cancel, 
+    SETTLE_CONFIRMATION,
+)
+
+from telebot.engine.setup.members import(
+    add_member,
+    specify_member,
+    add_member_cancel,
+    MEMBER_CONFIRMATION,
+    remove_member_start,
+    remove_member_specify,
+    remove_member_cancel,
+    REMOVE_MEMBER_CONFIRMATION, 
+    show_members,
+    remove_all_cancel,
+    remove_all_start,
+    remove_all_confirm,
+    REMOVE_CONFIRMATION
+)
+
+from telebot.engine.expense.show import(
+    show_expenses, 
+    show_expenses_page,
+    show_balance,
+    show_spending,
+    spending_category,
+    spending_individual,
+    show_spending_cancel,
+    CATEGORY,
+    INDIVIDUAL,
+    show_categories
+)
+
+from telebot.engine.expense.add_expense import(
+    add_expense,
+    add_purpose,
+    add_payer,
+    add_amount,
+    add_beneficiaries,
+    add_split,
+    add_expense_cancel,
+    PURPOSE,
+    PAYER,
+    AMOUNT,
+    BENEFICIARIES,
+    SPLIT,
+    undo
+)
+
+from telebot.engine.expense.currency import(
+    set_currency,
+    find_currency,
+    set_currency_cancel,
+    CURRENCY_CONFIRMATION,
+    valid_currencies,
+    show_currency,
+    #convert_currency
+)
+
+from telebot.engine.expense.categorise import(
+    create_category,
+    name_category,
+    create_category_cancel,
+    CATEGORY_CONFIRMATION,
+    update_category,
+    expense_category,
+    expense_name,
+    update_category_cancel,
+    EXPENSE,
+    CATEGORY,
+)
+
+#Builds the Telegram application and registers every command and conversation on it.
+#Shared by the webhook server (bot.py) and the long-polling runner (poll.py).
+
+
+handler_duration = Histogram("handler_duration_seconds", "Time spent in a handler callback, labelled module.function")
+handler_errors = Counter("handler_errors_total", "Handler callbacks that raised, labelled module.function")
+
+
+def build_application():
+    """An Application talking to BOT_API_BASE_URL, the real Bot API unless overridden.
+
+    Updates of different chats are processed concurrently, each chat's in order,
+    conversation state is persisted to the database, and outgoing requests are paced
+    to Telegram's rate limits.
+    """
+    return (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .base_url(BOT_API_BASE_URL)
+        .concurrent_updates(PerChatUpdateProcessor())
+        .persistence(DatabasePersistence())
+        .rate_limiter(OutboundScheduler())
+        .build()
+    )
+
+def register_handlers(application):
+    """Add every handler. Call before application.initialize() so persisted conversations are loaded."""
+    # Register commands
+    application.add_handler(CommandHandler("start", bot_start))
+    application.add_handler(CommandHandler("help", help))
+    application.add_handler(CallbackQueryHandler(help, pattern="^help$"))
+
+    application.add_handler(CommandHandler("show_members", show_members))
+
+    application.add_handler(CommandHandler("undo", undo))
+
+    application.add_handler(CommandHandler("show_balance", show_balance))
+    application.add_handler(CommandHandler("show_expenses", show_expenses))
+    application.add_handler(CallbackQueryHandler(show_expenses_page, pattern="^expenses:(next|prev):"))
+    application.add_handler(CommandHandler("show_categories", show_categories))
+
+    application.add_handler(CommandHandler("add_admin", add_admin))
+    application.add_handler(CommandHandler("remove_admin", remove_admin))
+    application.add_handler(CommandHandler("show_admins", show_admins))
+
+    application.add_handler(CommandHandler("show_currency", show_currency))
+    #application.add_handler(CommandHandler("set_currency", set_currency))
+    application.add_handler(CommandHandler("valid_currencies", valid_currencies))
+    #application.add_handler(CommandHandler("convert_currency", convert_currency))
+
+    application.add_handler(CommandHandler("export_expenses", export_expenses))
+
+    
+
+    #/settle_all command
+    settle_all_conv_handler = ConversationHandler(
+        entry_points=[CommandHandler("settle_all", settle_all_start)],
+        states={
+            SETTLE_CONFIRMATION: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, settle_all_confirm),  # Only plain text (not commands)
+            ],
+        },
+        fallbacks=[CommandHandler("cancel", settle_all_cancel)],
+        name="settle_all",
+        persistent=True,  # State survives restarts (of a single worker, see persistence.py)
+    ) 
+
+    application.add_handler(settle_all_conv_handler)
+
+    #/add_member command
+    add_member_conv_handler = ConversationHandler(
+        entry_points=[
+            CommandHandler("add_member", add_member),
+            CallbackQueryHandler(add_member, pattern="^add_member$"),  # Triggered by inline button
+        ],
+        states={
+            MEMBER_CONFIRMATION: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, specify_member),  # Only plain text (not commands)
+            ],
+        },
+        fallbacks=[CommandHandler("cancel", add_member_cancel)],
+        name="add_member",
+        persistent=True,
+    ) 
+
+    application.add_handler(add_member_conv_handler)
+
+    #/remove_member command
+    remove_member_conv_handler = ConversationHandler(
+        entry_points=[
+            CommandHandler("remove_member", remove_member_start)],
+        states={
+            REMOVE_MEMBER_CONFIRMATION: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, remove_member_specify),  # Only plain text (not commands)
+            ],
+        },
+        fallbacks=[CommandHandler("cancel", remove_member_cancel)],
+        name="remove_member",
+        persistent=True,
+    ) 
+
+    application.add_handler(remove_member_conv_handler)
+
+    #remove_all_members command
+    remove_all_conv_handler = ConversationHandler(
+        entry_points=[CommandHandler("remove_all_members", remove_all_start)],
+        states={
+            REMOVE_CONFIRMATION: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, remove_all_confirm),  # Only plain text (not commands)
+            ],
+        },
+        fallbacks=[CommandHandler("cancel", remove_all_cancel)],
+        name="remove_all_members",
+        persistent=True,
+    )
+
+    application.add_handler(remove_all_conv_handler)
+
+    #/delete_all_data command
+    delete_all_conv_handler = ConversationHandler(
+        entry_points=[CommandHandler("delete_all", delete_all_start)],
+        states={
+            DELETE_ALL_GIVE_PASSWORD: [MessageHandler(filters.TEXT & ~filters.COMMAND, delete_all_password)],
+
+            DELETE_ALL_CONFIRMATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, delete_all_confirm)],  # Only plain text (not commands)
+        },
+        fallbacks=[CommandHandler("cancel", delete_all_cancel)],
+        name="delete_all",
+        persistent=True,
+    ) 
+
+    application.add_handler(delete_all_conv_handler)
+
+    #add_expense command
+    expense_conv_handler = ConversationHandler(
+    entry_points=[
+        CommandHandler('add_expense', add_expense),
+        CallbackQueryHandler(add_expense, pattern="^add_expense$"),
+        ],
+    states={
+        PURPOSE: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_purpose)],
+        PAYER: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_payer)],
+        AMOUNT: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_amount)],
+        BENEFICIARIES: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_beneficiaries)],
+        SPLIT: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_split)],
+    },
+    fallbacks=[CommandHandler('cancel', add_expense_cancel)],  # Optional: Implement cancel command
+    name="add_expense",
+    persistent=True,
+    ) 
+
+    application.add_handler(expense_conv_handler)
+
+    #/set_currency command
+    set_currency_handler = ConversationHandler(
+        entry_points=[
+            CommandHandler("set_currency", set_currency),
+            CallbackQueryHandler(set_currency, pattern="^set_currency$"),  # Triggered by inline button
+        ],
+        states={
+            CURRENCY_CONFIRMATION: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, find_currency),  # Only plain text (not commands)
+            ],
+        },
+        fallbacks=[CommandHandler("cancel", set_currency_cancel)],
+        name="set_currency",
+        persistent=True,
+    ) 
+
+    application.add_handler(set_currency_handler)
+
+    #/create_category command
+    create_category_conv_handler = ConversationHandler(
+        entry_points=[
+            CommandHandler("create_category", create_category),
+        ],
+        states={
+            CATEGORY_CONFIRMATION: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, name_category),  # Only plain text (not commands)
+            ],
+        },
+        fallbacks=[CommandHandler("cancel", create_category_cancel)],
+        name="create_category",
+        persistent=True,
+    ) 
+
+    application.add_handler(create_category_conv_handler)
+
+    #update_category command
+    update_category_conv_handler = ConversationHandler(
+    entry_points=[
+        CommandHandler('update_category', update_category),
+        ],
+    states={
+        CATEGORY: [MessageHandler(filters.TEXT & ~filters.COMMAND, expense_category)],
+        EXPENSE: [MessageHandler(filters.TEXT & ~filters.COMMAND, expense_name)],
+    },
+    fallbacks=[CommandHandler('cancel', update_category_cancel)],  # Optional: Implement cancel command
+    name="update_category",
+    persistent=True,
+    ) 
+
+    application.add_handler(update_category_conv_handler)
+
+    #show_spending command
+    show_spending_conv_handler = ConversationHandler(
+    entry_points=[
+        CommandHandler('show_spending', show_spending),
+        ],
+    states={
+        CATEGORY: [MessageHandler(filters.TEXT & ~filters.COMMAND, spending_category)],
+        INDIVIDUAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, spending_individual)],
+    },
+    fallbacks=[CommandHandler('cancel', show_spending_cancel)],  # Optional: Implement cancel command
+    name="show_spending",
+    persistent=True,
+    ) 
+
+    application.add_handler(show_spending_conv_handler)
+
+    instrument_handlers(application)
+
+def timed(callback):
+    """Wrap a handler callback to record its latency under e.g. handler="add_expense.add_split"."""
+    label = f"{callback.__module__.rsplit('.', 1)[-1]}.{callback.__name__}"
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        start = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            handler_errors.inc(handler=label)
+            raise
+        finally:
+            handler_duration.observe(time.perf_counter() - start, handler=label)
+
+    return wrapper
+
+def instrument_handlers(application):
+    """Time every registered callback, including each step of the conversations."""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            if isinstance(handler, ConversationHandler):
+                steps = [*handler.entry_points, *handler.fallbacks]
+                for state_handlers in handler.states.values():
+                    steps.extend(state_handlers)
+            else:
+                steps = [handler]
+
+            for step in steps:
+                step.callback = timed(step.callback)
@@ -0,0 +1,192 @@
+import asyncio, bisect, contextlib, contextvars, logging, threading, time
+from telebot.credentials import LOOP_LAG_INTERVAL, LOOP_LAG_WARN_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+#Process-wide metrics registry: name -> metric
+REGISTRY = {}
+#Callables run before each scrape, to refresh gauges that are cheaper to read than to keep updated
+COLLECTORS = []
+
+# Seconds; from a cached lookup up to a slow Bot API call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Metric:
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self.values = {}  # tuple of sorted label items -> value
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted(labels.items()))
+
+    def get(self, **labels):
+        return self.values.get(self._key(labels), 0)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.values.items())
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    """Counts of observations per bucket; values hold [per-bucket counts, sum, count] per label set."""
+    kind = "histogram"
+
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # Index len(buckets) is the +Inf bucket
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def get(self, **labels):
+        """Number of observations with these labels."""
+        entry = self.values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def snapshot(self):
+        # Copies, so a scrape never sees a label set half-updated
+        with self._lock:
+            return [(key, (list(counts), total, count)) for key, (counts, total, count) in self.values.items()]
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(items, **extra):
+    items = list(items) + sorted(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in items) + "}"
+
+def render():
+    """Every registered metric in the Prometheus text exposition format."""
+    for collect in COLLECTORS:
+        try:
+            collect()
+        except Exception as e:
+            logger.warning(f"Metrics collector {collect.__name__} failed: {e}")
+
+    lines = []
+    for metric in list(REGISTRY.values()):
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for key, value in metric.snapshot():
+            if metric.kind != "histogram":
+                lines.append(f"{metric.name}{_labels(key)} {value}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(metric.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f"{metric.name}_bucket{_labels(key, le=bound)} {cumulative}")
+            lines.append(f"{metric.name}_sum{_labels(key)} {total}")
+            lines.append(f"{metric.name}_count{_labels(key)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+class UpdateStats:
+    """Tallies for the update being processed, reachable from the executor threads it calls into."""
+
+    def __init__(self, update_id=None):
+        self.update_id = update_id
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.over_budget = []  # (handler, statements run, budget) of every @query_budget overrun
+        self.finished = False  # Background work outliving the update no longer counts against it
+        self._lock = threading.Lock()  # Several executor threads may record statements at once
+
+    def record_query(self, elapsed):
+        with self._lock:
+            if self.finished:
+                return
+            self.queries += 1
+            self.query_seconds += elapsed
+
+    def finish(self):
+        with self._lock:
+            self.finished = True
+
+
+#Set by processor.process_update for the duration of an update; None outside of one
+current_update = contextvars.ContextVar("current_update", default=None)
+
+
+event_loop_lag = Gauge("event_loop_lag_seconds", "Delay between when the lag probe was due and when it ran")
+event_loop_lag_max = Gauge("event_loop_lag_max_seconds", "Largest event loop lag seen since startup")
+
+
+class LoopLagMonitor:
+    """Background task measuring how late the event loop runs a periodic wake-up."""
+
+    def __init__(self, interval=LOOP_LAG_INTERVAL, warn_threshold=LOOP_LAG_WARN_THRESHOLD):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - expected)
+
+            event_loop_lag.set(lag)
+            if lag > event_loop_lag_max.get():
+                event_loop_lag_max.set(lag)
+            if lag > self.warn_threshold:
+                logger.warning(f"Event loop lagged by {lag * 1000:.0f}ms")
+
+
+loop_lag_monitor = LoopLagMonitor()
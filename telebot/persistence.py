@@ -0,0 +1,127 @@
+import asyncio, json, logging, pickle
+from telegram.ext import BasePersistence, PersistenceInput
+from telebot.credentials import PERSISTENCE_UPDATE_INTERVAL, PERSISTENCE_FLUSH_DELAY
+from telebot.engine.storage.data_manager import load_bot_data, load_conversations, save_bot_persistence
+
+#Keeps conversation states, user_data and chat_data in the database, so a restart picks up
+#half-entered expenses where they were left.
+#
+#Restarts only, with a single worker: everything is loaded once at startup and the refresh_* hooks
+#do not re-read rows, so a second worker running at the same time would neither see conversations
+#the first one started nor avoid overwriting its rows.
+#
+#PTB already only hands over entries that changed, every update_interval seconds. Those changes
+#are pickled into a dirty set and written together once PERSISTENCE_FLUSH_DELAY has passed, so
+#processing an update never waits on a persistence write.
+
+logger = logging.getLogger(__name__)
+
+
+def conversation_key(key):
+    """Conversation keys are tuples of ints; stored as JSON arrays."""
+    return json.dumps(list(key))
+
+
+class DatabasePersistence(BasePersistence):
+    def __init__(self, update_interval=PERSISTENCE_UPDATE_INTERVAL, flush_delay=PERSISTENCE_FLUSH_DELAY):
+        super().__init__(store_data=PersistenceInput(bot_data=False, callback_data=False), update_interval=update_interval)
+        self.flush_delay = flush_delay
+        self._user_data = {}      # user_id -> pickled data, or None to delete
+        self._chat_data = {}      # chat_id -> pickled data, or None to delete
+        self._conversations = {}  # (name, JSON key) -> pickled state, or None to delete
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+
+    #Loading, once at startup
+    async def get_user_data(self):
+        return {user_id: pickle.loads(data) for user_id, data in (await load_bot_data("user")).items()}
+
+    async def get_chat_data(self):
+        return {chat_id: pickle.loads(data) for chat_id, data in (await load_bot_data("chat")).items()}
+
+    async def get_conversations(self, name):
+        return {tuple(json.loads(key)): pickle.loads(state) for key, state in (await load_conversations(name)).items()}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    #Changes, batched into the next flush
+    async def update_user_data(self, user_id, data):
+        # Pickled now, so later changes to the live dict do not leak into this batch half-done
+        self._user_data[user_id] = pickle.dumps(data)
+        self._schedule_flush()
+
+    async def update_chat_data(self, chat_id, data):
+        self._chat_data[chat_id] = pickle.dumps(data)
+        self._schedule_flush()
+
+    async def update_conversation(self, name, key, new_state):
+        self._conversations[(name, conversation_key(key))] = pickle.dumps(new_state) if new_state is not None else None
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id):
+        self._user_data[user_id] = None
+        self._schedule_flush()
+
+    async def drop_chat_data(self, chat_id):
+        self._chat_data[chat_id] = None
+        self._schedule_flush()
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    #Writing
+    def dirty(self):
+        return len(self._user_data) + len(self._chat_data) + len(self._conversations)
+
+    def _schedule_flush(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_delay)
+        # Changes arriving during the write schedule the next batch
+        self._flush_task = None
+        await self._write()
+
+    async def _write(self):
+        async with self._flush_lock:
+            if not self.dirty():
+                return
+
+            batch = (self._user_data, self._chat_data, self._conversations)
+            self._user_data, self._chat_data, self._conversations = {}, {}, {}
+
+            try:
+                await save_bot_persistence(*batch)
+            except Exception as e:
+                logger.error(f"Persistence flush failed, retrying with the next batch: {e}")
+                # Put the batch back without overwriting anything newer
+                for pending, failed in zip((self._user_data, self._chat_data, self._conversations), batch):
+                    for key, value in failed.items():
+                        pending.setdefault(key, value)
+                self._schedule_flush()
+
+    async def flush(self):
+        """Called by PTB on shutdown: write everything still pending."""
+        if self._flush_task is not None:
+            # Still waiting out its delay; write now instead
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self._write()
@@ -0,0 +1,87 @@
+import asyncio, time
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from telebot.credentials import UPDATE_CONCURRENCY
+from telebot.metrics import Histogram, UpdateStats, current_update
+from telebot.engine.storage.querylog import check_budget
+
+#Lets the application work on updates of different chats at once, while updates of the same chat
+#run one at a time in arrival order, so ConversationHandler steps (add_expense, set_currency,
+#update_category...) never overtake each other.
+
+update_duration = Histogram("update_duration_seconds", "Time from starting an update to finishing it, waiting for its chat included")
+update_queries = Histogram("db_queries_per_update", "Database statements executed for one update", buckets=(0, 1, 2, 5, 10, 20, 50, 100))
+update_query_time = Histogram("db_time_per_update_seconds", "Time an update spent in database statements")
+
+
+def chat_key(update):
+    """Updates sharing a key are serialised: the chat, else the user, else none at all."""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return update.effective_user.id
+    return None
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """At most max_concurrent_updates updates in flight overall, and one per chat."""
+
+    def __init__(self, max_concurrent_updates=UPDATE_CONCURRENCY):
+        super().__init__(max_concurrent_updates)
+        self._locks = {}  # chat key -> [lock, number of updates holding or waiting for it]
+        self._slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+
+    async def process_update(self, update, coroutine):
+        """Wait for the chat's turn first and for a concurrency slot second.
+
+        PTB's own process_update takes the slot first, so updates queued behind a busy chat
+        would hold slots while doing nothing and one hot chat could stall every other chat.
+        """
+        key = chat_key(update)
+        if key is None:
+            async with self._slots:
+                await self.do_process_update(update, coroutine)
+            return
+
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            # asyncio.Lock wakes waiters first-come first-served, preserving the chat's order
+            async with entry[0]:
+                async with self._slots:
+                    await self.do_process_update(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    def active_chats(self):
+        return len(self._locks)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        self._locks.clear()
+
+
+async def process_update(application, update):
+    """Run an update through the application's update processor, as PTB's own polling loop does."""
+    # Statements run on executor threads count against this update, see executor.run_blocking
+    stats = UpdateStats(getattr(update, "update_id", None))
+    token = current_update.set(stats)
+    start = time.perf_counter()
+    try:
+        await application.update_processor.process_update(update, application.process_update(update))
+    finally:
+        stats.finish()
+        current_update.reset(token)
+        update_duration.observe(time.perf_counter() - start)
+        update_queries.observe(stats.queries)
+        update_query_time.observe(stats.query_seconds)
+    check_budget(stats)
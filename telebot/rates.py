@@ -0,0 +1,118 @@
+import asyncio, logging
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import httpx
+from telebot.credentials import EXCHANGE_RATE_API_URL, EXCHANGE_RATE_TTL, EXCHANGE_RATE_TIMEOUT, EXCHANGE_RATE_RETRY_INTERVAL
+from telebot.engine.storage.data_manager import load_exchange_rates, save_exchange_rates
+from telebot.engine.storage.base import BASE_CURRENCY  # EXCHANGE_RATE_API_URL must quote rates against this currency
+
+#Exchange rates shared by every group.
+#Rates are kept in memory and in the exchange_rates table, and refreshed from the upstream API
+#at most once per EXCHANGE_RATE_TTL. Concurrent callers share a single refresh, and if the
+#upstream is down the last known rates keep being served.
+#For offline use, point EXCHANGE_RATE_API_URL at tools/fake_exchange_rate_api.py.
+
+logger = logging.getLogger(__name__)
+
+
+class RatesUnavailableError(Exception):
+    """Raised when there are no rates at all: the upstream failed and nothing was cached."""
+
+
+class ExchangeRateService:
+    def __init__(self, url=EXCHANGE_RATE_API_URL, ttl=EXCHANGE_RATE_TTL, timeout=EXCHANGE_RATE_TIMEOUT, retry_interval=EXCHANGE_RATE_RETRY_INTERVAL):
+        self.url = url
+        self.ttl = ttl
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.rates = {}           # currency -> Decimal units per 1 BASE_CURRENCY
+        self.fetched_at = None    # When the upstream returned self.rates (UTC)
+        self._retry_at = None     # No upstream calls before this, after a failed refresh
+        self._refresh = None      # In-flight refresh task shared by concurrent callers
+        self._client = None
+
+    def _age(self):
+        return (datetime.now(timezone.utc) - self.fetched_at).total_seconds() if self.fetched_at else None
+
+    def is_fresh(self):
+        age = self._age()
+        return age is not None and age < self.ttl
+
+    def _get_client(self):
+        # One client for the process, so refreshes reuse the upstream connection
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def get_rates(self):
+        """{currency: rate} against BASE_CURRENCY, refreshing if they are older than the TTL."""
+        if not self.is_fresh():
+            if self._refresh is None:
+                self._refresh = asyncio.get_running_loop().create_task(self._update())
+                self._refresh.add_done_callback(self._refresh_done)
+            # Shielded so one caller being cancelled does not cancel everyone's refresh
+            await asyncio.shield(self._refresh)
+
+        if not self.rates:
+            raise RatesUnavailableError("Exchange rates are unavailable. Please try again later.")
+        return self.rates
+
+    async def get_rate(self, currency):
+        """Units of currency per 1 BASE_CURRENCY, or None if the currency is not supported."""
+        return (await self.get_rates()).get(currency.upper())
+
+    def _refresh_done(self, task):
+        self._refresh = None
+
+    async def _update(self):
+        # Another worker may have refreshed the shared table already
+        try:
+            rates, fetched_at = await load_exchange_rates(BASE_CURRENCY)
+            if rates and (self.fetched_at is None or fetched_at > self.fetched_at):
+                self.rates, self.fetched_at = rates, fetched_at
+        except Exception as e:
+            logger.warning(f"Could not load persisted exchange rates: {e}")
+
+        if self.is_fresh():
+            return
+
+        now = datetime.now(timezone.utc)
+        if self._retry_at is not None and now < self._retry_at:
+            return  # Upstream failed recently; keep serving what we have
+
+        try:
+            rates, fetched_at = await self._fetch()
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            self._retry_at = now + timedelta(seconds=self.retry_interval)
+            age = self._age()
+            logger.warning(
+                f"Exchange rate refresh failed ({e}); "
+                + (f"serving rates {age:.0f}s old." if age is not None else "no rates cached.")
+            )
+            return
+
+        self.rates, self.fetched_at, self._retry_at = rates, fetched_at, None
+        try:
+            await save_exchange_rates(BASE_CURRENCY, rates, fetched_at)
+        except Exception as e:
+            logger.warning(f"Could not persist exchange rates: {e}")
+
+    async def _fetch(self):
+        response = await self._get_client().get(self.url)
+        response.raise_for_status()
+        data = response.json(parse_float=Decimal)
+
+        base = data.get("base_code", BASE_CURRENCY)
+        if base != BASE_CURRENCY:
+            raise ValueError(f"Upstream quotes rates against {base}, expected {BASE_CURRENCY}")
+
+        rates = {currency: Decimal(str(rate)) for currency, rate in data["conversion_rates"].items()}
+        return rates, datetime.now(timezone.utc)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+rate_service = ExchangeRateService()
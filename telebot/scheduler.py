@@ -0,0 +1,311 @@
+import asyncio, itertools, logging, time
+from collections import deque
+from telegram import InputFile
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from telebot.credentials import (
+    OUTBOUND_GLOBAL_RATE, OUTBOUND_CHAT_RATE, OUTBOUND_GROUP_RATE, OUTBOUND_MAX_RETRIES, UPDATE_DRAIN_TIMEOUT
+)
+from telebot.metrics import Counter, Gauge, Histogram
+
+#Every Bot API request goes through one scheduler instead of straight to Telegram, so bursts are
+#smoothed out before Telegram answers 429 rather than after:
+#  - a global token bucket (OUTBOUND_GLOBAL_RATE requests per second),
+#  - per-chat buckets for new messages: OUTBOUND_CHAT_RATE per second in private chats,
+#    OUTBOUND_GROUP_RATE per minute in groups,
+#  - conversation replies (HIGH_PRIORITY, the default) go before bulk work such as the
+#    message cleanup (LOW_PRIORITY),
+#  - plain texts that opt in with "coalesce" and are still waiting for the same chat are sent as
+#    one message; off by default, since every caller then receives the same merged Message,
+#  - a 429 pauses the chat (or everything, for requests without a chat) for retry_after seconds
+#    and the request is retried, up to OUTBOUND_MAX_RETRIES times.
+#
+#Options are passed per call through PTB's rate_limit_args, e.g.
+#   await context.bot.delete_messages(..., rate_limit_args={"priority": LOW_PRIORITY})
+#   await chat.send_message(..., rate_limit_args={"coalesce": True})  # Fire-and-forget notices only
+
+logger = logging.getLogger(__name__)
+
+HIGH_PRIORITY = 0
+LOW_PRIORITY = 1
+PRIORITIES = (HIGH_PRIORITY, LOW_PRIORITY)
+
+MAX_MESSAGE_LENGTH = 4096  # Bot API limit for a text message
+# Texts differing only in these can be merged; anything else (keyboards, replies, entities) is sent as is
+COALESCE_KEYS = {"chat_id", "text", "parse_mode", "disable_notification", "message_thread_id", "link_preview_options"}
+# Long polls must never wait behind messages
+UNLIMITED_ENDPOINTS = {"getUpdates"}
+
+outbound_queue_depth = Gauge("outbound_queue_depth", "Bot API requests waiting for a rate limit token")
+outbound_coalesced = Counter("outbound_coalesced_total", "Messages merged into an earlier queued message to the same chat")
+outbound_retries = Counter("outbound_retries_total", "Bot API requests retried after a 429")
+telegram_request_duration = Histogram("telegram_request_duration_seconds", "Bot API round trip, by method, excluding time queued")
+telegram_request_errors = Counter("telegram_request_errors_total", "Bot API requests that failed, by method and error")
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate          # Tokens added per second
+        self.capacity = max(1, capacity)  # Largest burst; at least one request must fit
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, now):
+        """Seconds until a token is available; 0 if one is available now."""
+        self._refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class OutboundJob:
+    def __init__(self, seq, callback, args, kwargs, endpoint, data, priority, coalesce):
+        self.seq = seq
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs
+        self.endpoint = endpoint
+        self.data = data          # Same dict as passed to the callback, so merged text is what gets sent
+        self.chat_id = data.get("chat_id")
+        self.priority = priority
+        self.coalesce = coalesce
+        self.attempts = 0
+        self.futures = [asyncio.get_running_loop().create_future()]
+        # Uploads streamed from a file handle (InputFile(..., read_file_handle=False)) are read to the end by
+        # each attempt, so a retry first seeks them back to where they started
+        self.uploads = [
+            (value.input_file_content, value.input_file_content.tell())
+            for value in data.values()
+            if isinstance(value, InputFile) and hasattr(value.input_file_content, "seek")
+        ]
+
+    def rewind(self):
+        for handle, position in self.uploads:
+            handle.seek(position)
+
+    def is_message(self):
+        """New messages count against the chat's limit; edits, deletes and callback answers only globally."""
+        return self.endpoint.startswith("send") and self.endpoint != "sendChatAction" and self.chat_id is not None
+
+    def merge(self, other):
+        """Append other's text to this still-queued message if they are plain texts with the same options."""
+        if not (self.coalesce and other.coalesce and self.endpoint == other.endpoint == "sendMessage"):
+            return False
+        if set(self.data) - COALESCE_KEYS or set(other.data) - COALESCE_KEYS:
+            return False
+        if any(self.data.get(key) != other.data.get(key) for key in COALESCE_KEYS - {"text"}):
+            return False
+
+        text = f"{self.data['text']}\n\n{other.data['text']}"
+        if len(text) > MAX_MESSAGE_LENGTH:
+            return False
+        self.data["text"] = text
+        self.futures.extend(other.futures)
+        return True
+
+    def cancelled(self):
+        return all(future.done() for future in self.futures)
+
+    def resolve(self, result=None, error=None):
+        for future in self.futures:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+class OutboundScheduler(BaseRateLimiter):
+    def __init__(
+        self,
+        global_rate=OUTBOUND_GLOBAL_RATE,
+        chat_rate=OUTBOUND_CHAT_RATE,
+        group_rate=OUTBOUND_GROUP_RATE,
+        max_retries=OUTBOUND_MAX_RETRIES,
+        drain_timeout=UPDATE_DRAIN_TIMEOUT,
+    ):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate  # Per minute
+        self.max_retries = max_retries
+        self.drain_timeout = drain_timeout
+
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats = {}           # chat_id -> TokenBucket, dropped again once full and idle
+        self._pending = {}         # chat_id (None for chat-less requests) -> one deque of jobs per priority
+        self._paused = {}          # chat_id -> monotonic time its 429 pause ends
+        self._paused_until = 0.0   # Same for everything, after a 429 on a chat-less request
+        self._in_flight = set()
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def depth(self):
+        return sum(len(queue) for queues in self._pending.values() for queue in queues)
+
+    async def initialize(self):
+        pass
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        if endpoint in UNLIMITED_ENDPOINTS:
+            return await callback(*args, **kwargs)
+
+        options = rate_limit_args or {}
+        job = OutboundJob(
+            next(self._seq), callback, args, kwargs, endpoint, data,
+            options.get("priority", HIGH_PRIORITY), options.get("coalesce", False),
+        )
+        future = job.futures[0]
+
+        queue = self._pending.setdefault(job.chat_id, tuple(deque() for _ in PRIORITIES))[job.priority]
+        if queue and queue[-1].merge(job):
+            outbound_coalesced.inc()
+        else:
+            queue.append(job)
+        outbound_queue_depth.set(self.depth())
+
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._wakeup.set()
+        return await future
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Group and channel ids are negative, channels may also be addressed by @username
+            if str(chat_id).startswith(("-", "@")):
+                bucket = TokenBucket(self.group_rate / 60, self.group_rate)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_rate)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _head(self, queues):
+        """The chat's next job: its oldest high-priority one, else its oldest low-priority one."""
+        for queue in queues:
+            while queue and queue[0].cancelled():
+                queue.popleft()
+            if queue:
+                return queue[0]
+        return None
+
+    def _next_job(self, now):
+        """The job to start now, or None and how long to wait before one can start."""
+        wait = max(self._global.wait(now), self._paused_until - now)
+        if wait > 0:
+            return None, wait
+
+        best, wait = None, None
+        for chat_id, queues in list(self._pending.items()):
+            job = self._head(queues)
+            if job is None:
+                del self._pending[chat_id]
+                continue
+
+            job_wait = self._paused.get(chat_id, 0) - now
+            if job.is_message():
+                job_wait = max(job_wait, self._chat_bucket(chat_id).wait(now))
+            if job_wait > 0:
+                wait = job_wait if wait is None else min(wait, job_wait)
+            elif best is None or (job.priority, job.seq) < (best.priority, best.seq):
+                best = job
+        return best, wait
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            job, wait = self._next_job(now)
+
+            if job is not None:
+                self._global.take(now)
+                if job.is_message():
+                    self._chat_bucket(job.chat_id).take(now)
+                queues = self._pending[job.chat_id]
+                queues[job.priority].popleft()
+                if not any(queues):
+                    del self._pending[job.chat_id]
+                outbound_queue_depth.set(self.depth())
+
+                task = asyncio.get_running_loop().create_task(self._send(job))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+                continue
+
+            if not self._pending:
+                self._prune(now)
+            # Sleep until a token frees up or a new request arrives
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def _prune(self, now):
+        """Forget chats whose buckets are full again and whose pauses are over; they behave as new ones."""
+        self._chats = {chat_id: bucket for chat_id, bucket in self._chats.items() if not bucket.full(now)}
+        self._paused = {chat_id: until for chat_id, until in self._paused.items() if until > now}
+
+    async def _send(self, job):
+        try:
+            with telegram_request_duration.time(method=job.endpoint):
+                result = await job.callback(*job.args, **job.kwargs)
+        except RetryAfter as e:
+            telegram_request_errors.inc(method=job.endpoint, error="RetryAfter")
+            retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+            if job.attempts >= self.max_retries:
+                logger.error(f"{job.endpoint} to chat {job.chat_id} still rate limited after {job.attempts} retries")
+                job.resolve(error=e)
+                return
+
+            job.attempts += 1
+            outbound_retries.inc()
+            logger.warning(f"{job.endpoint} to chat {job.chat_id} rate limited, retrying in {retry_after}s")
+            until = time.monotonic() + retry_after
+            if job.chat_id is not None:
+                self._paused[job.chat_id] = max(self._paused.get(job.chat_id, 0), until)
+            else:
+                self._paused_until = max(self._paused_until, until)
+
+            # Back to the front of its chat's queue, ahead of anything queued since
+            job.rewind()
+            self._pending.setdefault(job.chat_id, tuple(deque() for _ in PRIORITIES))[job.priority].appendleft(job)
+            outbound_queue_depth.set(self.depth())
+            self._wakeup.set()
+        except Exception as e:
+            telegram_request_errors.inc(method=job.endpoint, error=type(e).__name__)
+            job.resolve(error=e)
+        else:
+            job.resolve(result)
+
+    async def shutdown(self):
+        """Send what is still queued for up to drain_timeout seconds, then cancel the rest."""
+        if self._task is None:
+            return
+
+        deadline = time.monotonic() + self.drain_timeout
+        while (self._pending or self._in_flight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._pending:
+            logger.warning(f"Dropping {self.depth()} queued Bot API request(s) on shutdown.")
+
+        self._task.cancel()
+        await asyncio.gather(self._task, *self._in_flight, return_exceptions=True)
+        self._task = None
+        for queues in self._pending.values():
+            for queue in queues:
+                for job in queue:
+                    for future in job.futures:
+                        future.cancel()
+        self._pending.clear()
+        outbound_queue_depth.set(0)
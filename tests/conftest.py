@@ -0,0 +1,37 @@
+import itertools, os, sys, tempfile
+import pytest
+
+#Tests run offline: storage is the embedded SQLite backend in a throwaway file, and query budgets
+#are enforced, so a handler path creeping over its declared statement count fails here.
+#Settings are read when telebot.credentials is imported, so they are set before anything else loads.
+#Run from the repository root:   python -m pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["STORAGE_BACKEND"] = "sqlite"
+os.environ["SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="expensplit-tests-"), "expensplit.db")
+os.environ["QUERY_BUDGET_ENFORCE"] = "1"
+os.environ["LEDGER_SNAPSHOT_INTERVAL"] = "5"  # Small, so a few expenses are enough to reach a snapshot
+
+_group_ids = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def storage():
+    """The storage facade on a freshly created SQLite schema."""
+    from telebot.engine.storage import data_manager
+    from telebot.executor import shutdown_executor
+
+    assert data_manager.check_schema()
+    yield data_manager
+    shutdown_executor()
+    data_manager.close_storage()
+
+@pytest.fixture
+def group_id(storage):
+    """A new group (negative id, as for Telegram groups) with alice as its admin and participant."""
+    group_id = -next(_group_ids)
+    storage.init_group.sync(group_id, "alice")
+    storage.add_participant.sync(group_id, "alice")
+    return group_id
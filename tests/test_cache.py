@@ -0,0 +1,63 @@
+from telebot.engine.storage.cache import Roster, RosterCache
+
+
+def test_put_then_get():
+    cache = RosterCache(max_groups=4, ttl=60)
+    cache.put(-1, Roster(["alice"], ["alice"]), cache.generation(-1))
+
+    assert "alice" in cache.get(-1).admin_set
+    assert cache.hits == 1
+
+def test_invalidation_during_load_discards_the_stale_roster():
+    cache = RosterCache(max_groups=4, ttl=60)
+
+    generation = cache.generation(-1)   # A load starts...
+    cache.invalidate(-1)                # ...a write lands while it reads...
+    cache.put(-1, Roster(["alice"], []), generation)  # ...and its now stale result arrives
+
+    assert cache.get(-1) is None
+
+def test_invalidating_another_group_keeps_the_load():
+    cache = RosterCache(max_groups=4, ttl=60)
+
+    generation = cache.generation(-1)
+    cache.invalidate(-2)
+    cache.put(-1, Roster(["alice"], []), generation)
+
+    assert cache.get(-1) is not None
+
+def test_forgotten_invalidations_still_discard_racing_loads():
+    cache = RosterCache(max_groups=2, ttl=60)
+
+    generation = cache.generation(-1)
+    cache.invalidate(-1)
+    for group_id in (-2, -3, -4):  # Push -1's stamp out of the bookkeeping
+        cache.invalidate(group_id)
+    assert len(cache._invalidated) == 2
+
+    cache.put(-1, Roster(["alice"], []), generation)
+    assert cache.get(-1) is None
+
+    # A load starting after the invalidations is kept
+    cache.put(-1, Roster(["alice"], []), cache.generation(-1))
+    assert cache.get(-1) is not None
+
+def test_clear_discards_loads_under_way():
+    cache = RosterCache(max_groups=4, ttl=60)
+
+    generation = cache.generation(-1)
+    cache.clear()
+    cache.put(-1, Roster(["alice"], []), generation)
+
+    assert cache.get(-1) is None
+
+def test_entries_expire_and_are_evicted():
+    cache = RosterCache(max_groups=1, ttl=0)
+    cache.put(-1, Roster(["alice"], []), cache.generation(-1))
+    assert cache.get(-1) is None  # Past its TTL at once
+
+    cache = RosterCache(max_groups=1, ttl=60)
+    cache.put(-1, Roster(["alice"], []), cache.generation(-1))
+    cache.put(-2, Roster(["bob"], []), cache.generation(-2))
+    assert cache.get(-1) is None
+    assert cache.get(-2) is not None
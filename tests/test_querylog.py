@@ -0,0 +1,35 @@
+from telebot.engine.storage.querylog import fingerprint
+
+
+def test_literals_and_parameters_share_a_fingerprint():
+    psycopg2 = fingerprint("SELECT * FROM expenses WHERE group_id = %s AND purpose = 'lunch' LIMIT 10;")
+    named = fingerprint("SELECT * FROM expenses WHERE group_id = %(group_id)s AND purpose = %(purpose)s LIMIT 20")
+    sqlite = fingerprint("SELECT * FROM expenses WHERE group_id = :group_id AND purpose = ? LIMIT 5")
+
+    assert psycopg2[1] == "SELECT * FROM expenses WHERE group_id = ? AND purpose = ? LIMIT ?"
+    assert psycopg2[0] == named[0] == sqlite[0]
+    assert psycopg2[2] == "SELECT"
+
+def test_lists_of_any_length_share_a_fingerprint():
+    two = fingerprint("DELETE FROM expenses WHERE id IN (?, ?);")
+    five = fingerprint("DELETE FROM expenses WHERE id IN (?, ?, ?, ?, ?);")
+
+    assert two[1] == "DELETE FROM expenses WHERE id IN (?)"
+    assert two[0] == five[0]
+
+def test_comments_and_whitespace_are_ignored():
+    statement = """
+    -- Latest expenses
+    SELECT id   FROM expenses /* keyset */
+    WHERE group_id = 42;
+    """
+    assert fingerprint(statement)[1] == "SELECT id FROM expenses WHERE group_id = ?"
+
+def test_type_casts_are_not_parameters():
+    query_id, normalised, kind = fingerprint("SELECT rate::numeric FROM currency WHERE group_id = %s")
+
+    assert normalised == "SELECT rate::numeric FROM currency WHERE group_id = ?"
+    assert kind == "SELECT"
+
+def test_different_statements_differ():
+    assert fingerprint("SELECT 1 FROM groups")[0] != fingerprint("SELECT 1 FROM admins")[0]
@@ -0,0 +1,86 @@
+import asyncio, io
+import pytest
+from telegram import InputFile
+from telegram.error import RetryAfter
+from telebot.scheduler import OutboundScheduler
+from tools.fake_bot_api import FakeBotAPI, FloodError
+
+#The scheduler in front of tools/fake_bot_api.FakeBotAPI, which answers 429 on demand.
+#Requests go straight to the fake's call(), standing in for PTB's HTTP round trip.
+
+
+def api_callback(api):
+    """A Bot API call as PTB hands it to the rate limiter: files are read while the request is sent."""
+    async def call(endpoint, data):
+        params = {
+            key: value.input_file_content.read() if isinstance(value, InputFile) else value
+            for key, value in data.items()
+        }
+        try:
+            return await api.call(endpoint, params)
+        except FloodError as e:
+            raise RetryAfter(e.retry_after)
+    return call
+
+async def send(scheduler, api, endpoint, data, rate_limit_args=None):
+    call = api_callback(api)
+    return await scheduler.process_request(call, (endpoint, data), {}, endpoint, data, rate_limit_args)
+
+def run(test):
+    async def main():
+        api = FakeBotAPI()
+        scheduler = OutboundScheduler(global_rate=1000, chat_rate=1000, group_rate=60_000, max_retries=2)
+        try:
+            await test(scheduler, api)
+        finally:
+            await scheduler.shutdown()
+    asyncio.run(main())
+
+
+def test_retry_after_429_resends_the_request():
+    async def test(scheduler, api):
+        api.flood = {"fail_next": 1, "retry_after": 0}
+        result = await send(scheduler, api, "sendMessage", {"chat_id": -1, "text": "hi"})
+
+        assert result["text"] == "hi"
+        assert api.rejected == 1
+        assert [method for method, _ in api.sent] == ["sendMessage"]
+    run(test)
+
+def test_retry_rewinds_streamed_uploads():
+    async def test(scheduler, api):
+        content = b"expense_id,purpose\n1,lunch\n"
+        document = InputFile(io.BytesIO(content), filename="export.csv", read_file_handle=False)
+        api.flood = {"fail_next": 1, "retry_after": 0}
+
+        await send(scheduler, api, "sendDocument", {"chat_id": -1, "document": document})
+
+        # The first attempt read the file to the end before being refused; the retry must send all of it again
+        (method, params), = api.sent
+        assert method == "sendDocument"
+        assert params["document"] == content
+    run(test)
+
+def test_gives_up_after_max_retries():
+    async def test(scheduler, api):
+        api.flood = {"fail_next": 5, "retry_after": 0}
+        with pytest.raises(RetryAfter):
+            await send(scheduler, api, "sendMessage", {"chat_id": -1, "text": "hi"})
+
+        assert api.rejected == 3  # The first attempt and max_retries retries
+        assert api.sent == []
+    run(test)
+
+def test_messages_are_only_merged_when_both_opt_in():
+    async def test(scheduler, api):
+        # Queue everything before the scheduler gets to run, so the texts wait side by side
+        separate = [send(scheduler, api, "sendMessage", {"chat_id": -1, "text": text}) for text in ("one", "two")]
+        merged = [
+            send(scheduler, api, "sendMessage", {"chat_id": -2, "text": text}, {"coalesce": True})
+            for text in ("three", "four")
+        ]
+        results = await asyncio.gather(*separate, *merged)
+
+        assert [result["text"] for result in results] == ["one", "two", "three\n\nfour", "three\n\nfour"]
+        assert api.calls["sendMessage"] == 3
+    run(test)
@@ -0,0 +1,47 @@
+from decimal import Decimal
+from telebot.engine.expense.settlement_engine import plan_settlement, greedy_transfers, to_cents
+
+
+def settle(balances, transfers):
+    """Balances left after applying the transfers: debtors pay, creditors are paid."""
+    left = {username: Decimal(str(balance)) for username, balance in balances.items()}
+    for transfer in transfers:
+        left[transfer.debtor] -= transfer.amount
+        left[transfer.creditor] += transfer.amount
+    return left
+
+
+def test_transfers_settle_every_balance():
+    balances = {"alice": Decimal("12.50"), "bob": Decimal("-20.00"), "carol": Decimal("7.50")}
+    transfers, residual = plan_settlement(balances)
+
+    assert residual == 0
+    assert all(balance == 0 for balance in settle(balances, transfers).values())
+    assert all(transfer.amount > 0 for transfer in transfers)
+
+def test_exact_search_beats_greedy():
+    # {d, f} and {a, b, c, e} settle separately: 1 + 3 transfers, where greedy matching needs 5
+    balances = {"a": -8, "b": 6, "c": -2, "d": 3, "e": 4, "f": -3}
+    assert len(greedy_transfers(to_cents(balances))) == 5
+
+    transfers, residual = plan_settlement(balances)
+    assert residual == 0
+    assert len(transfers) == 4
+    assert all(balance == 0 for balance in settle(balances, transfers).values())
+
+def test_greedy_fallback_settles_large_groups():
+    balances = {f"member{i}": Decimal(i - 10) for i in range(21)}  # Sums to zero
+    transfers, residual = plan_settlement(balances, exact_max_members=0)
+
+    assert residual == 0
+    assert len(transfers) <= len(to_cents(balances)) - 1
+    assert all(balance == 0 for balance in settle(balances, transfers).values())
+
+def test_unbalanced_input_reports_residual():
+    transfers, residual = plan_settlement({"alice": Decimal("10.00"), "bob": Decimal("-9.99")})
+
+    assert residual == Decimal("0.01")
+    assert [(t.debtor, t.creditor, t.amount) for t in transfers] == [("alice", "bob", Decimal("9.99"))]
+
+def test_settled_group_needs_no_transfers():
+    assert plan_settlement({"alice": Decimal("0.00"), "bob": Decimal("0.004")}) == ([], Decimal(0))
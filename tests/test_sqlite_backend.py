@@ -0,0 +1,120 @@
+import asyncio
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+from telebot.metrics import UpdateStats, current_update
+from telebot.engine.storage.querylog import QueryBudgetExceeded, check_budget, query_budget
+from telebot.engine.sqlite.database import transaction
+
+#The SQLite backend through the data_manager facade, as the handlers use it.
+
+
+def run_update(coroutine_function, *args):
+    """Await a coroutine as part of an update, as processor.process_update does, enforcing its query budgets."""
+    async def main():
+        stats = UpdateStats(update_id=1)
+        token = current_update.set(stats)
+        try:
+            result = await coroutine_function(*args)
+        finally:
+            stats.finish()
+            current_update.reset(token)
+        check_budget(stats)
+        return result, stats
+    return asyncio.run(main())
+
+def snapshots(group_id):
+    with transaction() as cursor:
+        cursor.execute("SELECT COUNT(DISTINCT ledger_id) FROM balance_snapshots WHERE group_id = ?;", (group_id,))
+        return cursor.fetchone()[0]
+
+def add_members(storage, group_id, *usernames):
+    for username in usernames:
+        storage.add_participant.sync(group_id, username)
+
+
+def test_record_undo_and_balances(storage, group_id):
+    add_members(storage, group_id, "bob", "carol")
+
+    currency = storage.record_expense.sync(group_id, "dinner", "alice", 30, ["alice", "bob", "carol"], [10, 10, 10])
+    assert currency == "SGD"
+    assert dict(storage.get_balances.sync(group_id)) == {"alice": Decimal("-20.00"), "bob": Decimal("10.00"), "carol": Decimal("10.00")}
+    assert storage.get_member_balance.sync(group_id, "BOB") == Decimal("10.00")
+    assert storage.get_member_balance.sync(group_id, "dave") is None
+
+    storage.record_expense.sync(group_id, "taxi", "bob", 8, ["alice"], [8])
+    (undone_id, purpose, payer, amount, *_), = storage.undo_expenses.sync(group_id)
+    assert (purpose, payer, amount) == ("taxi", "bob", Decimal("8"))
+    assert storage.get_member_balance.sync(group_id, "alice") == Decimal("-20.00")
+
+def test_settle_zeroes_every_balance(storage, group_id):
+    add_members(storage, group_id, "bob", "carol")
+    storage.record_expense.sync(group_id, "hotel", "alice", 90, ["alice", "bob", "carol"], [30, 30, 30])
+
+    transfers, residual, settlement_id = storage.settle_balances.sync(group_id, 1)
+
+    assert residual == 0
+    assert sorted((t.debtor, t.creditor, t.amount) for t in transfers) == [
+        ("bob", "alice", Decimal("30.00")), ("carol", "alice", Decimal("30.00")),
+    ]
+    assert all(balance == 0 for _, balance in storage.get_balances.sync(group_id))
+
+def test_reads_defer_snapshots_to_the_next_write(storage, group_id):
+    add_members(storage, group_id, "bob")
+    for _ in range(4):  # 8 entries, past LEDGER_SNAPSHOT_INTERVAL (5)
+        storage.record_expense.sync(group_id, "coffee", "alice", 4, ["bob"], [4])
+
+    before = dict(storage.get_balances.sync(group_id))
+    assert snapshots(group_id) == 0  # Reads never write
+
+    storage.record_expense.sync(group_id, "coffee", "alice", 4, ["bob"], [4])
+    assert snapshots(group_id) == 1
+    assert dict(storage.get_balances.sync(group_id)) == {"alice": before["alice"] - 4, "bob": before["bob"] + 4}
+
+def test_remove_power_only_removes_the_admin(storage, group_id):
+    add_members(storage, group_id, "bob")
+    storage.insert_admin.sync(group_id, "bob")
+
+    storage.remove_power.sync(group_id, "bob")
+
+    admins = asyncio.run(storage.get_admins(group_id))
+    participants = asyncio.run(storage.get_participants(group_id))
+    assert "bob" not in admins
+    assert "bob" in participants
+
+def test_roster_cache_sees_writes(storage, group_id):
+    assert not asyncio.run(storage.is_member(group_id, "bob"))  # Cached now
+    storage.add_participant.sync(group_id, "bob")
+    assert asyncio.run(storage.is_member(group_id, "bob"))
+
+
+#Query budgets, enforced as in the load test
+def test_record_expense_within_its_handler_budget(storage, group_id):
+    from telebot.engine.expense.add_expense import process_expense
+
+    add_members(storage, group_id, "bob")
+    sent = []
+
+    async def send_message(text):
+        sent.append(text)
+
+    update = SimpleNamespace(message=SimpleNamespace(chat_id=group_id), effective_chat=SimpleNamespace(send_message=send_message))
+    context = SimpleNamespace(user_data={
+        "purpose": "lunch", "payer": "alice", "amount": 12.0, "beneficiaries": ["bob"], "split_amounts": [12.0],
+    })
+
+    # Enough expenses that some of them also take a ledger snapshot
+    for _ in range(6):
+        storage.get_balances.sync(group_id)
+        _, stats = run_update(process_expense, update, context)
+        assert stats.queries <= process_expense.query_budget
+
+    assert all(text.startswith("Expense recorded!") for text in sent)
+
+def test_going_over_a_budget_fails_the_update(storage, group_id):
+    @query_budget(1)
+    async def handler():
+        await storage.record_expense(group_id, "lunch", "alice", 5, ["bob"], [5])
+
+    with pytest.raises(QueryBudgetExceeded, match="handler ran 3 statements"):
+        run_update(handler)
@@ -0,0 +1,189 @@
+import argparse, asyncio, itertools, json, time
+from quart import Quart, request
+
+#Local stand-in for the Telegram Bot API, so the handler stack can be run, benchmarked and
+#soak-tested on one box without Telegram:
+#
+#   python tools/fake_bot_api.py --port 8082
+#   BOT_API_BASE_URL=http://127.0.0.1:8082/bot python poll.py
+#
+#It serves getUpdates from an in-memory queue and answers the methods the handlers call with
+#plausible results. Control endpoints:
+#   POST /_updates   a JSON update or list of updates to deliver (update_id is filled in if missing)
+#   GET  /_sent      every method call received, oldest first; DELETE clears it
+#   GET  /_stats     call counts per method
+#   POST /_flood     answer 429 like Telegram's flood control, e.g.
+#                    {"chat_rate": 1, "global_rate": 30, "retry_after": 1} to limit sends per chat/overall
+#                    per second, or {"fail_next": 5} to reject the next five calls; {} turns it off
+
+BOT_USER = {"id": 7000000001, "is_bot": True, "first_name": "ExpenSplit", "username": "expensplit_bot"}
+
+
+class FloodError(Exception):
+    """A call rejected with 429; retry_after is reported to the client."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Too Many Requests: retry after {retry_after}")
+        self.retry_after = retry_after
+
+
+class FakeBotAPI:
+    """State behind the fake server; importable so tests can drive it in-process."""
+
+    def __init__(self):
+        self.updates = []            # Pending updates, ordered by update_id
+        self.sent = []               # (method, params) of every call, oldest first
+        self.calls = {}              # method -> number of calls
+        self.webhook_url = ""
+        self.flood = {}              # 429 injection settings, see /_flood
+        self.rejected = 0            # Calls answered 429
+        self._recent = {}            # chat_id or None (overall) -> send times within the last second
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_update = asyncio.Event()
+
+    def add_update(self, update):
+        update = dict(update)
+        update.setdefault("update_id", next(self._update_ids))
+        self.updates.append(update)
+        self._new_update.set()
+        return update["update_id"]
+
+    async def get_updates(self, offset=None, limit=100, timeout=0):
+        # Updates below the offset are confirmed and dropped, as on Telegram
+        if offset is not None:
+            self.updates = [update for update in self.updates if update["update_id"] >= offset]
+
+        deadline = time.monotonic() + timeout
+        while not self.updates and time.monotonic() < deadline:
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+        return self.updates[:limit]
+
+    def message(self, params, **fields):
+        """A Message object as the Bot API would return for a sent message."""
+        chat_id = int(params.get("chat_id", 0))
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "group" if chat_id < 0 else "private"},
+            "from": BOT_USER,
+            **fields,
+        }
+
+    def check_flood(self, method, params):
+        """Raise FloodError if this call goes over the configured limits. Only new messages are limited."""
+        retry_after = self.flood.get("retry_after", 1)
+        if self.flood.get("fail_next", 0) > 0:
+            self.flood["fail_next"] -= 1
+            raise FloodError(retry_after)
+        if not method.startswith("send"):
+            return
+
+        now = time.monotonic()
+        limits = ((params.get("chat_id"), self.flood.get("chat_rate")), (None, self.flood.get("global_rate")))
+        for key, rate in limits:
+            if rate is None:
+                continue
+            recent = [sent for sent in self._recent.get(key, []) if now - sent < 1]
+            if len(recent) >= rate:
+                raise FloodError(retry_after)
+            self._recent[key] = recent
+        for key, _ in limits:
+            self._recent.setdefault(key, []).append(now)
+
+    async def call(self, method, params):
+        try:
+            self.check_flood(method, params)
+        except FloodError:
+            self.rejected += 1
+            raise
+        self.sent.append((method, params))
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            return await self.get_updates(
+                int(params["offset"]) if params.get("offset") is not None else None,
+                int(params.get("limit", 100)),
+                float(params.get("timeout", 0)),
+            )
+        if method == "setWebhook":
+            self.webhook_url = params.get("url", "")
+            return True
+        if method == "deleteWebhook":
+            self.webhook_url = ""
+            return True
+        if method == "getWebhookInfo":
+            return {"url": self.webhook_url, "has_custom_certificate": False, "pending_update_count": len(self.updates)}
+        if method in ("sendMessage", "editMessageText"):
+            return self.message(params, text=params.get("text", ""))
+        if method == "sendDocument":
+            return self.message(params, document={"file_id": "fake", "file_unique_id": "fake", "file_name": "export.csv"})
+        # deleteMessage(s), answerCallbackQuery and anything else simply succeed
+        return True
+
+
+def decode(value):
+    """Form fields carry JSON for nested values (reply_markup, allowed_updates...); plain strings stay as they are."""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+def create_app(api=None):
+    api = api or FakeBotAPI()
+    app = Quart(__name__)
+    app.api = api
+
+    @app.route("/bot<token>/<method>", methods=["GET", "POST"])
+    async def bot_method(token, method):
+        params = dict(request.args)
+        params.update(await request.form)
+        params.update(await request.get_json(silent=True) or {})
+        if (await request.files):
+            params["files"] = list((await request.files).keys())
+        params = {key: decode(value) for key, value in params.items()}
+
+        try:
+            return {"ok": True, "result": await api.call(method, params)}, 200
+        except FloodError as e:
+            return {"ok": False, "error_code": 429, "description": str(e), "parameters": {"retry_after": e.retry_after}}, 429
+
+    @app.route("/_updates", methods=["POST"])
+    async def add_updates():
+        data = await request.get_json(force=True)
+        ids = [api.add_update(update) for update in (data if isinstance(data, list) else [data])]
+        return {"update_ids": ids}, 200
+
+    @app.route("/_sent", methods=["GET", "DELETE"])
+    async def sent():
+        if request.method == "DELETE":
+            api.sent.clear()
+        return {"sent": [{"method": method, "params": params} for method, params in api.sent]}, 200
+
+    @app.route("/_stats", methods=["GET"])
+    async def stats():
+        return {"calls": api.calls, "pending_updates": len(api.updates), "rejected": api.rejected}, 200
+
+    @app.route("/_flood", methods=["POST"])
+    async def flood():
+        api.flood = await request.get_json(force=True) or {}
+        api._recent.clear()
+        return {"flood": api.flood}, 200
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local fake of the Telegram Bot API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8082)
+    args = parser.parse_args()
+    create_app().run(host=args.host, port=args.port)
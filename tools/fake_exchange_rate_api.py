@@ -0,0 +1,51 @@
+import argparse, time
+from quart import Quart, request
+
+#Local stand-in for ExchangeRate-API, so the rate service can be exercised offline.
+#
+#   python tools/fake_exchange_rate_api.py --port 8081
+#   EXCHANGE_RATE_API_URL=http://localhost:8081/v6/test/latest/SGD python bot.py
+#
+#POST /_control with {"fail": true} makes every rates request return 503 (and
+#{"fail": false} restores it), to check that stale rates keep being served.
+
+RATES = {
+    "SGD": 1, "USD": 0.7407, "EUR": 0.6843, "GBP": 0.5836, "JPY": 111.52, "MYR": 3.3012,
+    "IDR": 11802.35, "THB": 25.41, "AUD": 1.1374, "CNY": 5.3706, "HKD": 5.7726, "KRW": 1021.77,
+}
+
+app = Quart(__name__)
+state = {"fail": False, "requests": 0}
+
+
+@app.route("/v6/<key>/latest/<base>", methods=["GET"])
+async def latest(key, base):
+    state["requests"] += 1
+    if state["fail"]:
+        return {"result": "error", "error-type": "unavailable"}, 503
+
+    base = base.upper()
+    if base not in RATES:
+        return {"result": "error", "error-type": "unsupported-code"}, 404
+
+    # Quote every rate against the requested base, like the real API
+    return {
+        "result": "success",
+        "time_last_update_unix": int(time.time()),
+        "base_code": base,
+        "conversion_rates": {currency: round(rate / RATES[base], 6) for currency, rate in RATES.items()},
+    }, 200
+
+@app.route("/_control", methods=["GET", "POST"])
+async def control():
+    if request.method == "POST":
+        state["fail"] = bool((await request.get_json(force=True) or {}).get("fail", False))
+    return state, 200
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local fake of ExchangeRate-API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+    app.run(host=args.host, port=args.port)
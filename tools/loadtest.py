@@ -0,0 +1,219 @@
+import argparse, asyncio, itertools, math, random, time
+from datetime import datetime, timezone
+import httpx
+from fake_bot_api import FakeBotAPI, create_app
+
+#End-to-end load test: many simulated groups talking to the bot through its /webhook, with a fake
+#Bot API (run in this process) absorbing and timing the bot's replies. Nothing leaves the machine.
+#
+#   1. Start the bot against the fake API and a local database, with limits lifted for the run:
+#        BOT_API_BASE_URL=http://127.0.0.1:8082/bot WEBHOOK_URL=http://127.0.0.1:8443/webhook \
+#        OUTBOUND_GROUP_RATE=100000 OUTBOUND_CHAT_RATE=100000 OUTBOUND_GLOBAL_RATE=100000 \
+#        QUERY_BUDGET_ENFORCE=1 python bot.py
+#   2. python tools/loadtest.py --chats 200 --rounds 5
+#
+#Each group first runs /start and adds --members members, then plays --rounds rounds of a
+#multi-step /add_expense conversation followed by /show_balance, /show_expenses and, every
+#--export-every rounds, /export_expenses. Like a real user, a group sends its next message only
+#once the bot has answered the previous one, so groups are concurrent and each group is sequential.
+#
+#Reported per step: webhook latency (until /webhook answered) and reply latency (until the bot's
+#last expected message for the step reached the fake API), with p50/p95/p99, plus error rates.
+
+BOT_COMMAND = "bot_command"
+
+
+class ObservedBotAPI(FakeBotAPI):
+    """Fake Bot API that counts, per chat, the messages the bot sends, so a step can wait for its replies."""
+
+    def __init__(self):
+        super().__init__()
+        self.replies = {}   # chat_id -> messages sent to it so far
+        self._events = {}   # chat_id -> Event set on every new message
+
+    def reply_count(self, chat_id):
+        return self.replies.get(chat_id, 0)
+
+    async def wait_for_replies(self, chat_id, count, timeout):
+        """Wait until `count` messages in total have been sent to the chat. False on timeout."""
+        deadline = time.monotonic() + timeout
+        event = self._events.setdefault(chat_id, asyncio.Event())
+        while self.reply_count(chat_id) < count:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            event.clear()
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def call(self, method, params):
+        result = await super().call(method, params)
+        # Edits, deletions and callback answers are side effects, not replies
+        if method.startswith("send") and method != "sendChatAction" and params.get("chat_id") is not None:
+            chat_id = int(params["chat_id"])
+            self.replies[chat_id] = self.reply_count(chat_id) + 1
+            self._events.setdefault(chat_id, asyncio.Event()).set()
+        return result
+
+
+class UpdateFactory:
+    """Builds Update payloads as Telegram would deliver them for a group message."""
+
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    def message(self, chat_id, user_id, username, text):
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(datetime.now(timezone.utc).timestamp()),
+            "chat": {"id": chat_id, "type": "group", "title": f"Load test {chat_id}"},
+            "from": {"id": user_id, "is_bot": False, "first_name": username, "username": username},
+            "text": text,
+        }
+        if text.startswith("/"):
+            # CommandHandler only matches messages carrying a bot_command entity
+            message["entities"] = [{"type": BOT_COMMAND, "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": next(self._update_ids), "message": message}
+
+
+def group_script(members, rounds, export_every):
+    """(step name, text, replies expected) for one group, in order."""
+    steps = [("start", "/start", 1)]
+    for member in members:
+        steps += [("add_member", "/add_member", 1), ("add_member.name", member, 1)]
+
+    for round_number in range(1, rounds + 1):
+        steps += [
+            ("add_expense", "/add_expense", 1),
+            ("add_expense.purpose", f"Dinner {round_number}", 1),
+            ("add_expense.payer", random.choice(members), 1),
+            ("add_expense.amount", f"{random.randint(100, 20000) / 100:.2f}", 1),
+            # "all" announces the split, then asks for the amounts
+            ("add_expense.beneficiaries", "all", 2),
+            ("add_expense.split", "equal", 1),
+            ("show_balance", "/show_balance", 1),
+            ("show_expenses", "/show_expenses", 1),
+        ]
+        if export_every and round_number % export_every == 0:
+            steps.append(("export_expenses", "/export_expenses", 1))
+    return steps
+
+
+class Results:
+    def __init__(self):
+        self.webhook = {}   # step -> webhook latencies
+        self.reply = {}     # step -> reply latencies
+        self.errors = {}    # (step, kind) -> count
+        self.sent = 0
+
+    def error(self, step, kind):
+        self.errors[(step, kind)] = self.errors.get((step, kind), 0) + 1
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an unsorted list."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+async def run_group(client, api, factory, results, webhook_url, chat_id, args):
+    user_id = 100000 + abs(chat_id)
+    username = f"loadtest{abs(chat_id)}"
+    members = [f"member{chat_id % 1000}_{i}" for i in range(args.members)]
+
+    for step, text, expected in group_script(members, args.rounds, args.export_every):
+        target = api.reply_count(chat_id) + expected
+        start = time.perf_counter()
+        try:
+            response = await client.post(webhook_url, json=factory.message(chat_id, user_id, username, text))
+        except httpx.HTTPError as e:
+            results.error(step, type(e).__name__)
+            return
+        results.sent += 1
+        results.webhook.setdefault(step, []).append(time.perf_counter() - start)
+        if response.status_code != 200:
+            results.error(step, f"HTTP {response.status_code}")
+            # The group cannot continue its conversation reliably
+            return
+
+        if not await api.wait_for_replies(chat_id, target, args.timeout):
+            results.error(step, "timeout")
+            return
+        results.reply.setdefault(step, []).append(time.perf_counter() - start)
+
+def report(results, elapsed, api):
+    steps = list(dict.fromkeys([*results.webhook, *(step for step, _ in results.errors)]))
+    print(f"{results.sent} updates in {elapsed:.1f}s: {results.sent / elapsed:.1f} updates/s")
+    print()
+    print(f"{'step':<28} {'n':>6} {'webhook p50/p95/p99 ms':>24} {'reply p50/p95/p99 ms':>24} {'errors':>7}")
+    for step in steps:
+        webhook = results.webhook.get(step, [])
+        reply = results.reply.get(step, [])
+        errors = sum(count for (error_step, _), count in results.errors.items() if error_step == step)
+        print(
+            f"{step:<28} {len(webhook):>6} "
+            f"{'/'.join(f'{percentile(webhook, q) * 1000:.0f}' for q in (0.5, 0.95, 0.99)):>24} "
+            f"{'/'.join(f'{percentile(reply, q) * 1000:.0f}' for q in (0.5, 0.95, 0.99)):>24} "
+            f"{errors:>7}"
+        )
+
+    all_replies = [latency for latencies in results.reply.values() for latency in latencies]
+    total_errors = sum(results.errors.values())
+    print()
+    print(
+        f"All steps: reply p50 {percentile(all_replies, 0.5) * 1000:.0f}ms, p95 {percentile(all_replies, 0.95) * 1000:.0f}ms, "
+        f"p99 {percentile(all_replies, 0.99) * 1000:.0f}ms; error rate {total_errors / max(1, results.sent):.2%}"
+    )
+    for (step, kind), count in sorted(results.errors.items()):
+        print(f"  {step}: {count} x {kind}")
+    print(f"Bot API calls: {sum(api.calls.values())} ({', '.join(f'{method} {count}' for method, count in sorted(api.calls.items()))}), {api.rejected} answered 429")
+
+async def main(args):
+    api = ObservedBotAPI()
+    if args.flood_chat_rate:
+        api.flood = {"chat_rate": args.flood_chat_rate, "retry_after": 1}
+    server_stopped = asyncio.Event()
+    server = asyncio.create_task(create_app(api).run_task(host="127.0.0.1", port=args.api_port, shutdown_trigger=server_stopped.wait))
+    await asyncio.sleep(0.5)  # Let the fake API bind before the bot's first reply
+
+    factory = UpdateFactory()
+    results = Results()
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            run_group(client, api, factory, results, args.webhook, -(args.first_chat + i), args)
+            for i in range(args.chats)
+        ))
+        elapsed = time.perf_counter() - start
+
+    # Give the bot a moment to finish deleting conversation messages before the fake API goes away
+    await asyncio.sleep(1)
+    server_stopped.set()
+    await server
+
+    report(results, elapsed, api)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive the bot's /webhook with simulated groups and report latency.")
+    parser.add_argument("--webhook", default="http://127.0.0.1:8443/webhook")
+    parser.add_argument("--api-port", type=int, default=8082, help="Port of the in-process fake Bot API")
+    parser.add_argument("--chats", type=int, default=50, help="Groups talking to the bot at once")
+    parser.add_argument("--members", type=int, default=4, help="Members added to each group")
+    parser.add_argument("--rounds", type=int, default=5, help="Expense rounds per group")
+    parser.add_argument("--export-every", type=int, default=5, help="Export every N rounds; 0 to never export")
+    parser.add_argument("--connections", type=int, default=100, help="Concurrent HTTP connections to the webhook")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds a step may take before it counts as failed")
+    parser.add_argument("--first-chat", type=int, default=1_000_000_000, help="Group ids are negative, counting from -first-chat")
+    parser.add_argument("--flood-chat-rate", type=int, default=0, help="Have the fake API answer 429 above this many messages per chat per second")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(main(args))